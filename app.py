@@ -6,12 +6,26 @@ import numpy as np
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
-import tempfile
-import sqlite3
-from io import BytesIO
-from datetime import datetime
+import time
+import uuid
+from datetime import date, datetime
 from employee_db import EmployeeDatabase
+from driver_analysis import TerceirosMatcher, filter_registered
+from producao.core import (
+    COLUNAS_ESPERADAS, STATUS_EM_SAIDA, STATUS_PARQUEADO, aggregate_counts, analysis_frame,
+    count, prepare, result_driver_keys, result_fingerprint, vehicles_for
+)
+from parse_cache import ParseCache
+from history_store import HistoryStore
+from producao.tracing import TraceLog, span, trace_run
+from dashboard_charts import FigureCache
+from dataset_registry import CountsCache, SessionIndex, SessionStore
+from export_writer import MIME_TYPES, SCHEMA_FUNCIONARIOS, SCHEMA_RESULTADO, SCHEMA_VEICULOS, ExportCache
+from parallel_ingest import ParallelIngest
+from bulk_export import VehicleExportJob
+from session_tokens import SessionTokens
 from user_auth import UserAuth
+from sqlite_backend import SQLiteEmployeeDatabase, SQLiteUserAuth
 
 # Verificar se estamos executando como executável ou diretamente
 # Isso é necessário para o PyInstaller encontrar os arquivos
@@ -31,21 +45,117 @@ st.set_page_config(
     layout="wide"
 )
 
+# Armazenamento de funcionários e usuários: 'sqlite' (padrão) ou 'csv'
+STORAGE_BACKEND = os.environ.get('MANOBRISTAS_STORAGE', 'sqlite').lower()
+
 # Inicializar banco de dados
-db = EmployeeDatabase()
+# A instância é compartilhada entre execuções e sessões para manter o cache em memória
+@st.cache_resource
+def get_employee_database():
+    if STORAGE_BACKEND == 'csv':
+        return EmployeeDatabase()
+    return SQLiteEmployeeDatabase()
+
+db = get_employee_database()
 
 # Inicializar sistema de autenticação
-auth = UserAuth()
+@st.cache_resource
+def get_user_auth():
+    if STORAGE_BACKEND == 'csv':
+        return UserAuth()
+    return SQLiteUserAuth()
+
+auth = get_user_auth()
+
+# Cache em disco das planilhas já processadas (compartilhado entre sessões)
+parse_cache = ParseCache()
+
+# Histórico de movimentações acumulado a partir das exportações (compartilhado entre sessões)
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+# Log de desempenho (JSON lines com rotação), compartilhado entre sessões
+@st.cache_resource
+def get_trace_log():
+    return TraceLog()
+
+# Leitura paralela de várias planilhas (pool de processos reaproveitado entre execuções)
+@st.cache_resource
+def get_parallel_ingest():
+    return ParallelIngest()
+
+# Gráficos do dashboard já serializados, reaproveitados entre execuções e sessões
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+# Arquivos exportados (Excel e CSV) pelo conteúdo dos dados, compartilhados entre sessões
+@st.cache_resource
+def get_export_cache():
+    return ExportCache()
+
+# Contagens por manobrista de cada arquivo (pelo hash do conteúdo), compartilhadas entre sessões
+@st.cache_resource
+def get_counts_cache():
+    return CountsCache()
+
+# Arquivos processados por sessão (um registro por arquivo), compartilhado no servidor
+# para que sessões inativas possam ser descartadas
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+# Tokens de sessão assinados, para restaurar o login após atualizar a página ou reconectar
+@st.cache_resource
+def get_session_tokens():
+    return SessionTokens()
+
+# Arquivos analisados em cada sessão autenticada (gravado em disco), usado ao restaurar uma sessão
+@st.cache_resource
+def get_session_index():
+    return SessionIndex()
+
+# Parâmetro da URL com o token de sessão
+PARAMETRO_SESSAO = 'sessao'
+
+# Confere o token de sessão e restaura o usuário e o identificador da sessão do servidor
+# Retorna os dados da sessão no índice, ou None (removendo da URL um token inválido,
+# vencido ou de uma sessão encerrada)
+def restore_login(token):
+    dados = get_session_tokens().verify(token, get_session_index().is_revoked)
+    entrada = get_session_index().get(dados['sessao']) if dados else None
+    user_data = None
+    if entrada is not None and entrada['usuario'] == dados['usuario']:
+        # Dados atuais do cadastro: um usuário desativado não é restaurado
+        user_data = auth.get_user_by_username(dados['usuario'])
+    if user_data is None or not user_data['ativo']:
+        del st.query_params[PARAMETRO_SESSAO]
+        return None
+    
+    st.session_state.session_id = dados['sessao']
+    st.session_state.logged_in = True
+    st.session_state.user_data = user_data
+    st.session_state.show_login = False
+    return entrada
 
 # Inicializar variáveis para armazenar os dados entre abas
-if 'dataframes_completos' not in st.session_state:
-    st.session_state.dataframes_completos = []
+# Identificador da sessão, usado para localizar os arquivos processados no servidor
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
     
 # Título principal será definido em cada seção, não aqui no início
     
 if 'analyzed_data' not in st.session_state:
     st.session_state.analyzed_data = None
     
+# Filtros da análise (valor inicial das opções de filtro)
+if 'excluir_terceiros' not in st.session_state:
+    st.session_state.excluir_terceiros = True
+    
+if 'apenas_cadastrados' not in st.session_state:
+    st.session_state.apenas_cadastrados = False
+    
 if 'processed_files' not in st.session_state:
     st.session_state.processed_files = False
     
@@ -62,6 +172,15 @@ if 'show_login' not in st.session_state:
 if 'show_gerenciar_usuarios' not in st.session_state:
     st.session_state.show_gerenciar_usuarios = False
 
+# Atualização da página ou reconexão: restaurar o login pelo token da URL
+# Os resultados da sessão são reconstruídos antes de mostrar as abas (ver restore_session_data)
+sessao_restaurada = None
+if not st.session_state.logged_in and PARAMETRO_SESSAO in st.query_params:
+    sessao_restaurada = restore_login(st.query_params[PARAMETRO_SESSAO])
+
+# Arquivos processados desta sessão
+datasets = get_session_store().get(st.session_state.session_id)
+
 # Barra lateral com título e botões para navegação
 st.sidebar.title("Menu")
 
@@ -97,222 +216,267 @@ if st.sidebar.button("🚗 Análise de Veículos", use_container_width=True, key
 
 # Removido título principal global para evitar duplicação
 
-# Function to process Excel file and extract driver data with caching
-@st.cache_data(ttl=3600, show_spinner="Processando arquivo Excel...")
-def process_excel_file(uploaded_file):
+# Obter o conteúdo e o nome de um arquivo (caminho ou upload do Streamlit)
+def read_uploaded_file(uploaded_file):
+    if isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
+        with open(uploaded_file, 'rb') as f:
+            return f.read(), os.path.basename(uploaded_file)
+    return uploaded_file.getvalue(), uploaded_file.name
+
+# Prepara os dados lidos de um arquivo: diagnóstico, classificação de status e
+# registro na sessão. Retorna os dados para agregação ou None em caso de erro
+def prepare_file_data(cache_key, nome_arquivo, df, cabecalho, cached):
+    # Mostrar informações sobre o arquivo carregado para diagnóstico
+    st.write(f"### Informações de diagnóstico do arquivo: {nome_arquivo}")
+    if cached:
+        st.write("Arquivo já processado anteriormente - dados carregados do cache.")
+    st.write(f"Colunas encontradas: {cabecalho}")
+    
+    # Informar colunas identificadas pela posição em vez do nome
+    for nome_coluna, indice in COLUNAS_ESPERADAS.items():
+        if nome_coluna not in cabecalho and nome_coluna in df.columns:
+            st.write(f"Renomeando coluna {indice} para '{nome_coluna}'")
+    
+    # Extract relevant columns for aggregation (E=Status, H=Manobrista)
     try:
-        # Cálculo de tamanho aproximado do arquivo para definir uso de chunks
-        file_size_MB = 0
-        if isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
-            file_size_MB = os.path.getsize(uploaded_file) / (1024 * 1024)
-        else:
-            # Para uploads do Streamlit, não podemos obter o tamanho diretamente
-            # então assumimos que podem ser grandes e usamos chunks
-            file_size_MB = 10  # Assumimos tamanho mínimo para chunks
+        # Classificar o Status e padronizar os nomes dos manobristas (producao.core)
+        prepare(df)
         
-        # Define se usamos chunks ou não baseado no tamanho do arquivo
-        use_chunks = file_size_MB > 5  # Se for maior que 5MB, usamos chunks
+        # Mostrar valores únicos de status
+        unique_statuses = df['Status'].cat.categories
+        st.write(f"Valores únicos encontrados na coluna Status: {list(unique_statuses)}")
         
-        if use_chunks:
-            # Processamento em chunks para arquivos grandes
-            chunks = []
-            chunk_size = 10000  # Número de linhas por chunk
-            
-            # Criar barra de progresso
-            progress_bar = st.progress(0)
-            progress_text = st.empty()
-            progress_text.text("Iniciando processamento do arquivo...")
-            
-            # Ler em chunks
-            if isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
-                # Modo executável - arquivo é um caminho
-                xlsx = pd.ExcelFile(uploaded_file, engine='openpyxl')
-                # Obtém o nome da primeira planilha
-                sheet_name = xlsx.sheet_names[0]
-                # Obtém o número total de linhas para calcular o progresso
-                total_rows = xlsx.book[sheet_name].max_row
-                
-                # Lê em chunks
-                for i in range(0, total_rows, chunk_size):
-                    # Calcular o número de linhas para este chunk
-                    end_row = min(i + chunk_size, total_rows)
-                    # Ler o próximo chunk
-                    chunk = pd.read_excel(xlsx, sheet_name=sheet_name, skiprows=i, nrows=end_row-i)
-                    chunks.append(chunk)
-                    # Atualiza a barra de progresso
-                    progress = min(1.0, end_row / total_rows)
-                    progress_bar.progress(progress)
-                    progress_text.text(f"Processando... {int(progress * 100)}%")
-                
-                df = pd.concat(chunks, ignore_index=True)
-            else:
-                # Modo Streamlit - arquivo é um objeto de upload
-                # No Streamlit, precisamos fazer de forma diferente, pois não podemos
-                # ler diretamente em chunks de um objeto UploadedFile
-                # Primeiro salvamos temporariamente
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                    tmp.write(uploaded_file.getvalue())
-                    tmp_path = tmp.name
-                
-                # Agora lemos do arquivo temporário em chunks
-                xlsx = pd.ExcelFile(tmp_path, engine='openpyxl')
-                sheet_name = xlsx.sheet_names[0]
-                total_rows = xlsx.book[sheet_name].max_row
-                
-                for i in range(0, total_rows, chunk_size):
-                    # Calcular o número de linhas para este chunk
-                    end_row = min(i + chunk_size, total_rows)
-                    # Ler o próximo chunk
-                    chunk = pd.read_excel(xlsx, sheet_name=sheet_name, skiprows=i, nrows=end_row-i)
-                    chunks.append(chunk)
-                    # Atualiza a barra de progresso
-                    progress = min(1.0, end_row / total_rows)
-                    progress_bar.progress(progress)
-                    progress_text.text(f"Processando... {int(progress * 100)}%")
-                
-                df = pd.concat(chunks, ignore_index=True)
-                
-                # Remover arquivo temporário
-                os.unlink(tmp_path)
-            
-            # Limpar elementos de progresso
-            progress_bar.empty()
-            progress_text.empty()
-        else:
-            # Para arquivos pequenos, usamos o método normal
-            if isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
-            else:
-                # Modo normal - uploaded_file é um objeto de upload do Streamlit
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
+        # Clean data - remove rows with empty manobrista
+        df_analise = analysis_frame(df)
         
-        # Guardar o DataFrame completo para uso na análise de veículos
-        df_completo = df.copy()
+        # Guardar os dados do arquivo na sessão (substitui o registro anterior do mesmo arquivo)
+        datasets.put(cache_key, df, nome_arquivo)
         
-        # Mostrar informações sobre o arquivo carregado para diagnóstico
-        st.write("### Informações de diagnóstico do arquivo:")
-        st.write(f"Colunas encontradas: {list(df.columns)}")
+        # Mostrar primeiras linhas após processamento
+        st.write("Amostra das primeiras 5 linhas após processamento:")
+        st.write(df_analise.head(5))
         
-        # Verificar e renomear colunas importantes se necessário
-        colunas_esperadas = {
-            'Chassi': 0,          # Coluna A
-            'Versão do modelo': 2, # Coluna C
-            'Cor': 3,             # Coluna D
-            'Status': 4,          # Coluna E
-            'Descrição': 5,       # Coluna F
-            'Manobrista': 7       # Coluna H
-        }
+        return df_analise
+    except Exception as e:
+        st.error(f"Erro ao processar colunas: {str(e)}")
+        st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
+        return None
+
+# Function to process Excel files and extract driver data
+# A leitura do Excel é armazenada em cache pelo conteúdo do arquivo e os arquivos
+# fora do cache são lidos em paralelo; o restante (diagnóstico e dados da sessão)
+# é executado sempre
+# Quando adicionar_historico é verdadeiro, as movimentações também são incorporadas
+# ao histórico (cada arquivo uma única vez)
+# Arquivos já carregados nesta sessão e já contados não são lidos nem preparados
+# novamente: incluir ou remover um arquivo custa apenas o trabalho desse arquivo
+# Retorna uma lista com (chave do arquivo, dados para agregação, contagens) de cada
+# arquivo processado com sucesso
+def process_excel_files(uploaded_files, adicionar_historico=False):
+    counts_cache = get_counts_cache()
+    arquivos = []
+    for uploaded_file in uploaded_files:
+        try:
+            file_bytes, nome_arquivo = read_uploaded_file(uploaded_file)
+        except Exception as e:
+            st.error(f"Erro ao processar arquivo: {str(e)}")
+            continue
+        with span('cache', arquivo=nome_arquivo):
+            cache_key = parse_cache.file_key(file_bytes)
+            registro = datasets.get(cache_key)
+            contagens = counts_cache.get(cache_key)
+            sessao = (
+                registro is not None and contagens is not None
+                and (not adicionar_historico or get_history_store().has_file(cache_key))
+            )
+            lido = None if sessao else parse_cache.get(cache_key)
+        arquivos.append({
+            'chave': cache_key,
+            'nome': nome_arquivo,
+            'bytes': file_bytes,
+            'lido': lido,
+            'cached': True,
+            'sessao': registro if sessao else None,
+            'contagens': contagens,
+        })
+    
+    # Ler em paralelo os arquivos que não estão no cache
+    faltantes = [arquivo for arquivo in arquivos if arquivo['lido'] is None and arquivo['sessao'] is None]
+    if faltantes:
+        progress_bar = st.progress(0)
+        progress_text = st.empty()
+        progress_text.text(f"Iniciando processamento de {len(faltantes)} arquivo(s)...")
         
-        # Renomear colunas conforme necessário
-        for nome_coluna, indice in colunas_esperadas.items():
-            if nome_coluna not in df.columns and len(df.columns) > indice:
-                df.rename(columns={df.columns[indice]: nome_coluna}, inplace=True)
-                df_completo.rename(columns={df_completo.columns[indice]: nome_coluna}, inplace=True)
-                st.write(f"Renomeando coluna {indice} para '{nome_coluna}'")
+        def atualizar_progresso(progress):
+            progress_bar.progress(progress)
+            progress_text.text(f"Processando {len(faltantes)} arquivo(s)... {int(progress * 100)}%")
         
-        # Extract relevant columns for aggregation (E=Status, H=Manobrista)
         try:
-            status_col = 'Status' if 'Status' in df.columns else df.columns[4]
-            manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[7]
-            
-            # Mostrar valores únicos de status
-            unique_statuses = df[status_col].dropna().unique()
-            st.write(f"Valores únicos encontrados na coluna Status: {list(unique_statuses)}")
-            
-            # Clean data - remove rows with empty manobrista
-            df_analise = df[[status_col, manobrista_col]].dropna(subset=[manobrista_col])
-            
-            # Convert manobrista entries to uppercase for consistency
-            df_analise[manobrista_col] = df_analise[manobrista_col].str.upper()
-            
-            # Também garantir consistência em df_completo
-            if manobrista_col in df_completo.columns:
-                df_completo[manobrista_col] = df_completo[manobrista_col].fillna('').astype(str).str.upper()
-            
-            # Guardar o DataFrame completo na sessão para uso posterior
-            if 'dataframes_completos' not in st.session_state:
-                st.session_state.dataframes_completos = []
-            
-            st.session_state.dataframes_completos.append(df_completo)
-            
-            # Mostrar primeiras linhas após processamento
-            st.write("Amostra das primeiras 5 linhas após processamento:")
-            st.write(df_analise.head(5))
-            
-            return df_analise
-        except Exception as e:
-            st.error(f"Erro ao processar colunas: {str(e)}")
-            st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
-            return None
-            
-    except Exception as e:
-        st.error(f"Erro ao processar arquivo: {str(e)}")
-        return None
+            with span('leitura', arquivos=len(faltantes)):
+                lidos = get_parallel_ingest().parse_many(
+                    [arquivo['bytes'] for arquivo in faltantes],
+                    progress_callback=atualizar_progresso
+                )
+        finally:
+            # Limpar elementos de progresso
+            progress_bar.empty()
+            progress_text.empty()
+        
+        for arquivo, lido in zip(faltantes, lidos):
+            arquivo['cached'] = False
+            if isinstance(lido, Exception):
+                st.error(f"Erro ao processar arquivo {arquivo['nome']}: {str(lido)}")
+                continue
+            arquivo['lido'] = lido
+            parse_cache.put(arquivo['chave'], *lido)
+    
+    processados = []
+    for arquivo in arquivos:
+        if arquivo['sessao'] is not None:
+            st.write(f"### {arquivo['nome']}: já carregado nesta sessão - contagens reaproveitadas.")
+            processados.append((arquivo['chave'], analysis_frame(arquivo['sessao']['df']), arquivo['contagens']))
+            continue
+        if arquivo['lido'] is None:
+            continue
+        df, cabecalho = arquivo['lido']
+        if adicionar_historico:
+            # Antes de prepare, para guardar os valores originais da planilha
+            with span('historico', arquivo=arquivo['nome'], linhas=len(df)):
+                try:
+                    resumo = get_history_store().add(df, arquivo['chave'], arquivo['nome'])
+                except Exception as e:
+                    resumo = None
+                    st.error(f"Erro ao adicionar {arquivo['nome']} ao histórico: {str(e)}")
+            if resumo is not None and not resumo['ja_incorporado']:
+                st.info(f"Histórico: {resumo['novas']} movimentações novas de {arquivo['nome']} "
+                        f"({resumo['duplicadas']} já registradas).")
+        with span('preparacao', arquivo=arquivo['nome'], linhas=len(df)):
+            df_analise = prepare_file_data(arquivo['chave'], arquivo['nome'], df, cabecalho, arquivo['cached'])
+        if df_analise is not None:
+            contagens = arquivo['contagens']
+            if contagens is None:
+                contagens = count(df_analise)
+                counts_cache.put(arquivo['chave'], contagens)
+            processados.append((arquivo['chave'], df_analise, contagens))
+    return processados
 
-# Function to extract matricula from manobrista name
-def extract_matricula(manobrista_name):
-    # Assuming matricula is at the beginning of the name and follows a pattern
-    # For example: "12345 - JOSE DA SILVA" should return "12345"
-    if isinstance(manobrista_name, str) and '-' in manobrista_name:
-        parts = manobrista_name.split('-', 1)
-        return parts[0].strip()
-    return ""
+# Retorna a função que gera um arquivo exportado, para usar como data de st.download_button
+# O arquivo só é gerado quando o usuário clica em baixar, fora da execução da página,
+# e fica em cache pelo identificador dos dados (fingerprint) e formato
+# Parquet e Arrow usam o esquema informado (ex: SCHEMA_RESULTADO)
+def export_data(df, formato, nome_execucao, fingerprint=None, schema=None):
+    if fingerprint is None:
+        fingerprint = result_fingerprint(df)
+    cache = get_export_cache()
+    log = get_trace_log()
+    
+    def gerar():
+        with trace_run(nome_execucao, log=log), span('exportacao', formato=formato, linhas=len(df)):
+            return cache.get(fingerprint, formato, df, schema)
+    return gerar
+
+# Produção do período calculada pelo resumo diário do histórico, sem ler as movimentações
+# As movimentações só são carregadas quando a aba de veículos precisar delas
+def process_history(inicio, fim):
+    with span('historico', inicio=inicio.isoformat(), fim=fim.isoformat()):
+        result_df = get_history_store().aggregate(inicio, fim)
+    st.session_state.historico_periodo = (inicio, fim)
+    return result_df
 
-# Function to aggregate driver data
-def aggregate_driver_data(dataframes):
-    combined_data = {}
+# Carrega do histórico as movimentações do período analisado e registra os dados na sessão
+def load_history_movements(inicio, fim):
+    with span('historico_movimentacoes', inicio=inicio.isoformat(), fim=fim.isoformat()):
+        df = get_history_store().load(inicio, fim)
+    if df.empty:
+        return
+    prepare(df)
+    datasets.put(f"historico:{inicio.isoformat()}:{fim.isoformat()}", df,
+                 f"Histórico {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}")
+
+# Aplica ao resultado os filtros de terceiros (terceiros.toml) e de funcionários cadastrados
+# Retorna o resultado filtrado e um resumo para as mensagens: manobristas removidos por cada
+# filtro (None em 'cadastrados' se nenhum manobrista estiver cadastrado; nesse caso o filtro
+# não é aplicado), matrículas não encontradas no cadastro e número de filtros aplicados
+def aplicar_filtros(result_df, excluir_terceiros, apenas_cadastrados):
+    resumo = {'terceiros': 0, 'cadastrados': 0, 'nao_encontrados': None, 'aplicados': 0}
     
-    for df in dataframes:
-        if df is None:
-            continue
-            
-        status_col = 'Status' if 'Status' in df.columns else df.columns[0]
-        manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-        
-        # Group by manobrista and count statuses
-        for _, row in df.iterrows():
-            manobrista = row[manobrista_col]
-            status = row[status_col]
-            
-            if manobrista not in combined_data:
-                matricula = extract_matricula(manobrista)
-                combined_data[manobrista] = {
-                    'MATRICULA': matricula,
-                    'MANOBRISTA': manobrista.split('-')[-1].strip() if '-' in manobrista else manobrista,
-                    'EM SAIDA': 0,
-                    'PARQUEADOS': 0,
-                    'TOTAL': 0
-                }
-            
-            # Update counts based on status
-            status_upper = status.upper()
-            
-            # Verificação mais abrangente para "Em Saída (expedição)"
-            is_saida = False
-            saida_keywords = ['SAIDA', 'SAÍDA', 'EXPEDICAO', 'EXPEDIÇÃO', 'EXPEDIC', 'EXPEDIÇ']
-            
-            for keyword in saida_keywords:
-                if keyword in status_upper:
-                    is_saida = True
-                    break
-            
-            # Se for uma saída
-            if is_saida:
-                combined_data[manobrista]['EM SAIDA'] += 1
-            # Se for um parqueado
-            elif 'PARQUEADO' in status_upper:
-                combined_data[manobrista]['PARQUEADOS'] += 1
-            
-            combined_data[manobrista]['TOTAL'] += 1
+    if excluir_terceiros:
+        # Palavras-chave e tipos que identificam terceirizados vêm de terceiros.toml
+        matcher = TerceirosMatcher.from_config()
+        tamanho_antes = len(result_df)
+        with span('filtro_terceiros', manobristas=tamanho_antes):
+            result_df = result_df[~matcher.match(result_df, db.get_all_employees()).to_numpy()]
+        resumo['terceiros'] = tamanho_antes - len(result_df)
     
-    # Convert to DataFrame
-    result_df = pd.DataFrame(combined_data.values())
+    if apenas_cadastrados:
+        # Comparar todas as matrículas de uma vez com os funcionários ativos
+        tamanho_antes = len(result_df)
+        with span('filtro_cadastrados', manobristas=tamanho_antes):
+            filtered_df, resumo['nao_encontrados'] = filter_registered(result_df, db.get_active_employees())
+        if filtered_df.empty:
+            resumo['cadastrados'] = None
+        else:
+            resumo['cadastrados'] = tamanho_antes - len(filtered_df)
+            result_df = filtered_df
     
-    # Sort by total in descending order
-    if not result_df.empty:
-        result_df = result_df.sort_values('TOTAL', ascending=False)
+    resumo['aplicados'] = int(bool(resumo['terceiros'])) + int(bool(resumo['cadastrados']))
+    return result_df, resumo
+
+# Resultado da última análise com os filtros aplicados (ou sem filtros, se não houver)
+def resultado_filtrado():
+    if st.session_state.get('analyzed_data') is not None:
+        return st.session_state.analyzed_data
+    return st.session_state.result_df
+
+# Reconstrói os resultados de uma sessão restaurada pelo token
+# Os arquivos ainda em memória (SessionStore) são reaproveitados e os demais são
+# recuperados do cache de planilhas, sem ler o Excel nem pedir um novo envio
+def restore_session_data(entrada):
+    if entrada['historico']:
+        inicio, fim = (date.fromisoformat(dia) for dia in entrada['historico'])
+        result_df = process_history(inicio, fim)
+        dataframes = []
+    else:
+        counts_cache = get_counts_cache()
+        dataframes = []
+        parciais = []
+        for chave, nome_arquivo in entrada['arquivos']:
+            registro = datasets.get(chave)
+            if registro is None:
+                with span('cache', arquivo=nome_arquivo):
+                    lido = parse_cache.get(chave)
+                if lido is None:
+                    continue
+                datasets.put(chave, prepare(lido[0]), nome_arquivo)
+                registro = datasets.get(chave)
+            df_analise = analysis_frame(registro['df'])
+            contagens = counts_cache.get(chave)
+            if contagens is None:
+                contagens = count(df_analise)
+                counts_cache.put(chave, contagens)
+            dataframes.append(df_analise)
+            parciais.append(contagens)
+        datasets.retain([chave for chave, _ in entrada['arquivos']])
+        if not parciais:
+            return
+        result_df = aggregate_counts(parciais)
     
-    return result_df
+    if result_df.empty:
+        return
+    
+    # Os mesmos filtros da análise original
+    filtros = entrada.get('filtros') or {}
+    excluir_terceiros = filtros.get('excluir_terceiros', True)
+    apenas_cadastrados = filtros.get('apenas_cadastrados', False)
+    filtrado, resumo_filtros = aplicar_filtros(result_df, excluir_terceiros, apenas_cadastrados)
+    st.session_state.excluir_terceiros = excluir_terceiros
+    st.session_state.apenas_cadastrados = apenas_cadastrados
+    st.session_state.filtros_aplicados = resumo_filtros['aplicados']
+    
+    st.session_state.dataframes = dataframes
+    st.session_state.result_df = result_df
+    st.session_state.analyzed_data = filtrado
+    st.session_state.processed_files = True
 
 # Função para mostrar a aba de Análise de Produção
 def mostrar_aba_analise_producao():
@@ -320,143 +484,154 @@ def mostrar_aba_analise_producao():
     st.title("Análise de Produção de Manobristas")
     st.markdown("### Ferramenta para análise de produtividade de manobristas baseada em arquivos Excel")
     st.markdown("## Seleção de Arquivos")
-    st.markdown("Selecione um ou dois arquivos Excel (.xls ou .xlsx) para análise.")
+    
+    # Origem dos dados: arquivos enviados agora ou histórico acumulado por período
+    fonte = st.radio("Origem dos dados", ["Arquivos Excel", "Histórico acumulado"], horizontal=True,
+                     key="fonte_dados",
+                     help="O histórico reúne as movimentações de todos os arquivos já processados, sem repetições")
+    usar_historico = fonte == "Histórico acumulado"
+    
+    arquivos = []
+    adicionar_historico = False
+    periodo = None
+    if usar_historico:
+        dias = get_history_store().dates()
+        if not dias:
+            st.info("O histórico está vazio. Processe arquivos Excel com a opção 'Adicionar ao histórico' marcada.")
+        else:
+            # Padrão: mês corrente até o último dia registrado
+            fim_padrao = dias[-1]
+            inicio_padrao = max(fim_padrao.replace(day=1), dias[0])
+            periodo = st.date_input("Período", value=(inicio_padrao, fim_padrao),
+                                    min_value=dias[0], max_value=dias[-1], format="DD/MM/YYYY",
+                                    key="periodo_historico")
+            st.caption(f"Histórico disponível de {dias[0]:%d/%m/%Y} a {dias[-1]:%d/%m/%Y} ({len(dias)} dia(s)).")
+    else:
+        st.markdown("Selecione um ou mais arquivos Excel (.xls ou .xlsx) para análise. Vários arquivos são processados em paralelo.")
 
-    # File upload widgets
-    col1, col2 = st.columns(2)
-    with col1:
-        file1 = st.file_uploader("Selecione o primeiro arquivo Excel", 
-                                type=["xls", "xlsx"], 
-                                help="Formato aceito: Excel (.xls ou .xlsx)",
-                                key="file_upload_1")
+        # File upload widget
+        arquivos = st.file_uploader("Selecione os arquivos Excel", 
+                                    type=["xls", "xlsx"], 
+                                    accept_multiple_files=True,
+                                    help="Formato aceito: Excel (.xls ou .xlsx). É possível selecionar vários arquivos de uma vez.",
+                                    key="file_upload")
+        arquivos = list(arquivos or [])
         
         # Opção para usar arquivo de exemplo
         use_sample_file = st.checkbox("Usar arquivo de exemplo", value=False, 
                                      help="Marque esta opção para carregar o arquivo de exemplo incluído no sistema")
         
         if use_sample_file:
-            file1 = "attached_assets/MovimentacaoVeiculos (19).xlsx"
+            arquivos.insert(0, "attached_assets/MovimentacaoVeiculos (19).xlsx")
             st.success("Arquivo de exemplo selecionado!")
-
-    with col2:
-        file2 = st.file_uploader("Selecione o segundo arquivo Excel (opcional)", 
-                                type=["xls", "xlsx"], 
-                                help="Formato aceito: Excel (.xls ou .xlsx)",
-                                key="file_upload_2")
+        
+        adicionar_historico = st.checkbox("Adicionar ao histórico", value=True, key="adicionar_historico",
+                                          help="Incorpora as movimentações ao histórico acumulado. Movimentações já registradas não são duplicadas.")
 
     # Filter options
     st.markdown("## Opções de Filtro")
     
     col1, col2 = st.columns(2)
     with col1:
-        excluir_terceiros = st.checkbox("Excluir terceiros (teclight, etc.)", value=True,
+        excluir_terceiros = st.checkbox("Excluir terceiros (teclight, etc.)", key="excluir_terceiros",
                                     help="Marque para mostrar apenas funcionários do setor, incluindo chofer e excluindo outros terceirizados como teclight")
     
     with col2:
-        apenas_cadastrados = st.checkbox("Mostrar apenas funcionários cadastrados", value=False,
+        apenas_cadastrados = st.checkbox("Mostrar apenas funcionários cadastrados", key="apenas_cadastrados",
                                         help="Marque para mostrar apenas os funcionários que estão cadastrados no sistema")
 
     # Process button
-    process_btn = st.button("Processar Arquivos", use_container_width=True)
+    process_btn = st.button("Processar Arquivos", use_container_width=True, key="btn_processar")
 
     # Check if we have already processed data that should be displayed
     show_results = False
     if 'result_df' in st.session_state and st.session_state.result_df is not None:
-        # Mostrar dados já processados
-        result_df = st.session_state.result_df
+        # Mostrar dados já processados, com os filtros aplicados no processamento
+        result_df = resultado_filtrado()
         show_results = True
         st.success("Exibindo dados processados anteriormente. Para processar novos arquivos, carregue-os e clique em 'Processar Arquivos'.")
     
     # Processing logic
     if process_btn:
-        if not file1 and not file2:
+        if usar_historico and (not periodo or len(periodo) != 2):
+            st.error("Selecione a data inicial e a data final do período.")
+        elif not usar_historico and not arquivos:
             st.error("Selecione pelo menos um arquivo Excel para processar.")
         else:
             with st.spinner("Processando dados..."):
                 # Process files
-                df1 = process_excel_file(file1) if file1 else None
-                df2 = process_excel_file(file2) if file2 else None
+                if usar_historico:
+                    processados = []
+                    resultado_historico = process_history(*periodo)
+                else:
+                    st.session_state.historico_periodo = None
+                    with span('ingest', arquivos=len(arquivos)):
+                        processados = process_excel_files(arquivos, adicionar_historico)
                 
-                dataframes = [df for df in [df1, df2] if df is not None]
+                # Manter na sessão apenas os arquivos desta análise
+                datasets.retain([chave for chave, _, _ in processados])
                 
-                if not dataframes:
+                dataframes = [df for _, df, _ in processados]
+                
+                if usar_historico and resultado_historico.empty:
+                    st.error("Nenhuma movimentação registrada no histórico para o período selecionado.")
+                elif not usar_historico and not dataframes:
                     st.error("Não foi possível processar os arquivos selecionados.")
                 else:
-                    # Aggregate data
-                    result_df = aggregate_driver_data(dataframes)
+                    # Aggregate data (no histórico, já somado pelo resumo diário)
+                    # Nos arquivos, combinando as contagens de cada um
+                    if usar_historico:
+                        result_df = resultado_historico
+                    else:
+                        result_df = aggregate_counts([contagens for _, _, contagens in processados])
                     
                     # Salvar dados na sessão para uso em outras abas
                     st.session_state.dataframes = dataframes
                     
-                    # Guardar o resultado na session_state para reuso
+                    # Guardar o resultado na session_state para reuso (o filtrado é guardado abaixo)
                     st.session_state.result_df = result_df
+                    st.session_state.analyzed_data = None
                     st.session_state.processed_files = True
                     
+                    # Registrar os arquivos da análise para restaurar a sessão pelo token
+                    get_session_index().update(
+                        st.session_state.session_id,
+                        [(chave, datasets.get(chave)['nome_arquivo']) for chave in datasets.keys()],
+                        [dia.isoformat() for dia in periodo] if usar_historico else None,
+                        {'excluir_terceiros': excluir_terceiros, 'apenas_cadastrados': apenas_cadastrados}
+                    )
+                    
                     if result_df.empty:
                         st.warning("Nenhum dado de manobrista encontrado nos arquivos.")
                     else:
-                        # Contador de filtros aplicados
-                        filtros_aplicados = 0
-                        
-                        # Guardar variáveis para identificar status "em saída"
-                        saida_keywords = ['em saida', 'em saída', 'saida', 'saída']
-                        st.session_state.saida_keywords = saida_keywords
+                        # Filtros de terceiros e de funcionários cadastrados
+                        result_df, resumo_filtros = aplicar_filtros(result_df, excluir_terceiros, apenas_cadastrados)
+                        filtros_aplicados = resumo_filtros['aplicados']
                         
-                        # Filter out terceiros if option is checked
-                        if excluir_terceiros:
-                            # Palavras-chave que identificam funcionários terceirizados
-                            # Removemos 'chofer' e 'choffer' conforme solicitado
-                            terceiros_keywords = ['teclight', 'techlight', 'teclighit', 'pdi', 'ddr']
-                            
-                            # Criar função para verificar se é terceirizado
-                            def is_terceiro(nome):
-                                nome_lower = nome.lower()
-                                for keyword in terceiros_keywords:
-                                    if keyword in nome_lower:
-                                        return True
-                                return False
-                            
-                            # Filtrar o DataFrame para remover terceirizados
-                            tamanho_antes = len(result_df)
-                            filtered_df = result_df[~result_df['MANOBRISTA'].apply(is_terceiro)]
-                            
-                            # Mostrar mensagem informativa
-                            if len(filtered_df) < tamanho_antes:
-                                qtd_filtrados = tamanho_antes - len(filtered_df)
-                                st.info(f"Foram filtrados {qtd_filtrados} manobristas terceirizados.")
-                                filtros_aplicados += 1
-                            
-                            result_df = filtered_df
+                        # Mostrar mensagens informativas
+                        if resumo_filtros['terceiros']:
+                            st.info(f"Foram filtrados {resumo_filtros['terceiros']} manobristas terceirizados.")
                         
-                        # Filtrar apenas funcionários cadastrados
                         if apenas_cadastrados:
-                            tamanho_antes = len(result_df)
-                            
-                            # Verificar cada manobrista no banco de dados
-                            funcionarios_registrados = []
-                            
-                            for _, row in result_df.iterrows():
-                                matricula = row['MATRICULA']
-                                
-                                # Verificar se a matrícula está no banco de dados
-                                employee = db.get_employee_by_matricula(matricula)
-                                if employee is not None and employee['ativo']:
-                                    funcionarios_registrados.append(matricula)
-                            
-                            # Aplicar filtro
-                            if funcionarios_registrados:
-                                filtered_df = result_df[result_df['MATRICULA'].isin(funcionarios_registrados)]
-                                
-                                # Mostrar mensagem informativa
-                                if len(filtered_df) < tamanho_antes:
-                                    qtd_filtrados = tamanho_antes - len(filtered_df)
-                                    st.info(f"Foram filtrados {qtd_filtrados} manobristas não cadastrados no sistema.")
-                                    filtros_aplicados += 1
-                                
-                                result_df = filtered_df
-                            else:
+                            if resumo_filtros['cadastrados'] is None:
                                 if len(result_df) > 0:
                                     st.warning("Nenhum dos manobristas está cadastrado no sistema. Não foi possível aplicar o filtro.")
+                            elif resumo_filtros['cadastrados']:
+                                st.info(f"Foram filtrados {resumo_filtros['cadastrados']} manobristas não cadastrados no sistema.")
+                            
+                            # Listar as matrículas sem cadastro para conferência
+                            nao_encontrados = resumo_filtros['nao_encontrados']
+                            if not nao_encontrados.empty:
+                                with st.expander(f"Matrículas não encontradas no cadastro ({len(nao_encontrados)})"):
+                                    st.dataframe(
+                                        nao_encontrados[['MATRICULA', 'MANOBRISTA', 'TOTAL']],
+                                        column_config={
+                                            "MATRICULA": st.column_config.TextColumn("Matrícula"),
+                                            "MANOBRISTA": st.column_config.TextColumn("Nome"),
+                                            "TOTAL": st.column_config.NumberColumn("Total")
+                                        },
+                                        hide_index=True
+                                    )
                         
                         # Apenas guardamos os dados na sessão sem mostrar o dashboard imediatamente
                         # Armazenar informações de filtros aplicados
@@ -476,14 +651,12 @@ def mostrar_aba_analise_producao():
         
         # Se estamos mostrando dados processados anteriormente, recuperar as variáveis necessárias
         if show_results and not process_btn:
-            result_df = st.session_state.result_df
+            result_df = resultado_filtrado()
             # Definir as variáveis necessárias que podem não estar definidas
             if 'filtros_aplicados' in st.session_state:
                 filtros_aplicados = st.session_state.filtros_aplicados
             else:
                 filtros_aplicados = 0
-            if 'saida_keywords' not in st.session_state:
-                st.session_state.saida_keywords = ['em saida', 'em saída', 'saida', 'saída']
                 
         # Mensagem especial quando aplicados múltiplos filtros
         if 'filtros_aplicados' in st.session_state and st.session_state.filtros_aplicados > 0:
@@ -542,47 +715,28 @@ def mostrar_aba_analise_producao():
         
         # Mostrar os top N manobristas por produtividade
         top_n = min(10, len(result_df))
-        top_data = result_df.head(top_n)
+        
+        # Os gráficos são montados uma única vez por resultado e reaproveitados
+        # nas próximas execuções (ex: ao marcar uma opção) e por outras sessões
+        figuras = get_figure_cache()
+        fingerprint = result_fingerprint(result_df)
         
         # Criar tabs para diferentes visualizações
         vis_tab1, vis_tab2, vis_tab3 = st.tabs(["Ranking", "Distribuição", "Detalhamento"])
         
-        with vis_tab1:
+        with vis_tab1, span('grafico', tipo='ranking'):
             # Gráfico de barras para top manobristas
-            fig1 = px.bar(
-                top_data,
-                x="MANOBRISTA",
-                y="TOTAL",
-                title=f"Top {top_n} Manobristas por Produtividade",
-                color="TOTAL",
-                color_continuous_scale=px.colors.sequential.Viridis
-            )
-            fig1.update_layout(height=500)
+            fig1 = figuras.figure(result_df, 'ranking', top_n, fingerprint)
             st.plotly_chart(fig1, use_container_width=True, key="chart_ranking")
         
-        with vis_tab2:
+        with vis_tab2, span('grafico', tipo='distribuicao'):
             # Gráfico de pizza para distribuição EM SAIDA vs PARQUEADOS
-            fig2 = px.pie(
-                values=[total_em_saida, total_parqueados],
-                names=["Em Saída", "Parqueados"],
-                title="Distribuição de Veículos por Status",
-                color_discrete_sequence=px.colors.qualitative.Set2
-            )
-            fig2.update_traces(textposition='inside', textinfo='percent+label')
-            fig2.update_layout(height=500)
+            fig2 = figuras.figure(result_df, 'distribuicao', top_n, fingerprint)
             st.plotly_chart(fig2, use_container_width=True, key="chart_pie")
         
-        with vis_tab3:
+        with vis_tab3, span('grafico', tipo='detalhamento'):
             # Gráfico de barras empilhadas
-            fig3 = px.bar(
-                top_data,
-                x="MANOBRISTA",
-                y=["EM SAIDA", "PARQUEADOS"],
-                title="Distribuição de Atividades por Manobrista",
-                labels={"value": "Quantidade", "variable": "Tipo"},
-                barmode="stack"
-            )
-            fig3.update_layout(height=500)
+            fig3 = figuras.figure(result_df, 'detalhamento', top_n, fingerprint)
             st.plotly_chart(fig3, use_container_width=True, key="chart_stacked")
         
         # Tabela de resultados
@@ -605,37 +759,52 @@ def mostrar_aba_analise_producao():
         # Export options
         st.markdown("### Exportar Resultados")
         
-        col1, col2 = st.columns(2)
+        col1, col2, col3, col4 = st.columns(4)
         
+        # Os arquivos são gerados apenas quando o download é pedido (ver export_data)
         with col1:
-            if st.button("Exportar para Excel", key="dashboard_export_excel", use_container_width=True):
-                # Create Excel file
-                excel_buffer = BytesIO()
-                result_df.to_excel(excel_buffer, index=False)
-                excel_data = excel_buffer.getvalue()
-                
-                st.download_button(
-                    label="Download Excel",
-                    data=excel_data,
-                    file_name="analise_manobristas.xlsx",
-                    mime="application/vnd.ms-excel",
-                    use_container_width=True,
-                    key="dashboard_download_excel"
-                )
+            st.download_button(
+                label="Exportar para Excel",
+                data=export_data(result_df, 'xlsx', "Exportar para Excel", fingerprint),
+                file_name="analise_manobristas.xlsx",
+                mime=MIME_TYPES['xlsx'],
+                on_click="ignore",
+                use_container_width=True,
+                key="dashboard_export_excel"
+            )
         
         with col2:
-            if st.button("Exportar para CSV", key="dashboard_export_csv", use_container_width=True):
-                # Create CSV file
-                csv_data = result_df.to_csv(index=False).encode('utf-8')
-                
-                st.download_button(
-                    label="Download CSV",
-                    data=csv_data,
-                    file_name="analise_manobristas.csv",
-                    mime="text/csv",
-                    use_container_width=True,
-                    key="dashboard_download_csv"
-                )
+            st.download_button(
+                label="Exportar para CSV",
+                data=export_data(result_df, 'csv', "Exportar para CSV", fingerprint),
+                file_name="analise_manobristas.csv",
+                mime=MIME_TYPES['csv'],
+                on_click="ignore",
+                use_container_width=True,
+                key="dashboard_export_csv"
+            )
+        
+        with col3:
+            st.download_button(
+                label="Exportar para Parquet",
+                data=export_data(result_df, 'parquet', "Exportar para Parquet", fingerprint, SCHEMA_RESULTADO),
+                file_name="analise_manobristas.parquet",
+                mime=MIME_TYPES['parquet'],
+                on_click="ignore",
+                use_container_width=True,
+                key="dashboard_export_parquet"
+            )
+        
+        with col4:
+            st.download_button(
+                label="Exportar para Arrow",
+                data=export_data(result_df, 'arrow', "Exportar para Arrow", fingerprint, SCHEMA_RESULTADO),
+                file_name="analise_manobristas.arrow",
+                mime=MIME_TYPES['arrow'],
+                on_click="ignore",
+                use_container_width=True,
+                key="dashboard_export_arrow"
+            )
     
     # Mostrar informações sobre como usar os dados
     st.markdown("""
@@ -708,17 +877,50 @@ def mostrar_aba_gerenciar_funcionarios():
                 )
                 
                 # Export options
-                if st.button("Exportar Lista de Manobristas", use_container_width=True, key="export_manobristas"):
-                    excel_buffer = BytesIO()
-                    filtered_df.to_excel(excel_buffer, index=False)
-                    excel_data = excel_buffer.getvalue()
-                    
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
                     st.download_button(
-                        label="Download Excel",
-                        data=excel_data,
+                        label="Exportar Lista de Manobristas",
+                        data=export_data(filtered_df, 'xlsx', "Exportar Lista de Manobristas"),
                         file_name="manobristas.xlsx",
-                        mime="application/vnd.ms-excel",
-                        use_container_width=True
+                        mime=MIME_TYPES['xlsx'],
+                        on_click="ignore",
+                        use_container_width=True,
+                        key="export_manobristas"
+                    )
+                
+                with col2:
+                    # CSV no mesmo formato de funcionarios.csv, para edição no Excel
+                    st.download_button(
+                        label="Exportar CSV",
+                        data=export_data(filtered_df, 'csv', "Exportar Lista de Manobristas"),
+                        file_name="funcionarios.csv",
+                        mime="text/csv",
+                        use_container_width=True,
+                        key="export_manobristas_csv"
+                    )
+                
+                with col3:
+                    st.download_button(
+                        label="Exportar Parquet",
+                        data=export_data(filtered_df, 'parquet', "Exportar Lista de Manobristas", schema=SCHEMA_FUNCIONARIOS),
+                        file_name="manobristas.parquet",
+                        mime=MIME_TYPES['parquet'],
+                        on_click="ignore",
+                        use_container_width=True,
+                        key="export_manobristas_parquet"
+                    )
+                
+                with col4:
+                    st.download_button(
+                        label="Exportar Arrow",
+                        data=export_data(filtered_df, 'arrow', "Exportar Lista de Manobristas", schema=SCHEMA_FUNCIONARIOS),
+                        file_name="manobristas.arrow",
+                        mime=MIME_TYPES['arrow'],
+                        on_click="ignore",
+                        use_container_width=True,
+                        key="export_manobristas_arrow"
                     )
     
     elif employee_tab == "Cadastrar Manobrista":
@@ -813,6 +1015,66 @@ def mostrar_aba_gerenciar_funcionarios():
                             st.error(message)
 
 # Função para mostrar a aba de Análise de Veículos
+# Formatos da exportação dos veículos de todos os manobristas
+FORMATOS_EXPORTACAO_TODOS = {
+    'xlsx': "Excel (uma planilha por manobrista)",
+    'zip': "ZIP (um arquivo Excel por manobrista)",
+}
+
+# Exportação dos veículos de todos os manobristas, gerada em segundo plano
+# As linhas são agrupadas por manobrista uma única vez (ver bulk_export)
+def mostrar_exportacao_todos(dataframes_completos, indices_manobristas, nomes_por_chave):
+    st.subheader("Exportar veículos de todos os manobristas")
+    
+    formato = st.radio(
+        "Formato:",
+        list(FORMATOS_EXPORTACAO_TODOS),
+        format_func=lambda formato: FORMATOS_EXPORTACAO_TODOS[formato],
+        horizontal=True,
+        key="formato_exportacao_todos"
+    )
+    
+    # Uma exportação por sessão; descartada se os arquivos ou o formato mudarem
+    identificador = f"veiculos-todos:{','.join(datasets.keys())}:{formato}"
+    job = st.session_state.get('exportacao_todos')
+    if job is not None and st.session_state.get('exportacao_todos_id') != identificador:
+        job = None
+    
+    if st.button("Gerar arquivo de todos os manobristas", key="btn_exportar_todos",
+                 disabled=job is not None and not job.done):
+        job = VehicleExportJob(
+            dataframes_completos, indices_manobristas, nomes_por_chave, formato,
+            log=get_trace_log(), usuario=st.session_state.user_data.get('username')
+        ).start()
+        st.session_state.exportacao_todos = job
+        st.session_state.exportacao_todos_id = identificador
+    
+    if job is None:
+        return
+    if not job.done:
+        mostrar_progresso_exportacao_todos()
+    elif job.error is not None:
+        st.error(f"Erro ao exportar os veículos: {str(job.error)}")
+    else:
+        st.download_button(
+            label=f"Baixar veículos de {job.total} manobristas",
+            data=job.result,
+            file_name=f"veiculos_manobristas.{formato}",
+            mime=MIME_TYPES[formato],
+            on_click="ignore",
+            use_container_width=True,
+            key="export_vehicles_all"
+        )
+
+# Progresso da exportação em segundo plano, atualizado sem executar a página inteira
+# Ao terminar, a página é executada novamente para mostrar o botão de download
+@st.fragment(run_every=0.5)
+def mostrar_progresso_exportacao_todos():
+    job = st.session_state.get('exportacao_todos')
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"Gerando arquivo... {job.gravados} de {job.total} manobristas")
+
 def mostrar_aba_analise_veiculos():
     # Interface for Vehicle Analysis
     st.title("Análise de Veículos por Funcionário")
@@ -834,87 +1096,63 @@ def mostrar_aba_analise_veiculos():
             result_df = st.session_state.result_df
         else:
             result_df = None
-            
-        if 'saida_keywords' in st.session_state:
-            saida_keywords = st.session_state.saida_keywords
-        else:
-            saida_keywords = ['em saida', 'em saída', 'saida', 'saída']
-            st.session_state.saida_keywords = saida_keywords
+        
+        # Análise pelo histórico: carregar as movimentações do período na primeira consulta
+        if len(datasets) == 0 and st.session_state.get('historico_periodo'):
+            with st.spinner("Carregando movimentações do histórico..."):
+                load_history_movements(*st.session_state.historico_periodo)
         
         # Verificar se temos os dataframes completos para análise detalhada
-        if 'dataframes_completos' not in st.session_state or not st.session_state.dataframes_completos:
+        if len(datasets) == 0:
             st.warning("Informações detalhadas dos veículos não estão disponíveis. Por favor, recarregue os arquivos na aba 'Análise de Produção'.")
         else:
-            dataframes_completos = st.session_state.dataframes_completos
+            dataframes_completos = datasets.frames()
+            indices_manobristas = datasets.indices()
             
-            # Extrair os nomes dos manobristas apenas dos resultados processados
-            all_manobristas = []
+            # Extrair os manobristas (chave -> nome) apenas dos resultados processados
+            nomes_por_chave = {}
             
             # Usar o dataframe de resultados para obter os nomes dos manobristas
             if result_df is not None and not result_df.empty:
-                for _, row in result_df.iterrows():
-                    nome = row['MANOBRISTA']
-                    if nome and nome not in all_manobristas:
-                        all_manobristas.append(nome)
+                chaves = result_driver_keys(result_df)
+                for chave, nome in zip(chaves, result_df['MANOBRISTA']):
+                    if nome and chave not in nomes_por_chave:
+                        nomes_por_chave[chave] = nome
             
-            # Ordenar alfabeticamente
-            all_manobristas.sort()
+            # Ordenar alfabeticamente pelo nome
+            all_manobristas = sorted(nomes_por_chave, key=lambda chave: nomes_por_chave[chave])
             
             # Interface de seleção
             if all_manobristas:
+                mostrar_exportacao_todos(
+                    dataframes_completos, indices_manobristas,
+                    {chave: nomes_por_chave[chave] for chave in all_manobristas}
+                )
+                
                 st.subheader("Selecione um manobrista para análise detalhada de veículos")
                 
                 # Selecionar funcionário
-                funcionario_selecionado = st.selectbox(
+                chave_selecionada = st.selectbox(
                     "Manobrista:",
-                    all_manobristas
+                    all_manobristas,
+                    format_func=lambda chave: nomes_por_chave[chave]
                 )
                 
-                if funcionario_selecionado:
+                if chave_selecionada:
+                    funcionario_selecionado = nomes_por_chave[chave_selecionada]
                     st.subheader(f"Análise de veículos para: {funcionario_selecionado}")
                     
-                    # Extrair detalhes dos veículos movimentados por este funcionário
-                    veiculos = []
-                    
-                    for df in dataframes_completos:
-                        if 'Manobrista' in df.columns and 'Status' in df.columns:
-                            # Filtrar linhas do funcionário selecionado
-                            funcionario_rows = df[df['Manobrista'].str.contains(funcionario_selecionado, case=False, na=False)]
-                            
-                            for _, row in funcionario_rows.iterrows():
-                                status = row['Status'].upper() if isinstance(row['Status'], str) else ''
-                                chassi = row['Chassi'] if 'Chassi' in df.columns else ''
-                                versao = row['Versão do modelo'] if 'Versão do modelo' in df.columns else ''
-                                cor = row['Cor'] if 'Cor' in df.columns else ''
-                                descricao = row['Descrição'] if 'Descrição' in df.columns else ''
-                                
-                                # Determinar se é saída ou parqueado
-                                is_saida = False
-                                for keyword in saida_keywords:
-                                    if keyword.upper() in status:
-                                        is_saida = True
-                                        break
-                                
-                                tipo = "EM SAÍDA" if is_saida else "PARQUEADO"
-                                
-                                veiculos.append({
-                                    'Chassi': chassi,
-                                    'Versão': versao,
-                                    'Cor': cor,
-                                    'Descrição': descricao,
-                                    'Status': status,
-                                    'Tipo': tipo
-                                })
+                    # Extrair detalhes dos veículos movimentados por este funcionário pelo índice
+                    df_veiculos = vehicles_for(dataframes_completos, indices_manobristas, chave_selecionada)
                     
                     # Mostrar o total de veículos encontrados
-                    if veiculos:
-                        df_veiculos = pd.DataFrame(veiculos)
+                    if not df_veiculos.empty:
                         total_veiculos = len(df_veiculos)
                         st.markdown(f"**Total de veículos movimentados: {total_veiculos}**")
                         
                         # Contagem por tipo
-                        saidas = df_veiculos[df_veiculos['Tipo'] == 'EM SAÍDA'].shape[0]
-                        parqueados = df_veiculos[df_veiculos['Tipo'] == 'PARQUEADO'].shape[0]
+                        saidas = df_veiculos[df_veiculos['Tipo'] == STATUS_EM_SAIDA].shape[0]
+                        parqueados = df_veiculos[df_veiculos['Tipo'] == STATUS_PARQUEADO].shape[0]
                         
                         # Métricas
                         col1, col2 = st.columns(2)
@@ -953,18 +1191,44 @@ def mostrar_aba_analise_veiculos():
                         )
                         
                         # Opção para exportar detalhes
-                        if st.button("Exportar Detalhes dos Veículos", key="export_vehicles", use_container_width=True):
-                            # Create Excel file
-                            excel_buffer = BytesIO()
-                            df_veiculos.to_excel(excel_buffer, index=False)
-                            excel_data = excel_buffer.getvalue()
-                            
+                        # O arquivo fica em cache pelo conteúdo dos veículos, que também muda
+                        # quando o período do histórico ou os arquivos carregados mudam
+                        fingerprint_veiculos = f"veiculos:{result_fingerprint(df_veiculos)}"
+                        col1, col2, col3 = st.columns(3)
+                        
+                        with col1:
                             st.download_button(
-                                label=f"Download Detalhes ({funcionario_selecionado})",
-                                data=excel_data,
+                                label="Exportar Detalhes dos Veículos",
+                                data=export_data(df_veiculos, 'xlsx', "Exportar Detalhes dos Veículos", fingerprint_veiculos),
                                 file_name=f"veiculos_{funcionario_selecionado}.xlsx",
-                                mime="application/vnd.ms-excel",
-                                use_container_width=True
+                                mime=MIME_TYPES['xlsx'],
+                                on_click="ignore",
+                                use_container_width=True,
+                                key="export_vehicles"
+                            )
+                        
+                        with col2:
+                            st.download_button(
+                                label="Exportar Parquet",
+                                data=export_data(df_veiculos, 'parquet', "Exportar Detalhes dos Veículos",
+                                                 fingerprint_veiculos, SCHEMA_VEICULOS),
+                                file_name=f"veiculos_{funcionario_selecionado}.parquet",
+                                mime=MIME_TYPES['parquet'],
+                                on_click="ignore",
+                                use_container_width=True,
+                                key="export_vehicles_parquet"
+                            )
+                        
+                        with col3:
+                            st.download_button(
+                                label="Exportar Arrow",
+                                data=export_data(df_veiculos, 'arrow', "Exportar Detalhes dos Veículos",
+                                                 fingerprint_veiculos, SCHEMA_VEICULOS),
+                                file_name=f"veiculos_{funcionario_selecionado}.arrow",
+                                mime=MIME_TYPES['arrow'],
+                                on_click="ignore",
+                                use_container_width=True,
+                                key="export_vehicles_arrow"
                             )
                     else:
                         st.info(f"Não foram encontrados detalhes de veículos para o funcionário {funcionario_selecionado}")
@@ -982,12 +1246,25 @@ def login():
         submit = st.form_submit_button("Entrar")
         
         if submit:
-            authenticated, user_data = auth.authenticate(username, password)
+            # Tentativas erradas são limitadas por usuário e por endereço IP
+            ip = st.context.ip_address
+            espera = auth.limiter.retry_after(username, ip)
+            if espera > 0:
+                st.error(f"Muitas tentativas de login sem sucesso. Tente novamente em {int(espera) + 1} segundos.")
+                return
+            
+            authenticated, user_data = auth.authenticate(username, password, ip=ip)
             
             if authenticated:
                 st.session_state.logged_in = True
                 st.session_state.user_data = user_data
                 st.session_state.show_login = False
+                
+                # Token na URL: atualizar a página ou reconectar não exige novo login
+                tokens = get_session_tokens()
+                get_session_index().start(st.session_state.session_id, user_data['username'],
+                                          time.time() + tokens.ttl)
+                st.query_params[PARAMETRO_SESSAO] = tokens.issue(user_data['username'], st.session_state.session_id)
                 st.success(f"Bem-vindo, {user_data['nome_completo']}!")
                 st.rerun()
             else:
@@ -995,6 +1272,17 @@ def login():
 
 # Função para logout
 def logout():
+    # Encerrar a sessão no servidor: tokens desta sessão deixam de ser aceitos
+    get_session_index().revoke(st.session_state.session_id, time.time() + get_session_tokens().ttl)
+    if PARAMETRO_SESSAO in st.query_params:
+        del st.query_params[PARAMETRO_SESSAO]
+    
+    # Um novo login começa uma nova sessão, sem os dados da anterior
+    st.session_state.session_id = uuid.uuid4().hex
+    for chave in ('result_df', 'analyzed_data', 'dataframes', 'historico_periodo', 'filtros_aplicados'):
+        st.session_state.pop(chave, None)
+    st.session_state.processed_files = False
+    
     st.session_state.logged_in = False
     st.session_state.user_data = None
     st.session_state.show_login = True
@@ -1162,6 +1450,49 @@ def mostrar_gerenciar_usuarios():
                             st.error(message)
 
 # Função para mostrar o conteúdo com base na aba ativa selecionada
+# Ações da aba de produção cuja execução é medida (chave do botão -> nome da execução)
+# (as exportações são medidas quando o arquivo é gerado, ver export_data)
+ACOES_MEDIDAS = {
+    'btn_processar': 'Processar Arquivos',
+}
+
+# Retorna o nome da ação medida disparada nesta execução do script (ou None)
+def acao_medida():
+    for chave, nome in ACOES_MEDIDAS.items():
+        if st.session_state.get(chave):
+            return nome
+    return None
+
+# Painel com o tempo (e a memória) de cada etapa da última execução medida
+def mostrar_painel_desempenho():
+    with st.expander("Desempenho"):
+        st.checkbox("Medir memória (tracemalloc)", key="medir_memoria",
+                    help="Registra a variação e o pico de memória de cada etapa. Torna o processamento mais lento.")
+        
+        registros = st.session_state.get('ultimo_trace')
+        if not registros:
+            st.info("Nenhuma execução medida nesta sessão. Clique em 'Processar Arquivos' para medir as etapas.")
+            return
+        
+        execucao = registros[0]
+        st.markdown(f"**{execucao['execucao']}** em {execucao['iniciado_em']}: "
+                    f"{execucao['execucao_ms']:.0f} ms no total")
+        
+        tabela = pd.DataFrame({
+            'Etapa': [' ' * r['nivel'] + r['nome'] for r in registros],
+            'Detalhes': [', '.join(f"{k}={v}" for k, v in r['atributos'].items()) for r in registros],
+            'Início (ms)': [r['inicio_ms'] for r in registros],
+            'Duração (ms)': [r['duracao_ms'] for r in registros],
+        })
+        if 'memoria_kb' in execucao:
+            tabela['Memória (KB)'] = [r.get('memoria_kb') for r in registros]
+            tabela['Pico (KB)'] = [r.get('pico_kb') for r in registros]
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+        if 'memoria_kb' in execucao and any(r.get('pico_kb') is None for r in registros):
+            st.caption("Etapas sem memória: outra sessão mediu memória ao mesmo tempo e o tracemalloc "
+                       "é compartilhado pelo processo, então os valores não seriam só desta execução.")
+        st.caption(f"Histórico completo em {get_trace_log().log_file} (JSON lines)")
+
 def mostrar_conteudo():
     # Verificar login
     if not st.session_state.logged_in:
@@ -1182,6 +1513,11 @@ def mostrar_conteudo():
     st.sidebar.markdown(f"**Usuário:** {st.session_state.user_data['nome_completo']}")
     st.sidebar.markdown(f"**Nível:** {st.session_state.user_data['nivel_acesso']}")
     
+    # Memória ocupada pelos arquivos processados nesta sessão
+    if len(datasets) > 0:
+        memoria_mb = datasets.memory_usage() / (1024 * 1024)
+        st.sidebar.markdown(f"**Dados em memória:** {memoria_mb:.1f} MB ({len(datasets)} arquivo(s))")
+    
     # Verificar se deve mostrar a tela de gerenciamento de usuários
     if st.session_state.show_gerenciar_usuarios:
         if st.session_state.user_data['nivel_acesso'] == 'admin':
@@ -1193,11 +1529,30 @@ def mostrar_conteudo():
     
     # Mostrar conteúdo normal baseado na aba ativa
     if st.session_state.active_tab == 0:
-        mostrar_aba_analise_producao()
+        # Processamento e exportações são medidos etapa por etapa
+        acao = acao_medida()
+        if acao:
+            with trace_run(acao, log=get_trace_log(),
+                           medir_memoria=st.session_state.get('medir_memoria', False),
+                           usuario=st.session_state.user_data.get('username')) as trace:
+                mostrar_aba_analise_producao()
+            if trace.spans:
+                st.session_state.ultimo_trace = trace.records()
+        else:
+            mostrar_aba_analise_producao()
+        
+        if st.session_state.user_data['nivel_acesso'] == 'admin':
+            mostrar_painel_desempenho()
     elif st.session_state.active_tab == 1:
         mostrar_aba_gerenciar_funcionarios()
     else:
         mostrar_aba_analise_veiculos()
 
+# Sessão restaurada pelo token: reconstruir os resultados antes de mostrar as abas
+if sessao_restaurada is not None:
+    with trace_run("Restaurar Sessão", log=get_trace_log(),
+                   usuario=st.session_state.user_data.get('username')):
+        restore_session_data(sessao_restaurada)
+
 # Executar a função para mostrar o conteúdo com base na aba ativa
 mostrar_conteudo()
\ No newline at end of file
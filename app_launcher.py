@@ -23,7 +23,20 @@ import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
 from io import BytesIO
+from driver_analysis import filter_registered
 from employee_db import EmployeeDatabase
+from export_writer import write_xlsx
+from producao.core import (
+    STATUS_EM_SAIDA, STATUS_OUTRO, STATUS_PARQUEADO, aggregate, analysis_frame,
+    build_driver_index, ingest, result_driver_keys, vehicles_for
+)
+
+# Rótulos exibidos para cada classe de status
+TIPOS_MOVIMENTACAO = {
+    STATUS_EM_SAIDA: "Em Saída (Expedição)",
+    STATUS_PARQUEADO: "Parqueado",
+    STATUS_OUTRO: "Não Classificado",
+}
 
 # Verificar se estamos executando como executável ou diretamente
 # Isso é necessário para o PyInstaller encontrar os arquivos
@@ -46,6 +59,13 @@ st.set_page_config(
 # Inicializar banco de dados
 db = EmployeeDatabase()
 
+# Dados completos de cada arquivo e índices de manobristas para a análise de veículos
+if 'dataframes_completos' not in st.session_state:
+    st.session_state.dataframes_completos = []
+
+if 'indices_completos' not in st.session_state:
+    st.session_state.indices_completos = []
+
 # Configurar estados de sessão para abas
 if 'current_tab' not in st.session_state:
     st.session_state.current_tab = "Análise"
@@ -67,131 +87,24 @@ if st.sidebar.button("🚗 Análise de Veículos", use_container_width=True):
 st.title("Análise de Produção de Manobristas")
 
 # Function to process Excel file and extract driver data
+# A leitura, a classificação de status e a padronização dos nomes ficam em producao.core
 def process_excel_file(uploaded_file):
     try:
-        # Read Excel file
-        # Se estiver executando como executável e o uploaded_file for um caminho de string
-        if getattr(sys, 'frozen', False) and isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        else:
-            # Modo normal - uploaded_file é um objeto de upload do Streamlit
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        
-        # Guardar o DataFrame completo para uso na análise de veículos
-        df_completo = df.copy()
+        df, cabecalho = ingest(uploaded_file)
         
-        # Verificar e renomear colunas importantes se necessário
-        colunas_esperadas = {
-            'Chassi': 0,          # Coluna A
-            'Versão do modelo': 2, # Coluna C
-            'Cor': 3,             # Coluna D
-            'Status': 4,          # Coluna E
-            'Descrição': 5,       # Coluna F
-            'Manobrista': 7       # Coluna H
-        }
+        # Clean data - remove rows with empty manobrista
+        df_analise = analysis_frame(df)
         
-        # Renomear colunas conforme necessário
-        for nome_coluna, indice in colunas_esperadas.items():
-            if nome_coluna not in df.columns and len(df.columns) > indice:
-                df.rename(columns={df.columns[indice]: nome_coluna}, inplace=True)
-                df_completo.rename(columns={df_completo.columns[indice]: nome_coluna}, inplace=True)
+        # Guardar o DataFrame completo e o índice de manobristas para a análise de veículos
+        st.session_state.dataframes_completos.append(df)
+        st.session_state.indices_completos.append(build_driver_index(df))
         
-        # Extract relevant columns for aggregation (E=Status, H=Manobrista)
-        try:
-            status_col = 'Status' if 'Status' in df.columns else df.columns[4]
-            manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[7]
-            
-            # Clean data - remove rows with empty manobrista
-            df_analise = df[[status_col, manobrista_col]].dropna(subset=[manobrista_col])
-            
-            # Convert manobrista entries to uppercase for consistency
-            df_analise[manobrista_col] = df_analise[manobrista_col].str.upper()
-            
-            # Também garantir consistência em df_completo
-            if manobrista_col in df_completo.columns:
-                df_completo[manobrista_col] = df_completo[manobrista_col].fillna('').astype(str).str.upper()
-            
-            # Guardar o DataFrame completo na sessão para uso posterior
-            if 'dataframes_completos' not in st.session_state:
-                st.session_state.dataframes_completos = []
-            
-            st.session_state.dataframes_completos.append(df_completo)
-            
-            return df_analise
-        except Exception as e:
-            st.error(f"Erro ao processar colunas: {str(e)}")
-            st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
-            return None
-            
+        return df_analise
     except Exception as e:
         st.error(f"Erro ao processar arquivo: {str(e)}")
+        st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
         return None
 
-# Function to extract matricula from manobrista name
-def extract_matricula(manobrista_name):
-    # Assuming matricula is at the beginning of the name and follows a pattern
-    # For example: "12345 - JOSE DA SILVA" should return "12345"
-    if isinstance(manobrista_name, str) and '-' in manobrista_name:
-        parts = manobrista_name.split('-', 1)
-        return parts[0].strip()
-    return ""
-
-# Function to aggregate driver data
-def aggregate_driver_data(dataframes):
-    combined_data = {}
-    
-    for df in dataframes:
-        if df is None:
-            continue
-            
-        status_col = 'Status' if 'Status' in df.columns else df.columns[0]
-        manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-        
-        # Group by manobrista and count statuses
-        for _, row in df.iterrows():
-            manobrista = row[manobrista_col]
-            status = row[status_col]
-            
-            if manobrista not in combined_data:
-                matricula = extract_matricula(manobrista)
-                combined_data[manobrista] = {
-                    'MATRICULA': matricula,
-                    'MANOBRISTA': manobrista.split('-')[-1].strip() if '-' in manobrista else manobrista,
-                    'EM SAIDA': 0,
-                    'PARQUEADOS': 0,
-                    'TOTAL': 0
-                }
-            
-            # Update counts based on status
-            status_upper = status.upper()
-            
-            # Verificação mais abrangente para "Em Saída (expedição)"
-            is_saida = False
-            saida_keywords = ['SAIDA', 'SAÍDA', 'EXPEDICAO', 'EXPEDIÇÃO', 'EXPEDIC', 'EXPEDIÇ']
-            
-            for keyword in saida_keywords:
-                if keyword in status_upper:
-                    is_saida = True
-                    break
-            
-            # Se for uma saída
-            if is_saida:
-                combined_data[manobrista]['EM SAIDA'] += 1
-            # Se for um parqueado
-            elif 'PARQUEADO' in status_upper:
-                combined_data[manobrista]['PARQUEADOS'] += 1
-            
-            combined_data[manobrista]['TOTAL'] += 1
-    
-    # Convert to DataFrame
-    result_df = pd.DataFrame(combined_data.values())
-    
-    # Sort by total in descending order
-    if not result_df.empty:
-        result_df = result_df.sort_values('TOTAL', ascending=False)
-    
-    return result_df
-
 # Conteúdo baseado na aba selecionada
 if st.session_state.current_tab == "Análise":
     # Main interface for Analysis tab
@@ -231,6 +144,11 @@ if st.session_state.current_tab == "Análise":
             st.error("Selecione pelo menos um arquivo Excel para processar.")
         else:
             with st.spinner("Processando dados..."):
+                # Descartar os dados do processamento anterior
+                st.session_state.dataframes_completos = []
+                st.session_state.indices_completos = []
+                st.session_state.processed_data = None
+                
                 # Process files
                 df1 = process_excel_file(file1) if file1 else None
                 df2 = process_excel_file(file2) if file2 else None
@@ -241,7 +159,7 @@ if st.session_state.current_tab == "Análise":
                     st.error("Não foi possível processar os arquivos selecionados.")
                 else:
                     # Aggregate data
-                    result_df = aggregate_driver_data(dataframes)
+                    result_df = aggregate(dataframes)
                     
                     if result_df.empty:
                         st.warning("Nenhum dado de manobrista encontrado nos arquivos.")
@@ -279,21 +197,11 @@ if st.session_state.current_tab == "Análise":
                         if apenas_cadastrados:
                             tamanho_antes = len(result_df)
                             
-                            # Verificar cada manobrista no banco de dados
-                            funcionarios_registrados = []
-                            
-                            for _, row in result_df.iterrows():
-                                matricula = row['MATRICULA']
-                                
-                                # Verificar se a matrícula está no banco de dados
-                                employee = db.get_employee_by_matricula(matricula)
-                                if employee is not None and employee['ativo']:
-                                    funcionarios_registrados.append(matricula)
+                            # Comparar todas as matrículas de uma vez com os funcionários ativos
+                            filtered_df, _ = filter_registered(result_df, db.get_active_employees())
                             
                             # Aplicar filtro
-                            if funcionarios_registrados:
-                                filtered_df = result_df[result_df['MATRICULA'].isin(funcionarios_registrados)]
-                                
+                            if not filtered_df.empty:
                                 # Mostrar mensagem informativa
                                 if len(filtered_df) < tamanho_antes:
                                     qtd_filtrados = tamanho_antes - len(filtered_df)
@@ -305,6 +213,9 @@ if st.session_state.current_tab == "Análise":
                                 if len(result_df) > 0:
                                     st.warning("Nenhum dos manobristas está cadastrado no sistema. Não foi possível aplicar o filtro.")
                         
+                        # Guardar o resultado para a análise de veículos
+                        st.session_state.processed_data = result_df
+                        
                         # Display dashboard and metrics
                         st.markdown("## Dashboard - Análise de Produtividade")
                         
@@ -464,48 +375,19 @@ if st.session_state.current_tab == "Análise":
                                 
                                 # Criar e mostrar dados detalhados
                                 with st.expander("Detalhes dos veículos", expanded=True):
-                                    # Preparar lista de veículos do funcionário selecionado
-                                    veiculos_funcionario = []
-                                    
-                                    # Processar novamente os dados originais para extrair detalhes dos veículos
-                                    for df in dataframes:
-                                        if df is None:
-                                            continue
-                                            
-                                        status_col = 'Status' if 'Status' in df.columns else df.columns[0]
-                                        manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-                                        
-                                        # Filtrar por manobrista que contém a matrícula selecionada
-                                        for _, row in df.iterrows():
-                                            manobrista = row[manobrista_col]
-                                            if matricula_selecionada in manobrista:
-                                                status = row[status_col]
-                                                
-                                                # Determinar tipo de movimentação
-                                                status_upper = status.upper()
-                                                tipo_movimentacao = "Não Classificado"
-                                                
-                                                # Verificar se é saída
-                                                is_saida = False
-                                                for keyword in saida_keywords:
-                                                    if keyword in status_upper:
-                                                        is_saida = True
-                                                        break
-                                                
-                                                if is_saida:
-                                                    tipo_movimentacao = "Em Saída (Expedição)"
-                                                elif 'PARQUEADO' in status_upper:
-                                                    tipo_movimentacao = "Parqueado"
-                                                
-                                                # Adicionar à lista de veículos
-                                                veiculos_funcionario.append({
-                                                    "Status": status,
-                                                    "Tipo de Movimentação": tipo_movimentacao
-                                                })
+                                    # Veículos do funcionário selecionado, pelo índice de manobristas
+                                    veiculos = vehicles_for(
+                                        st.session_state.dataframes_completos,
+                                        st.session_state.indices_completos,
+                                        matricula_selecionada.strip().upper()
+                                    )
                                     
                                     # Criar DataFrame com os veículos
-                                    if veiculos_funcionario:
-                                        df_veiculos = pd.DataFrame(veiculos_funcionario)
+                                    if not veiculos.empty:
+                                        df_veiculos = pd.DataFrame({
+                                            "Status": veiculos['Status'],
+                                            "Tipo de Movimentação": veiculos['Tipo'].map(TIPOS_MOVIMENTACAO)
+                                        })
                                         
                                         # Mostrar contagem por tipo de movimentação
                                         st.subheader(f"Resumo de Veículos - {funcionario_selecionado}")
@@ -535,7 +417,7 @@ if st.session_state.current_tab == "Análise":
                                         
                                         # Download do relatório detalhado
                                         excel_buffer = BytesIO()
-                                        df_veiculos.to_excel(excel_buffer, index=False)
+                                        write_xlsx(df_veiculos, excel_buffer)
                                         excel_data = excel_buffer.getvalue()
                                         
                                         st.download_button(
@@ -555,7 +437,7 @@ if st.session_state.current_tab == "Análise":
                         
                         # Excel export
                         excel_buffer = BytesIO()
-                        result_df.to_excel(excel_buffer, index=False)
+                        write_xlsx(result_df, excel_buffer)
                         excel_data = excel_buffer.getvalue()
                         
                         st.download_button(
@@ -637,7 +519,7 @@ elif st.session_state.current_tab == "Funcionários":
                 # Export options
                 if st.button("Exportar Lista de Funcionários", use_container_width=True):
                     excel_buffer = BytesIO()
-                    filtered_df.to_excel(excel_buffer, index=False)
+                    write_xlsx(filtered_df, excel_buffer)
                     excel_data = excel_buffer.getvalue()
                     
                     st.download_button(
@@ -768,45 +650,27 @@ elif st.session_state.current_tab == "Veículos":
     st.markdown("Visualize os veículos movimentados por cada pessoa diretamente pelo nome.")
     
     # Verificar se algum arquivo foi carregado
-    if 'processed_data' not in st.session_state or not st.session_state.processed_data:
+    if st.session_state.get('processed_data') is None:
         st.warning("Nenhum arquivo Excel carregado. Por favor, vá para a aba 'Análise' e carregue um arquivo Excel antes de usar esta funcionalidade.")
     else:
         # Obter os dados processados
-        dataframes = st.session_state.dataframes
         result_df = st.session_state.processed_data
-        saida_keywords = st.session_state.saida_keywords
         
         # Verificar se temos os dataframes completos para análise detalhada
         if 'dataframes_completos' not in st.session_state or not st.session_state.dataframes_completos:
             st.warning("Informações detalhadas dos veículos não estão disponíveis. Por favor, recarregue os arquivos na aba 'Análise'.")
         else:
             dataframes_completos = st.session_state.dataframes_completos
+            indices_completos = st.session_state.indices_completos
             
-            # Extrair nomes dos manobristas da lista completa
-            all_manobristas = []
+            # Extrair os manobristas (chave -> nome) do resultado processado
+            nomes_por_chave = {}
+            for chave, nome in zip(result_driver_keys(result_df), result_df['MANOBRISTA']):
+                if nome and chave not in nomes_por_chave:
+                    nomes_por_chave[chave] = nome
             
-            for df in dataframes:
-                if df is None:
-                    continue
-                    
-                manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-                
-                # Obter lista única de manobristas
-                for _, row in df.iterrows():
-                    manobrista = row[manobrista_col]
-                    if isinstance(manobrista, str) and manobrista.strip():
-                        # Limpar e formatar o nome
-                        if '-' in manobrista:
-                            # Formato com matrícula: "12345 - NOME"
-                            nome_apenas = manobrista.split('-', 1)[1].strip()
-                        else:
-                            nome_apenas = manobrista.strip()
-                        
-                        if nome_apenas and nome_apenas not in all_manobristas:
-                            all_manobristas.append(nome_apenas)
-            
-            # Ordenar alfabeticamente
-            all_manobristas.sort()
+            # Ordenar alfabeticamente pelo nome
+            all_manobristas = sorted(nomes_por_chave, key=lambda chave: nomes_por_chave[chave])
             
             # Interface de seleção
             if all_manobristas:
@@ -817,144 +681,62 @@ elif st.session_state.current_tab == "Veículos":
                 
                 filtered_manobristas = all_manobristas
                 if search_term:
-                    filtered_manobristas = [nome for nome in all_manobristas if search_term.upper() in nome.upper()]
+                    filtered_manobristas = [
+                        chave for chave in all_manobristas if search_term.upper() in nomes_por_chave[chave].upper()
+                    ]
                 
                 if not filtered_manobristas:
                     st.warning(f"Nenhum funcionário encontrado com o termo '{search_term}'.")
                 else:
                     # Exibir lista de funcionários encontrados
-                    funcionario_selecionado = st.selectbox(
+                    chave_selecionada = st.selectbox(
                         "Selecione um funcionário:",
                         options=[""] + filtered_manobristas,
-                        format_func=lambda x: x if x else "Selecione um funcionário..."
+                        format_func=lambda chave: nomes_por_chave[chave] if chave else "Selecione um funcionário..."
                     )
                     
                     # Se um funcionário foi selecionado
-                    if funcionario_selecionado:
+                    if chave_selecionada:
+                        funcionario_selecionado = nomes_por_chave[chave_selecionada]
+                        
                         # Criar e mostrar dados detalhados
                         with st.expander("Detalhes dos veículos", expanded=True):
-                            # Preparar lista de veículos do funcionário selecionado
-                            veiculos_funcionario = []
-                            
-                            # Processar dados completos para extrair detalhes dos veículos
-                            for df in dataframes_completos:
-                                if df is None:
-                                    continue
-                                
-                                # Verificar quais colunas estão disponíveis
-                                colunas_necessarias = {
-                                    'Chassi': 'Chassi',                  # Coluna A
-                                    'Versão do modelo': 'Versão',        # Coluna C
-                                    'Cor': 'Cor',                        # Coluna D
-                                    'Status': 'Status',                  # Coluna E
-                                    'Descrição': 'Descrição',            # Coluna F
-                                    'Manobrista': 'Manobrista'           # Coluna H
-                                }
-                                
-                                # Mapear nomes de colunas no DataFrame
-                                colunas_mapeadas = {}
-                                for nome_orig, nome_exib in colunas_necessarias.items():
-                                    if nome_orig in df.columns:
-                                        colunas_mapeadas[nome_orig] = nome_exib
-                                    elif nome_orig == 'Chassi' and 0 in df.columns:
-                                        colunas_mapeadas[0] = nome_exib
-                                    elif nome_orig == 'Versão do modelo' and 2 in df.columns:
-                                        colunas_mapeadas[2] = nome_exib
-                                    elif nome_orig == 'Cor' and 3 in df.columns:
-                                        colunas_mapeadas[3] = nome_exib
-                                    elif nome_orig == 'Status' and 4 in df.columns:
-                                        colunas_mapeadas[4] = nome_exib
-                                    elif nome_orig == 'Descrição' and 5 in df.columns:
-                                        colunas_mapeadas[5] = nome_exib
-                                    elif nome_orig == 'Manobrista' and 7 in df.columns:
-                                        colunas_mapeadas[7] = nome_exib
-                                
-                                # Identificar a coluna de manobrista
-                                manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else 7
-                                
-                                # Filtrar por nome do manobrista
-                                for _, row in df.iterrows():
-                                    manobrista = str(row[manobrista_col])
-                                    
-                                    # Verificar se o nome do manobrista contém o funcionário selecionado
-                                    if funcionario_selecionado in manobrista:
-                                        veiculo_info = {}
-                                        
-                                        # Adicionar as informações das colunas disponíveis
-                                        for col_orig, col_exib in colunas_mapeadas.items():
-                                            if col_orig in row.index:
-                                                valor = row[col_orig]
-                                                if pd.isna(valor):  # Verificar se é NaN
-                                                    valor = ""
-                                                veiculo_info[col_exib] = valor
-                                        
-                                        # Determinar tipo de movimentação
-                                        if 'Status' in veiculo_info:
-                                            status_upper = str(veiculo_info['Status']).upper()
-                                            tipo_movimentacao = "Não Classificado"
-                                            
-                                            # Verificar se é saída
-                                            is_saida = False
-                                            for keyword in saida_keywords:
-                                                if keyword in status_upper:
-                                                    is_saida = True
-                                                    break
-                                            
-                                            if is_saida:
-                                                tipo_movimentacao = "Em Saída (Expedição)"
-                                            elif 'PARQUEADO' in status_upper:
-                                                tipo_movimentacao = "Parqueado"
-                                            
-                                            veiculo_info['Tipo de Movimentação'] = tipo_movimentacao
-                                        
-                                        # Adicionar à lista de veículos
-                                        veiculos_funcionario.append(veiculo_info)
+                            # Veículos do funcionário selecionado, pelo índice de manobristas
+                            veiculos = vehicles_for(dataframes_completos, indices_completos, chave_selecionada)
                             
                             # Criar DataFrame com os veículos
-                            if veiculos_funcionario:
-                                df_veiculos = pd.DataFrame(veiculos_funcionario)
+                            if not veiculos.empty:
+                                df_veiculos = veiculos.drop(columns='Tipo')
+                                df_veiculos['Tipo de Movimentação'] = veiculos['Tipo'].map(TIPOS_MOVIMENTACAO)
                                 
                                 # Mostrar contagem por tipo de movimentação
                                 st.subheader(f"Resumo de Veículos - {funcionario_selecionado}")
                                 
-                                # Contar tipos de movimentação se a coluna existe
-                                if 'Tipo de Movimentação' in df_veiculos.columns:
-                                    contagem = df_veiculos['Tipo de Movimentação'].value_counts().reset_index()
-                                    contagem.columns = ['Tipo de Movimentação', 'Quantidade']
-                                    
-                                    # Mostrar gráfico
-                                    fig = px.bar(
-                                        contagem,
-                                        x='Tipo de Movimentação',
-                                        y='Quantidade',
-                                        color='Tipo de Movimentação',
-                                        title=f"Distribuição de Veículos - {funcionario_selecionado}",
-                                        labels={'Quantidade': 'Número de Veículos'}
-                                    )
-                                    st.plotly_chart(fig, use_container_width=True)
+                                contagem = df_veiculos['Tipo de Movimentação'].value_counts().reset_index()
+                                contagem.columns = ['Tipo de Movimentação', 'Quantidade']
+                                
+                                # Mostrar gráfico
+                                fig = px.bar(
+                                    contagem,
+                                    x='Tipo de Movimentação',
+                                    y='Quantidade',
+                                    color='Tipo de Movimentação',
+                                    title=f"Distribuição de Veículos - {funcionario_selecionado}",
+                                    labels={'Quantidade': 'Número de Veículos'}
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
                                 
                                 # Mostrar tabela detalhada
                                 st.subheader("Lista de Veículos Movimentados")
-                                
-                                # Definir a ordem das colunas para exibição (priorizando as colunas solicitadas)
-                                ordem_colunas = ['Chassi', 'Versão', 'Cor', 'Status', 'Descrição', 'Manobrista', 'Tipo de Movimentação']
-                                colunas_exibir = [col for col in ordem_colunas if col in df_veiculos.columns]
-                                
-                                # Adicionar quaisquer outras colunas que possam existir
-                                for col in df_veiculos.columns:
-                                    if col not in colunas_exibir:
-                                        colunas_exibir.append(col)
-                                
-                                # Exibir apenas as colunas disponíveis
                                 st.dataframe(
-                                    df_veiculos[colunas_exibir],
+                                    df_veiculos,
                                     hide_index=False,
                                     use_container_width=True
                                 )
                                 
                                 # Download do relatório detalhado
                                 excel_buffer = BytesIO()
-                                df_veiculos.to_excel(excel_buffer, index=False)
+                                write_xlsx(df_veiculos, excel_buffer)
                                 excel_data = excel_buffer.getvalue()
                                 
                                 st.download_button(
@@ -1012,7 +794,7 @@ elif st.session_state.current_tab == "Veículos":
                 # Export options
                 if st.button("Exportar Lista de Funcionários", use_container_width=True):
                     excel_buffer = BytesIO()
-                    filtered_df.to_excel(excel_buffer, index=False)
+                    write_xlsx(filtered_df, excel_buffer)
                     excel_data = excel_buffer.getvalue()
                     
                     st.download_button(
@@ -1142,14 +924,12 @@ elif st.session_state.current_tab == "Veículos":
         st.markdown("Análise de veículos movimentados por funcionário, baseado nos dados carregados.")
         
         # Verificar se algum arquivo foi carregado
-        if 'processed_data' not in st.session_state or not st.session_state.processed_data:
+        if st.session_state.get('processed_data') is None:
             st.warning("Nenhum arquivo Excel carregado. Por favor, vá para a aba 'Análise' e carregue um arquivo Excel antes de usar esta funcionalidade.")
         else:
             # Obter os dados processados
-            dataframes = st.session_state.dataframes
             result_df = st.session_state.processed_data
             total_manobristas = len(result_df)
-            saida_keywords = st.session_state.saida_keywords
             
             # Get all employees
             employees_df = db.get_all_employees()
@@ -1188,48 +968,19 @@ elif st.session_state.current_tab == "Veículos":
                         
                         # Criar e mostrar dados detalhados
                         with st.expander("Detalhes dos veículos", expanded=True):
-                            # Preparar lista de veículos do funcionário selecionado
-                            veiculos_funcionario = []
-                            
-                            # Processar novamente os dados originais para extrair detalhes dos veículos
-                            for df in dataframes:
-                                if df is None:
-                                    continue
-                                    
-                                status_col = 'Status' if 'Status' in df.columns else df.columns[0]
-                                manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-                                
-                                # Filtrar por manobrista que contém a matrícula selecionada
-                                for _, row in df.iterrows():
-                                    manobrista = row[manobrista_col]
-                                    if matricula_selecionada in str(manobrista):
-                                        status = row[status_col]
-                                        
-                                        # Determinar tipo de movimentação
-                                        status_upper = str(status).upper()
-                                        tipo_movimentacao = "Não Classificado"
-                                        
-                                        # Verificar se é saída
-                                        is_saida = False
-                                        for keyword in saida_keywords:
-                                            if keyword in status_upper:
-                                                is_saida = True
-                                                break
-                                        
-                                        if is_saida:
-                                            tipo_movimentacao = "Em Saída (Expedição)"
-                                        elif 'PARQUEADO' in status_upper:
-                                            tipo_movimentacao = "Parqueado"
-                                        
-                                        # Adicionar à lista de veículos
-                                        veiculos_funcionario.append({
-                                            "Status": status,
-                                            "Tipo de Movimentação": tipo_movimentacao
-                                        })
+                            # Veículos do funcionário selecionado, pelo índice de manobristas
+                            veiculos = vehicles_for(
+                                st.session_state.dataframes_completos,
+                                st.session_state.indices_completos,
+                                matricula_selecionada.strip().upper()
+                            )
                             
                             # Criar DataFrame com os veículos
-                            if veiculos_funcionario:
-                                df_veiculos = pd.DataFrame(veiculos_funcionario)
+                            if not veiculos.empty:
+                                df_veiculos = pd.DataFrame({
+                                    "Status": veiculos['Status'],
+                                    "Tipo de Movimentação": veiculos['Tipo'].map(TIPOS_MOVIMENTACAO)
+                                })
                                 
                                 # Mostrar contagem por tipo de movimentação
                                 st.subheader(f"Resumo de Veículos - {funcionario_selecionado}")
@@ -1259,7 +1010,7 @@ elif st.session_state.current_tab == "Veículos":
                                 
                                 # Download do relatório detalhado
                                 excel_buffer = BytesIO()
-                                df_veiculos.to_excel(excel_buffer, index=False)
+                                write_xlsx(df_veiculos, excel_buffer)
                                 excel_data = excel_buffer.getvalue()
                                 
                                 st.download_button(
@@ -7,7 +7,13 @@ import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
 from io import BytesIO
+from driver_analysis import filter_registered
 from employee_db import EmployeeDatabase
+from export_writer import write_xlsx
+from producao.core import (
+    COLUNAS_ESPERADAS, STATUS_EM_SAIDA, STATUS_PARQUEADO, aggregate, analysis_frame,
+    build_driver_index, ingest, result_driver_keys, vehicles_for
+)
 
 # Verificar se estamos executando como executável ou diretamente
 # Isso é necessário para o PyInstaller encontrar os arquivos
@@ -34,6 +40,9 @@ db = EmployeeDatabase()
 if 'dataframes_completos' not in st.session_state:
     st.session_state.dataframes_completos = []
     
+if 'indices_completos' not in st.session_state:
+    st.session_state.indices_completos = []
+    
 if 'analyzed_data' not in st.session_state:
     st.session_state.analyzed_data = None
     
@@ -71,144 +80,40 @@ if st.sidebar.button("🚗 Análise de Veículos", use_container_width=True, key
 st.title("Análise de Produção de Manobristas")
 
 # Function to process Excel file and extract driver data
+# A leitura, a classificação de status e a padronização dos nomes ficam em producao.core
 def process_excel_file(uploaded_file):
     try:
-        # Read Excel file
-        # Se estiver executando como executável e o uploaded_file for um caminho de string
-        if isinstance(uploaded_file, str) and os.path.exists(uploaded_file):
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        else:
-            # Modo normal - uploaded_file é um objeto de upload do Streamlit
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        
-        # Guardar o DataFrame completo para uso na análise de veículos
-        df_completo = df.copy()
+        df, cabecalho = ingest(uploaded_file)
         
         # Mostrar informações sobre o arquivo carregado para diagnóstico
         st.write("### Informações de diagnóstico do arquivo:")
-        st.write(f"Colunas encontradas: {list(df.columns)}")
-        
-        # Verificar e renomear colunas importantes se necessário
-        colunas_esperadas = {
-            'Chassi': 0,          # Coluna A
-            'Versão do modelo': 2, # Coluna C
-            'Cor': 3,             # Coluna D
-            'Status': 4,          # Coluna E
-            'Descrição': 5,       # Coluna F
-            'Manobrista': 7       # Coluna H
-        }
+        st.write(f"Colunas encontradas: {cabecalho}")
         
-        # Renomear colunas conforme necessário
-        for nome_coluna, indice in colunas_esperadas.items():
-            if nome_coluna not in df.columns and len(df.columns) > indice:
-                df.rename(columns={df.columns[indice]: nome_coluna}, inplace=True)
-                df_completo.rename(columns={df_completo.columns[indice]: nome_coluna}, inplace=True)
+        # Informar colunas identificadas pela posição em vez do nome
+        for nome_coluna, indice in COLUNAS_ESPERADAS.items():
+            if nome_coluna not in cabecalho and nome_coluna in df.columns:
                 st.write(f"Renomeando coluna {indice} para '{nome_coluna}'")
         
-        # Extract relevant columns for aggregation (E=Status, H=Manobrista)
-        try:
-            status_col = 'Status' if 'Status' in df.columns else df.columns[4]
-            manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[7]
-            
-            # Mostrar valores únicos de status
-            unique_statuses = df[status_col].dropna().unique()
-            st.write(f"Valores únicos encontrados na coluna Status: {list(unique_statuses)}")
-            
-            # Clean data - remove rows with empty manobrista
-            df_analise = df[[status_col, manobrista_col]].dropna(subset=[manobrista_col])
-            
-            # Convert manobrista entries to uppercase for consistency
-            df_analise[manobrista_col] = df_analise[manobrista_col].str.upper()
-            
-            # Também garantir consistência em df_completo
-            if manobrista_col in df_completo.columns:
-                df_completo[manobrista_col] = df_completo[manobrista_col].fillna('').astype(str).str.upper()
-            
-            # Guardar o DataFrame completo na sessão para uso posterior
-            if 'dataframes_completos' not in st.session_state:
-                st.session_state.dataframes_completos = []
-            
-            st.session_state.dataframes_completos.append(df_completo)
-            
-            # Mostrar primeiras linhas após processamento
-            st.write("Amostra das primeiras 5 linhas após processamento:")
-            st.write(df_analise.head(5))
-            
-            return df_analise
-        except Exception as e:
-            st.error(f"Erro ao processar colunas: {str(e)}")
-            st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
-            return None
-            
+        # Mostrar valores únicos de status
+        st.write(f"Valores únicos encontrados na coluna Status: {list(df['Status'].cat.categories)}")
+        
+        # Clean data - remove rows with empty manobrista
+        df_analise = analysis_frame(df)
+        
+        # Guardar o DataFrame completo e o índice de manobristas para a análise de veículos
+        st.session_state.dataframes_completos.append(df)
+        st.session_state.indices_completos.append(build_driver_index(df))
+        
+        # Mostrar primeiras linhas após processamento
+        st.write("Amostra das primeiras 5 linhas após processamento:")
+        st.write(df_analise.head(5))
+        
+        return df_analise
     except Exception as e:
         st.error(f"Erro ao processar arquivo: {str(e)}")
+        st.error("Certifique-se de que o arquivo possui as colunas Status (E) e Manobrista (H)")
         return None
 
-# Function to extract matricula from manobrista name
-def extract_matricula(manobrista_name):
-    # Assuming matricula is at the beginning of the name and follows a pattern
-    # For example: "12345 - JOSE DA SILVA" should return "12345"
-    if isinstance(manobrista_name, str) and '-' in manobrista_name:
-        parts = manobrista_name.split('-', 1)
-        return parts[0].strip()
-    return ""
-
-# Function to aggregate driver data
-def aggregate_driver_data(dataframes):
-    combined_data = {}
-    
-    for df in dataframes:
-        if df is None:
-            continue
-            
-        status_col = 'Status' if 'Status' in df.columns else df.columns[0]
-        manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
-        
-        # Group by manobrista and count statuses
-        for _, row in df.iterrows():
-            manobrista = row[manobrista_col]
-            status = row[status_col]
-            
-            if manobrista not in combined_data:
-                matricula = extract_matricula(manobrista)
-                combined_data[manobrista] = {
-                    'MATRICULA': matricula,
-                    'MANOBRISTA': manobrista.split('-')[-1].strip() if '-' in manobrista else manobrista,
-                    'EM SAIDA': 0,
-                    'PARQUEADOS': 0,
-                    'TOTAL': 0
-                }
-            
-            # Update counts based on status
-            status_upper = status.upper()
-            
-            # Verificação mais abrangente para "Em Saída (expedição)"
-            is_saida = False
-            saida_keywords = ['SAIDA', 'SAÍDA', 'EXPEDICAO', 'EXPEDIÇÃO', 'EXPEDIC', 'EXPEDIÇ']
-            
-            for keyword in saida_keywords:
-                if keyword in status_upper:
-                    is_saida = True
-                    break
-            
-            # Se for uma saída
-            if is_saida:
-                combined_data[manobrista]['EM SAIDA'] += 1
-            # Se for um parqueado
-            elif 'PARQUEADO' in status_upper:
-                combined_data[manobrista]['PARQUEADOS'] += 1
-            
-            combined_data[manobrista]['TOTAL'] += 1
-    
-    # Convert to DataFrame
-    result_df = pd.DataFrame(combined_data.values())
-    
-    # Sort by total in descending order
-    if not result_df.empty:
-        result_df = result_df.sort_values('TOTAL', ascending=False)
-    
-    return result_df
-
 # Função para mostrar a aba de Análise de Produção
 def mostrar_aba_analise_producao():
     # Main interface for Analysis tab
@@ -259,6 +164,10 @@ def mostrar_aba_analise_producao():
             st.error("Selecione pelo menos um arquivo Excel para processar.")
         else:
             with st.spinner("Processando dados..."):
+                # Descartar os dados do processamento anterior
+                st.session_state.dataframes_completos = []
+                st.session_state.indices_completos = []
+                
                 # Process files
                 df1 = process_excel_file(file1) if file1 else None
                 df2 = process_excel_file(file2) if file2 else None
@@ -269,7 +178,7 @@ def mostrar_aba_analise_producao():
                     st.error("Não foi possível processar os arquivos selecionados.")
                 else:
                     # Aggregate data
-                    result_df = aggregate_driver_data(dataframes)
+                    result_df = aggregate(dataframes)
                     
                     # Salvar dados na sessão para uso em outras abas
                     st.session_state.dataframes = dataframes
@@ -280,10 +189,6 @@ def mostrar_aba_analise_producao():
                         # Contador de filtros aplicados
                         filtros_aplicados = 0
                         
-                        # Guardar variáveis para identificar status "em saída"
-                        saida_keywords = ['em saida', 'em saída', 'saida', 'saída']
-                        st.session_state.saida_keywords = saida_keywords
-                        
                         # Filter out terceiros if option is checked
                         if excluir_terceiros:
                             # Palavras-chave que identificam funcionários terceirizados
@@ -314,21 +219,11 @@ def mostrar_aba_analise_producao():
                         if apenas_cadastrados:
                             tamanho_antes = len(result_df)
                             
-                            # Verificar cada manobrista no banco de dados
-                            funcionarios_registrados = []
-                            
-                            for _, row in result_df.iterrows():
-                                matricula = row['MATRICULA']
-                                
-                                # Verificar se a matrícula está no banco de dados
-                                employee = db.get_employee_by_matricula(matricula)
-                                if employee is not None and employee['ativo']:
-                                    funcionarios_registrados.append(matricula)
+                            # Comparar todas as matrículas de uma vez com os funcionários ativos
+                            filtered_df, _ = filter_registered(result_df, db.get_active_employees())
                             
                             # Aplicar filtro
-                            if funcionarios_registrados:
-                                filtered_df = result_df[result_df['MATRICULA'].isin(funcionarios_registrados)]
-                                
+                            if not filtered_df.empty:
                                 # Mostrar mensagem informativa
                                 if len(filtered_df) < tamanho_antes:
                                     qtd_filtrados = tamanho_antes - len(filtered_df)
@@ -469,7 +364,7 @@ def mostrar_aba_analise_producao():
                             if st.button("Exportar para Excel", key="export_excel", use_container_width=True):
                                 # Create Excel file
                                 excel_buffer = BytesIO()
-                                result_df.to_excel(excel_buffer, index=False)
+                                write_xlsx(result_df, excel_buffer)
                                 excel_data = excel_buffer.getvalue()
                                 
                                 st.download_button(
@@ -557,7 +452,7 @@ def mostrar_aba_gerenciar_funcionarios():
                 # Export options
                 if st.button("Exportar Lista de Funcionários", use_container_width=True, key="export_employees"):
                     excel_buffer = BytesIO()
-                    filtered_df.to_excel(excel_buffer, index=False)
+                    write_xlsx(filtered_df, excel_buffer)
                     excel_data = excel_buffer.getvalue()
                     
                     st.download_button(
@@ -672,7 +567,6 @@ def mostrar_aba_analise_veiculos():
         # Obter os dados processados
         dataframes = st.session_state.dataframes
         result_df = st.session_state.analyzed_data
-        saida_keywords = st.session_state.saida_keywords
         
         # Verificar se temos os dataframes completos para análise detalhada
         if 'dataframes_completos' not in st.session_state or not st.session_state.dataframes_completos:
@@ -680,18 +574,16 @@ def mostrar_aba_analise_veiculos():
         else:
             dataframes_completos = st.session_state.dataframes_completos
             
-            # Extrair os nomes dos manobristas apenas dos resultados processados
-            all_manobristas = []
-            
-            # Usar o dataframe de resultados para obter os nomes dos manobristas
+            # Usar o dataframe de resultados para obter os nomes dos manobristas,
+            # cada um associado à chave usada no índice de veículos
+            chaves_por_nome = {}
             if result_df is not None and not result_df.empty:
-                for _, row in result_df.iterrows():
-                    nome = row['MANOBRISTA']
-                    if nome and nome not in all_manobristas:
-                        all_manobristas.append(nome)
+                for nome, chave in zip(result_df['MANOBRISTA'], result_driver_keys(result_df)):
+                    if nome and nome not in chaves_por_nome:
+                        chaves_por_nome[nome] = chave
             
             # Ordenar alfabeticamente
-            all_manobristas.sort()
+            all_manobristas = sorted(chaves_por_nome)
             
             # Interface de seleção
             if all_manobristas:
@@ -707,47 +599,20 @@ def mostrar_aba_analise_veiculos():
                     st.subheader(f"Análise de veículos para: {funcionario_selecionado}")
                     
                     # Extrair detalhes dos veículos movimentados por este funcionário
-                    veiculos = []
-                    
-                    for df in dataframes_completos:
-                        if 'Manobrista' in df.columns and 'Status' in df.columns:
-                            # Filtrar linhas do funcionário selecionado
-                            funcionario_rows = df[df['Manobrista'].str.contains(funcionario_selecionado, case=False, na=False)]
-                            
-                            for _, row in funcionario_rows.iterrows():
-                                status = row['Status'].upper() if isinstance(row['Status'], str) else ''
-                                chassi = row['Chassi'] if 'Chassi' in df.columns else ''
-                                versao = row['Versão do modelo'] if 'Versão do modelo' in df.columns else ''
-                                cor = row['Cor'] if 'Cor' in df.columns else ''
-                                descricao = row['Descrição'] if 'Descrição' in df.columns else ''
-                                
-                                # Determinar se é saída ou parqueado
-                                is_saida = False
-                                for keyword in saida_keywords:
-                                    if keyword.upper() in status:
-                                        is_saida = True
-                                        break
-                                
-                                tipo = "EM SAÍDA" if is_saida else "PARQUEADO"
-                                
-                                veiculos.append({
-                                    'Chassi': chassi,
-                                    'Versão': versao,
-                                    'Cor': cor,
-                                    'Descrição': descricao,
-                                    'Status': status,
-                                    'Tipo': tipo
-                                })
+                    df_veiculos = vehicles_for(
+                        dataframes_completos,
+                        st.session_state.indices_completos,
+                        chaves_por_nome[funcionario_selecionado]
+                    )
                     
                     # Mostrar o total de veículos encontrados
-                    if veiculos:
-                        df_veiculos = pd.DataFrame(veiculos)
+                    if not df_veiculos.empty:
                         total_veiculos = len(df_veiculos)
                         st.markdown(f"**Total de veículos movimentados: {total_veiculos}**")
                         
                         # Contagem por tipo
-                        saidas = df_veiculos[df_veiculos['Tipo'] == 'EM SAÍDA'].shape[0]
-                        parqueados = df_veiculos[df_veiculos['Tipo'] == 'PARQUEADO'].shape[0]
+                        saidas = df_veiculos[df_veiculos['Tipo'] == STATUS_EM_SAIDA].shape[0]
+                        parqueados = df_veiculos[df_veiculos['Tipo'] == STATUS_PARQUEADO].shape[0]
                         
                         # Métricas
                         col1, col2 = st.columns(2)
@@ -789,7 +654,7 @@ def mostrar_aba_analise_veiculos():
                         if st.button("Exportar Detalhes dos Veículos", key="export_vehicles", use_container_width=True):
                             # Create Excel file
                             excel_buffer = BytesIO()
-                            df_veiculos.to_excel(excel_buffer, index=False)
+                            write_xlsx(df_veiculos, excel_buffer)
                             excel_data = excel_buffer.getvalue()
                             
                             st.download_button(
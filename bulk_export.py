@@ -0,0 +1,163 @@
+import re
+import threading
+import zipfile
+from io import BytesIO
+
+from driver_analysis import vehicles_by_driver
+from export_writer import write_xlsx, write_xlsx_sheets
+from producao.tracing import span, trace_run
+
+# Formatos da exportação de todos os manobristas: um único Excel com uma
+# planilha por manobrista, ou um .zip com um Excel por manobrista
+FORMATOS_LOTE = ('xlsx', 'zip')
+
+# Até este total de linhas o Excel com várias planilhas é montado em memória;
+# acima dele usa o modo de memória constante, que cria um arquivo temporário
+# por planilha
+LINHAS_EM_MEMORIA = 50000
+
+# Caracteres não aceitos em nomes de arquivo no Windows
+_CARACTERES_ARQUIVO = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def file_name(nome, usados, extensao='xlsx'):
+    """Nome de arquivo válido e diferente dos já usados dentro do .zip.
+
+    Args:
+        nome (str): Nome do manobrista
+        usados (set): Nomes já usados (em minúsculas); o nome escolhido é adicionado
+        extensao (str): Extensão do arquivo
+
+    Returns:
+        str: Nome do arquivo (ex: 'veiculos_12345 - NOME.xlsx')
+    """
+    base = f"veiculos_{_CARACTERES_ARQUIVO.sub('_', str(nome)).strip(' .')}"
+    candidato = f"{base}.{extensao}"
+    numero = 2
+    while candidato.lower() in usados:
+        candidato = f"{base} ({numero}).{extensao}"
+        numero += 1
+    usados.add(candidato.lower())
+    return candidato
+
+
+def write_vehicle_export(dataframes, indices, nomes_por_chave, destino, formato='xlsx', progress_callback=None):
+    """Grava os veículos de todos os manobristas em um único arquivo.
+
+    As linhas são agrupadas por manobrista uma única vez (ver
+    vehicles_by_driver) e cada grupo é gravado assim que é gerado.
+
+    Args:
+        dataframes (list): DataFrames completos lidos dos arquivos
+        indices (list): Índices criados por build_driver_index para cada DataFrame
+        nomes_por_chave (dict): Chave do manobrista -> nome exibido, na ordem de exportação
+        destino (str or file): Caminho do arquivo ou objeto de arquivo (ex: BytesIO)
+        formato (str): 'xlsx' (uma planilha por manobrista) ou 'zip' (um Excel por manobrista)
+        progress_callback (callable, optional): Função chamada com
+            (manobristas_gravados, total_manobristas)
+
+    Raises:
+        ValueError: Se o formato não for suportado
+    """
+    if formato not in FORMATOS_LOTE:
+        raise ValueError(f"Formato não suportado: '{formato}' (use {', '.join(FORMATOS_LOTE)})")
+
+    total = len(nomes_por_chave)
+    grupos = vehicles_by_driver(dataframes, indices, list(nomes_por_chave))
+
+    def planilhas():
+        for gravados, (chave, veiculos) in enumerate(grupos, start=1):
+            yield nomes_por_chave[chave], veiculos
+            if progress_callback is not None:
+                progress_callback(gravados, total)
+
+    if formato == 'xlsx':
+        linhas = sum(
+            len(posicoes) for indice in indices
+            for chave, posicoes in indice.items() if chave in nomes_por_chave
+        )
+        write_xlsx_sheets(planilhas(), destino, in_memory=linhas <= LINHAS_EM_MEMORIA)
+        return
+
+    # Os .xlsx já são compactados: guardados no .zip sem nova compressão. Cada
+    # um tem apenas os veículos de um manobrista e é montado em memória
+    usados = set()
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for nome, veiculos in planilhas():
+            with arquivo_zip.open(file_name(nome, usados), 'w') as destino_xlsx:
+                write_xlsx(veiculos, destino_xlsx, sheet_name='Veículos', in_memory=True)
+
+
+class VehicleExportJob:
+    """Exportação dos veículos de todos os manobristas em segundo plano.
+
+    O arquivo é gerado em uma thread; a interface consulta progress e done
+    periodicamente e, ao final, obtém o conteúdo em result (ou a exceção em
+    error). Os DataFrames são apenas lidos, sem cópia.
+    """
+
+    def __init__(self, dataframes, indices, nomes_por_chave, formato='xlsx', log=None, **atributos):
+        """Inicializa a exportação (iniciada por start).
+
+        Args:
+            dataframes (list): DataFrames completos lidos dos arquivos
+            indices (list): Índices criados por build_driver_index para cada DataFrame
+            nomes_por_chave (dict): Chave do manobrista -> nome exibido, na ordem de exportação
+            formato (str): 'xlsx' ou 'zip' (ver write_vehicle_export)
+            log (TraceLog, optional): Log de desempenho da exportação
+            **atributos: Informações adicionais gravadas no log (ex: usuario)
+        """
+        self.dataframes = dataframes
+        self.indices = indices
+        self.nomes_por_chave = dict(nomes_por_chave)
+        self.formato = formato
+        self.log = log
+        self.atributos = atributos
+        self.total = len(self.nomes_por_chave)
+        self.gravados = 0
+        self.result = None
+        self.error = None
+        self._thread = None
+        self._concluido = threading.Event()
+
+    def start(self):
+        """Inicia a exportação em uma thread separada."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='exportacao-veiculos', daemon=True)
+            self._thread.start()
+        return self
+
+    def _informar(self, gravados, total):
+        self.gravados = gravados
+
+    def _run(self):
+        try:
+            with trace_run("Exportar Veículos de Todos", log=self.log, **self.atributos), \
+                    span('exportacao', formato=self.formato, manobristas=self.total):
+                buffer = BytesIO()
+                write_vehicle_export(
+                    self.dataframes, self.indices, self.nomes_por_chave, buffer,
+                    formato=self.formato, progress_callback=self._informar
+                )
+                self.result = buffer.getvalue()
+        except Exception as e:
+            print(f"Erro ao exportar veículos: {e}")
+            self.error = e
+        finally:
+            self._concluido.set()
+
+    @property
+    def progress(self):
+        """Fração dos manobristas já gravados (0.0 a 1.0)."""
+        if self._concluido.is_set():
+            return 1.0
+        return self.gravados / self.total if self.total else 0.0
+
+    @property
+    def done(self):
+        """True quando a exportação terminou (com ou sem erro)."""
+        return self._concluido.is_set()
+
+    def wait(self, timeout=None):
+        """Aguarda o fim da exportação; retorna done."""
+        return self._concluido.wait(timeout)
@@ -70,6 +70,13 @@ def main():
         "--hidden-import=plotly",
         "--hidden-import=plotly.graph_objects",
         "--hidden-import=plotly.express",
+        # Núcleo da análise, importado pelo aplicativo embutido
+        "--hidden-import=producao.core",
+        "--hidden-import=driver_analysis",
+        "--hidden-import=excel_reader",
+        "--hidden-import=export_writer",
+        "--hidden-import=bulk_export",
+        "--hidden-import=xlsxwriter",
         # Coleções de módulos
         "--collect-all=streamlit",
         "--collect-all=plotly",
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+
+import plotly.express as px
+import plotly.io as pio
+
+# Gráficos do dashboard de produção
+TIPOS_GRAFICO = ('ranking', 'distribuicao', 'detalhamento')
+
+
+def _ranking(result_df, top_n):
+    # Gráfico de barras para top manobristas
+    fig = px.bar(
+        result_df.head(top_n),
+        x="MANOBRISTA",
+        y="TOTAL",
+        title=f"Top {top_n} Manobristas por Produtividade",
+        color="TOTAL",
+        color_continuous_scale=px.colors.sequential.Viridis
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+def _distribuicao(result_df, top_n):
+    # Gráfico de pizza para distribuição EM SAIDA vs PARQUEADOS
+    fig = px.pie(
+        values=[result_df['EM SAIDA'].sum(), result_df['PARQUEADOS'].sum()],
+        names=["Em Saída", "Parqueados"],
+        title="Distribuição de Veículos por Status",
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=500)
+    return fig
+
+
+def _detalhamento(result_df, top_n):
+    # Gráfico de barras empilhadas
+    fig = px.bar(
+        result_df.head(top_n),
+        x="MANOBRISTA",
+        y=["EM SAIDA", "PARQUEADOS"],
+        title="Distribuição de Atividades por Manobrista",
+        labels={"value": "Quantidade", "variable": "Tipo"},
+        barmode="stack"
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+CONSTRUTORES = {
+    'ranking': _ranking,
+    'distribuicao': _distribuicao,
+    'detalhamento': _detalhamento,
+}
+
+# Gráficos que não dependem de top_n (a chave do cache ignora o valor)
+SEM_TOP_N = {'distribuicao'}
+
+
+class FigureCache:
+    """Gráficos do dashboard já construídos, compartilhados entre sessões e execuções.
+
+    Cada gráfico é identificado por (identificador do resultado, tipo, top_n)
+    e guardado como JSON serializado, que não pode ser alterado por quem o
+    usa. Recriar a figura a partir do JSON é bem mais rápido que montá-la com
+    plotly.express. O tamanho total é limitado e os gráficos usados há mais
+    tempo são removidos primeiro (LRU).
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        """Inicializa o cache.
+
+        Args:
+            max_bytes (int): Tamanho máximo ocupado pelos gráficos serializados
+        """
+        self.max_bytes = max_bytes
+        self._graficos = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(fingerprint, tipo, top_n):
+        return (fingerprint, tipo, None if tipo in SEM_TOP_N else top_n)
+
+    def _put(self, key, figura_json):
+        with self._lock:
+            anterior = self._graficos.pop(key, None)
+            if anterior is not None:
+                self._total -= len(anterior)
+            self._graficos[key] = figura_json
+            self._total += len(figura_json)
+            while self._total > self.max_bytes and len(self._graficos) > 1:
+                _, removido = self._graficos.popitem(last=False)
+                self._total -= len(removido)
+
+    def figure(self, result_df, tipo, top_n, fingerprint):
+        """Figura de um gráfico do dashboard, a partir do cache quando disponível.
+
+        Args:
+            result_df (pandas.DataFrame): Tabela de produção exibida
+            tipo (str): Um de TIPOS_GRAFICO
+            top_n (int): Número de manobristas nos gráficos de ranking e detalhamento
+            fingerprint (str): Identificador de result_df (producao.core.result_fingerprint)
+
+        Returns:
+            plotly.graph_objects.Figure: Nova figura (pode ser alterada por quem chamou)
+        """
+        key = self._key(fingerprint, tipo, top_n)
+        with self._lock:
+            figura_json = self._graficos.get(key)
+            if figura_json is not None:
+                self._graficos.move_to_end(key)
+        if figura_json is None:
+            figura_json = CONSTRUTORES[tipo](result_df, top_n).to_json()
+            self._put(key, figura_json)
+        return pio.from_json(figura_json)
+
+    def memory_usage(self):
+        """Tamanho dos gráficos serializados, em bytes."""
+        return self._total
+
+    def __len__(self):
+        return len(self._graficos)
@@ -0,0 +1,317 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from driver_analysis import STATUS_CLASS_COL, build_driver_index
+from excel_reader import COLUNAS_ESPERADAS
+
+# Colunas mantidas em memória para a análise de veículos
+COLUNAS_DATASET = list(COLUNAS_ESPERADAS) + [STATUS_CLASS_COL]
+
+# Colunas de texto com poucos valores distintos são guardadas como Categorical
+# quando a proporção de valores distintos fica abaixo deste limite
+LIMITE_CATEGORICAL = 0.5
+
+
+def compact_frame(df):
+    """Mantém apenas as colunas utilizadas, com tipos compactos.
+
+    As colunas que já são compactas são reaproveitadas sem cópia; apenas as
+    convertidas para Categorical ocupam memória nova.
+
+    Args:
+        df (pandas.DataFrame): DataFrame completo lido do arquivo
+
+    Returns:
+        pandas.DataFrame: Novo DataFrame com colunas de texto repetitivo como Categorical
+    """
+    compacto = {}
+    for coluna in COLUNAS_DATASET:
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if not isinstance(serie.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(serie):
+            if len(serie) and serie.nunique(dropna=True) / len(serie) < LIMITE_CATEGORICAL:
+                serie = serie.astype('category')
+        compacto[coluna] = serie
+    return pd.DataFrame(compacto, copy=False)
+
+
+class DatasetRegistry:
+    """Arquivos processados de uma sessão, um único registro por arquivo.
+
+    Os registros são identificados pela chave do arquivo (hash do conteúdo),
+    de modo que processar o mesmo arquivo novamente substitui o registro
+    anterior em vez de acumular cópias.
+    """
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self._datasets = OrderedDict()
+        self.last_access = time.monotonic()
+
+    def put(self, key, df, nome_arquivo=None):
+        """Adiciona ou substitui os dados de um arquivo.
+
+        Args:
+            key (str): Chave do arquivo (ParseCache.file_key)
+            df (pandas.DataFrame): Dados completos do arquivo
+            nome_arquivo (str, optional): Nome do arquivo para exibição
+        """
+        df = compact_frame(df)
+        self._datasets.pop(key, None)
+        self._datasets[key] = {
+            'df': df,
+            'indice': build_driver_index(df),
+            'nome_arquivo': nome_arquivo,
+            'atualizado_em': time.time(),
+        }
+
+    def get(self, key):
+        """Retorna o registro de um arquivo (ou None)."""
+        return self._datasets.get(key)
+
+    def retain(self, keys):
+        """Remove os arquivos que não estão na lista informada."""
+        keys = set(keys)
+        for key in list(self._datasets):
+            if key not in keys:
+                del self._datasets[key]
+
+    def clear(self):
+        """Remove todos os arquivos."""
+        self._datasets.clear()
+
+    def keys(self):
+        return list(self._datasets)
+
+    def frames(self):
+        """DataFrames de todos os arquivos, na ordem de processamento."""
+        return [dataset['df'] for dataset in self._datasets.values()]
+
+    def indices(self):
+        """Índices de manobristas (build_driver_index) de todos os arquivos."""
+        return [dataset['indice'] for dataset in self._datasets.values()]
+
+    def memory_usage(self):
+        """Memória aproximada ocupada pelos dados, em bytes."""
+        total = 0
+        for dataset in self._datasets.values():
+            total += int(dataset['df'].memory_usage(deep=True).sum())
+            total += sum(posicoes.nbytes for posicoes in dataset['indice'].values())
+        return total
+
+    def __len__(self):
+        return len(self._datasets)
+
+
+class SessionStore:
+    """Registros de arquivos de todas as sessões do servidor.
+
+    Sessões sem acesso por mais tempo que o limite configurado têm seus dados
+    descartados, liberando memória de abas esquecidas abertas.
+    """
+
+    def __init__(self, idle_timeout=30 * 60):
+        """Inicializa o armazenamento.
+
+        Args:
+            idle_timeout (int): Segundos sem acesso até os dados de uma sessão serem removidos
+        """
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Retorna o registro da sessão, criando-o se necessário.
+
+        Também remove as sessões inativas.
+        """
+        with self._lock:
+            self._evict_idle()
+            registry = self._sessions.get(session_id)
+            if registry is None:
+                registry = DatasetRegistry()
+                self._sessions[session_id] = registry
+            registry.last_access = time.monotonic()
+            return registry
+
+    def _evict_idle(self):
+        limite = time.monotonic() - self.idle_timeout
+        for session_id in [s for s, r in self._sessions.items() if r.last_access < limite]:
+            del self._sessions[session_id]
+
+    def memory_usage(self):
+        """Memória aproximada ocupada pelos dados de todas as sessões, em bytes."""
+        with self._lock:
+            return sum(registry.memory_usage() for registry in self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class CountsCache:
+    """Contagens por manobrista (DriverCounts) de cada arquivo, compartilhadas entre sessões.
+
+    As contagens são identificadas pela chave do arquivo (hash do conteúdo),
+    de modo que um arquivo já contado não precisa ser contado novamente ao
+    ser incluído em outra análise. As entradas usadas há mais tempo são
+    descartadas quando o limite é atingido.
+    """
+
+    def __init__(self, max_entries=256):
+        """Inicializa o cache.
+
+        Args:
+            max_entries (int): Número máximo de arquivos mantidos
+        """
+        self.max_entries = max_entries
+        self._contagens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna as contagens de um arquivo (ou None)."""
+        with self._lock:
+            contagens = self._contagens.get(key)
+            if contagens is not None:
+                self._contagens.move_to_end(key)
+            return contagens
+
+    def put(self, key, contagens):
+        """Armazena as contagens de um arquivo."""
+        with self._lock:
+            self._contagens[key] = contagens
+            self._contagens.move_to_end(key)
+            while len(self._contagens) > self.max_entries:
+                self._contagens.popitem(last=False)
+
+    def __len__(self):
+        return len(self._contagens)
+
+
+class SessionIndex:
+    """Arquivos analisados em cada sessão autenticada, gravados em disco.
+
+    Guarda apenas o usuário, as chaves dos arquivos (ParseCache.file_key), o
+    período do histórico e os filtros de cada sessão, não os dados. Com essas
+    informações uma sessão restaurada por token (ver session_tokens) recupera
+    os arquivos do SessionStore, se ainda estiverem em memória, ou do cache de
+    planilhas, inclusive após reiniciar o servidor.
+
+    Sessões encerradas (logout) ficam registradas como revogadas até o fim da
+    validade dos seus tokens.
+    """
+
+    def __init__(self, index_file='cache_planilhas/sessoes.json'):
+        """Inicializa o índice.
+
+        Args:
+            index_file (str): Arquivo JSON onde o índice é gravado
+        """
+        self.index_file = index_file
+        pasta = os.path.dirname(index_file)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sessoes = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                sessoes = json.load(f)
+            return sessoes if isinstance(sessoes, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler índice de sessões: {e}")
+            return {}
+
+    def _save(self):
+        # Remover sessões vencidas antes de gravar
+        agora = time.time()
+        self._sessoes = {s: e for s, e in self._sessoes.items() if e.get('expira_em', 0) >= agora}
+
+        # Escrita atômica: arquivo temporário seguido de renomeação
+        pasta = os.path.dirname(self.index_file) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._sessoes, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"Erro ao gravar índice de sessões: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def start(self, session_id, username, expira_em):
+        """Registra uma sessão autenticada, sem arquivos.
+
+        Args:
+            session_id (str): Identificador da sessão
+            username (str): Usuário autenticado
+            expira_em (float): Momento (time.time) em que a sessão deixa de valer
+        """
+        with self._lock:
+            self._sessoes[session_id] = {
+                'usuario': username,
+                'arquivos': [],
+                'historico': None,
+                'filtros': None,
+                'expira_em': expira_em,
+            }
+            self._save()
+
+    def update(self, session_id, arquivos, historico=None, filtros=None):
+        """Registra os arquivos analisados na sessão.
+
+        Args:
+            session_id (str): Identificador da sessão
+            arquivos (list): Pares (chave do arquivo, nome do arquivo)
+            historico (tuple, optional): (início, fim) do período do histórico, em ISO
+            filtros (dict, optional): Filtros aplicados ao resultado (ex:
+                                      {'excluir_terceiros': True, 'apenas_cadastrados': False})
+        """
+        with self._lock:
+            entrada = self._sessoes.get(session_id)
+            if entrada is None or entrada.get('revogada'):
+                return
+            entrada['arquivos'] = [list(arquivo) for arquivo in arquivos]
+            entrada['historico'] = list(historico) if historico else None
+            entrada['filtros'] = dict(filtros) if filtros else None
+            self._save()
+
+    def get(self, session_id):
+        """Retorna os dados da sessão (ou None se não existir ou estiver vencida)."""
+        with self._lock:
+            entrada = self._sessoes.get(session_id)
+            if entrada is None or entrada.get('revogada') or entrada.get('expira_em', 0) < time.time():
+                return None
+            return dict(entrada)
+
+    def revoke(self, session_id, expira_em):
+        """Encerra a sessão (ex: logout); tokens dela deixam de ser aceitos.
+
+        Os dados da sessão são descartados e apenas o identificador é mantido,
+        marcado como revogado, até expira_em.
+
+        Args:
+            session_id (str): Identificador da sessão
+            expira_em (float): Momento (time.time) em que os tokens da sessão vencem
+        """
+        with self._lock:
+            self._sessoes[session_id] = {'revogada': True, 'expira_em': expira_em}
+            self._save()
+
+    def is_revoked(self, session_id):
+        """Indica se a sessão foi encerrada por revoke."""
+        with self._lock:
+            entrada = self._sessoes.get(session_id)
+            return entrada is not None and bool(entrada.get('revogada'))
+
+    def __len__(self):
+        return len(self._sessoes)
@@ -0,0 +1,499 @@
+import os
+import re
+import tomllib
+
+import numpy as np
+import pandas as pd
+
+# Classes de status de movimentação
+STATUS_EM_SAIDA = 'EM SAÍDA'
+STATUS_PARQUEADO = 'PARQUEADO'
+STATUS_OUTRO = 'OUTRO'
+STATUS_CLASSES = [STATUS_EM_SAIDA, STATUS_PARQUEADO, STATUS_OUTRO]
+
+# Tabela única de palavras-chave (comparadas em maiúsculas) usada por todas as
+# abas. A ordem define a prioridade: um status com "saída" e "parqueado" é saída
+STATUS_KEYWORDS = [
+    (STATUS_EM_SAIDA, ['SAIDA', 'SAÍDA', 'EXPEDICAO', 'EXPEDIÇÃO', 'EXPEDIC', 'EXPEDIÇ']),
+    (STATUS_PARQUEADO, ['PARQUEADO']),
+]
+
+# Coluna adicionada na leitura com a classe de cada movimentação
+STATUS_CLASS_COL = 'Classe Status'
+
+
+def classify_status_value(status):
+    """Classifica um único valor de Status em EM SAÍDA, PARQUEADO ou OUTRO."""
+    if not isinstance(status, str):
+        return STATUS_OUTRO
+    status_upper = status.upper()
+    for classe, keywords in STATUS_KEYWORDS:
+        if any(keyword in status_upper for keyword in keywords):
+            return classe
+    return STATUS_OUTRO
+
+
+def classify_status(status):
+    """Classifica uma coluna de Status, avaliando cada valor distinto uma única vez.
+
+    Args:
+        status (pandas.Series): Coluna Status (texto ou Categorical)
+
+    Returns:
+        tuple: (Status como Categorical, Categorical com a classe de cada linha)
+    """
+    if not isinstance(status.dtype, pd.CategoricalDtype):
+        status = status.astype('category')
+
+    # Uma classificação por categoria; a última posição atende valores vazios (código -1)
+    lookup = np.array(
+        [STATUS_CLASSES.index(classify_status_value(valor)) for valor in status.cat.categories]
+        + [STATUS_CLASSES.index(STATUS_OUTRO)],
+        dtype='int8'
+    )
+    classes = pd.Categorical.from_codes(lookup[status.cat.codes.to_numpy()], categories=STATUS_CLASSES)
+    return status, pd.Series(classes, index=status.index, name=STATUS_CLASS_COL)
+
+
+def upper_names(nomes):
+    """Converte nomes para maiúsculas, preservando o tipo Categorical.
+
+    Em uma coluna Categorical apenas as categorias são convertidas; categorias
+    que passam a ser iguais (ex: 'Ana' e 'ANA') são unificadas.
+
+    Args:
+        nomes (pandas.Series): Coluna de nomes (texto ou Categorical)
+
+    Returns:
+        pandas.Series: Nomes em maiúsculas, com o mesmo índice
+    """
+    if not isinstance(nomes.dtype, pd.CategoricalDtype):
+        return nomes.str.upper()
+
+    codes, uniques = pd.factorize(nomes.cat.categories.str.upper())
+    codes = np.append(codes, -1)  # posição extra para valores vazios (código -1)
+    categorias = pd.Categorical.from_codes(codes[nomes.cat.codes.to_numpy()], categories=uniques)
+    return pd.Series(categorias, index=nomes.index, name=nomes.name)
+
+
+def blank_names(nomes):
+    """Indica os nomes vazios (ausentes ou só com espaços) de uma coluna.
+
+    Em uma coluna Categorical apenas as categorias são verificadas.
+
+    Args:
+        nomes (pandas.Series): Coluna de nomes (texto ou Categorical)
+
+    Returns:
+        numpy.ndarray: True nas linhas sem nome
+    """
+    if isinstance(nomes.dtype, pd.CategoricalDtype):
+        categorias = nomes.cat.categories
+        vazias = np.append(categorias.astype(str).str.strip() == '', True)  # código -1: ausente
+        return vazias[nomes.cat.codes.to_numpy()]
+    vazios = nomes.isna().to_numpy()
+    texto = nomes.astype(object).where(~vazios, '')
+    return vazios | (texto.astype(str).str.strip() == '').to_numpy()
+
+
+# Function to extract matricula from manobrista name
+def extract_matricula(manobrista_name):
+    # Assuming matricula is at the beginning of the name and follows a pattern
+    # For example: "12345 - JOSE DA SILVA" should return "12345"
+    if isinstance(manobrista_name, str) and '-' in manobrista_name:
+        parts = manobrista_name.split('-', 1)
+        return parts[0].strip()
+    return ""
+
+
+def count_by_driver(df):
+    """Conta EM SAIDA, PARQUEADOS e TOTAL por manobrista em um único DataFrame.
+
+    Returns:
+        pandas.DataFrame: Contagens indexadas pelo manobrista, na ordem da primeira ocorrência
+    """
+    status_col = 'Status' if 'Status' in df.columns else df.columns[0]
+    manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
+
+    # Usar a classe calculada na leitura; classificar apenas se ainda não existir
+    if STATUS_CLASS_COL in df.columns:
+        classes = df[STATUS_CLASS_COL]
+    else:
+        _, classes = classify_status(df[status_col])
+    codes = classes.cat.codes.to_numpy()
+
+    flags = pd.DataFrame({
+        'EM SAIDA': codes == STATUS_CLASSES.index(STATUS_EM_SAIDA),
+        'PARQUEADOS': codes == STATUS_CLASSES.index(STATUS_PARQUEADO),
+        'TOTAL': 1
+    }, index=df.index)
+
+    # sort=False mantém a ordem da primeira ocorrência de cada manobrista
+    return flags.groupby(df[manobrista_col], sort=False).sum()
+
+
+def driver_result(contagens):
+    """Monta a tabela de produção a partir das contagens por manobrista.
+
+    Args:
+        contagens (pandas.DataFrame): Colunas EM SAIDA, PARQUEADOS e TOTAL indexadas
+                                      pelo manobrista (como em count_by_driver)
+
+    Returns:
+        pandas.DataFrame: Colunas MATRICULA, MANOBRISTA, EM SAIDA, PARQUEADOS e TOTAL,
+                          em ordem decrescente de TOTAL
+    """
+    # Separar matrícula e nome uma única vez por manobrista
+    nomes = pd.Series(contagens.index, dtype=object).astype(str)
+    tem_hifen = nomes.str.contains('-', regex=False)
+    matriculas = nomes.str.split('-', n=1).str[0].str.strip().where(tem_hifen, '')
+    nomes_curtos = nomes.str.rsplit('-', n=1).str[-1].str.strip().where(tem_hifen, nomes)
+
+    result_df = pd.DataFrame({
+        'MATRICULA': matriculas.tolist(),
+        'MANOBRISTA': nomes_curtos.tolist(),
+        'EM SAIDA': contagens['EM SAIDA'].to_numpy(dtype='int64'),
+        'PARQUEADOS': contagens['PARQUEADOS'].to_numpy(dtype='int64'),
+        'TOTAL': contagens['TOTAL'].to_numpy(dtype='int64')
+    })
+
+    # Sort by total in descending order
+    result_df = result_df.sort_values('TOTAL', ascending=False)
+
+    return result_df
+
+
+class DriverCounts:
+    """Contagens parciais de EM SAIDA, PARQUEADOS e TOTAL por manobrista.
+
+    As contagens de cada arquivo são calculadas uma única vez e combinadas
+    por soma, em qualquer ordem ou agrupamento (a combinação é associativa e
+    DriverCounts() é o elemento neutro). Incluir ou remover um arquivo da
+    análise exige apenas combinar novamente as contagens já calculadas. A
+    chave é o nome do manobrista padronizado por upper_names
+    ('MATRÍCULA - NOME').
+    """
+
+    COLUNAS = ['EM SAIDA', 'PARQUEADOS', 'TOTAL']
+
+    def __init__(self, contagens=None):
+        """Inicializa as contagens.
+
+        Args:
+            contagens (pandas.DataFrame, optional): Resultado de count_by_driver (vazio se None)
+        """
+        if contagens is None:
+            contagens = pd.DataFrame({coluna: pd.Series(dtype='int64') for coluna in self.COLUNAS})
+        self.contagens = contagens
+
+    @classmethod
+    def from_frame(cls, df):
+        """Conta as movimentações de um DataFrame (ver count_by_driver)."""
+        return cls(count_by_driver(df))
+
+    @classmethod
+    def combine(cls, parciais):
+        """Soma várias contagens parciais de uma só vez.
+
+        Args:
+            parciais (iterable): Objetos DriverCounts (None é ignorado)
+
+        Returns:
+            DriverCounts: Contagens combinadas
+        """
+        contagens = [parcial.contagens for parcial in parciais if parcial is not None and not parcial.empty]
+        if not contagens:
+            return cls()
+        if len(contagens) == 1:
+            return cls(contagens[0])
+        # sort=False mantém a ordem da primeira ocorrência de cada manobrista
+        return cls(pd.concat(contagens).groupby(level=0, sort=False).sum())
+
+    def __add__(self, other):
+        return DriverCounts.combine([self, other])
+
+    @property
+    def empty(self):
+        return self.contagens.empty
+
+    def __len__(self):
+        return len(self.contagens)
+
+    def result(self):
+        """Tabela de produção (ver driver_result); DataFrame vazio se não houver contagens."""
+        if self.empty:
+            return pd.DataFrame()
+        return driver_result(self.contagens)
+
+
+# Function to aggregate driver data
+def aggregate_driver_data(dataframes):
+    return DriverCounts.combine(
+        DriverCounts.from_frame(df) for df in dataframes if df is not None
+    ).result()
+
+
+def driver_key(manobrista):
+    """Chave normalizada de um manobrista: a matrícula, ou o nome quando não houver.
+
+    Args:
+        manobrista (str): Nome como aparece no Excel (ex: '12345 - NOME SOBRENOME')
+
+    Returns:
+        str or None: Chave do manobrista ou None se o valor estiver vazio
+    """
+    if not isinstance(manobrista, str):
+        return None
+    matricula = extract_matricula(manobrista)
+    if matricula:
+        return matricula.upper()
+    nome = manobrista.split('-')[-1] if '-' in manobrista else manobrista
+    return nome.strip().upper() or None
+
+
+def result_driver_keys(result_df):
+    """Chaves dos manobristas de um resultado de aggregate_driver_data.
+
+    Returns:
+        pandas.Series: Chave de cada linha, compatível com driver_key
+    """
+    matriculas = result_df['MATRICULA'].astype(str).str.strip().str.upper()
+    nomes = result_df['MANOBRISTA'].astype(str).str.strip().str.upper()
+    return matriculas.where(matriculas != '', nomes)
+
+
+def build_driver_index(df, manobrista_col='Manobrista'):
+    """Cria um índice chave do manobrista -> posições das linhas no DataFrame.
+
+    A chave é calculada uma vez por nome distinto e o agrupamento das posições
+    é feito em uma única passada.
+
+    Returns:
+        dict: Chave (ver driver_key) -> numpy.ndarray com as posições das linhas
+    """
+    if manobrista_col not in df.columns or df.empty:
+        return {}
+
+    codes, uniques = pd.factorize(df[manobrista_col])
+    chaves = [driver_key(valor) for valor in uniques]
+    key_codes, key_uniques = pd.factorize(pd.Series(chaves, dtype=object))
+    key_codes = np.append(key_codes, -1)  # posição extra para valores vazios (código -1)
+    row_key_codes = key_codes[codes]
+
+    posicoes = pd.Series(np.arange(len(df))).groupby(row_key_codes).indices
+    return {key_uniques[code]: pos for code, pos in posicoes.items() if code >= 0}
+
+
+# Colunas da tabela de veículos -> colunas da planilha de movimentação
+COLUNAS_VEICULOS = {
+    'Chassi': 'Chassi',
+    'Versão': 'Versão do modelo',
+    'Cor': 'Cor',
+    'Descrição': 'Descrição',
+}
+
+
+def _vehicle_rows(linhas):
+    """Monta as colunas Chassi, Versão, Cor, Descrição, Status e Tipo das linhas."""
+    parte = pd.DataFrame(index=range(len(linhas)))
+    for destino, origem in COLUNAS_VEICULOS.items():
+        parte[destino] = linhas[origem].to_numpy() if origem in linhas.columns else ''
+    parte['Status'] = linhas['Status'].astype('string').str.upper().fillna('').to_numpy()
+    if STATUS_CLASS_COL in linhas.columns:
+        parte['Tipo'] = linhas[STATUS_CLASS_COL].astype(str).to_numpy()
+    else:
+        parte['Tipo'] = classify_status(linhas['Status'])[1].astype(str).to_numpy()
+    return parte
+
+
+def _empty_vehicles():
+    return pd.DataFrame(columns=[*COLUNAS_VEICULOS, 'Status', 'Tipo'])
+
+
+def vehicles_for(dataframes, indices, key):
+    """Retorna os veículos movimentados por um manobrista.
+
+    Args:
+        dataframes (list): DataFrames completos lidos dos arquivos
+        indices (list): Índices criados por build_driver_index para cada DataFrame
+        key (str): Chave do manobrista (ver driver_key)
+
+    Returns:
+        pandas.DataFrame: Colunas Chassi, Versão, Cor, Descrição, Status e Tipo
+    """
+    partes = []
+    for df, indice in zip(dataframes, indices):
+        posicoes = indice.get(key)
+        if posicoes is None or 'Status' not in df.columns:
+            continue
+        partes.append(_vehicle_rows(df.iloc[posicoes]))
+
+    if not partes:
+        return _empty_vehicles()
+    return pd.concat(partes, ignore_index=True)
+
+
+def vehicles_by_driver(dataframes, indices, keys):
+    """Veículos movimentados por vários manobristas, em uma única passada.
+
+    As colunas da tabela de veículos são montadas uma vez para todas as
+    linhas e as linhas são agrupadas pelo manobrista uma única vez, de modo
+    que o custo é proporcional ao número de linhas e não ao número de
+    manobristas vezes o número de linhas (como chamar vehicles_for para
+    cada um).
+
+    Args:
+        dataframes (list): DataFrames completos lidos dos arquivos
+        indices (list): Índices criados por build_driver_index para cada DataFrame
+        keys (list): Chaves dos manobristas (ver driver_key), na ordem desejada
+
+    Yields:
+        tuple: (chave, DataFrame no mesmo formato de vehicles_for) para cada
+               chave de keys, inclusive as sem veículos (DataFrame vazio)
+    """
+    codigos = {key: codigo for codigo, key in enumerate(keys)}
+    partes = []
+    grupos = []
+    for df, indice in zip(dataframes, indices):
+        if 'Status' not in df.columns or df.empty:
+            continue
+        # Código do manobrista de cada linha (-1 para quem não foi pedido)
+        grupo = np.full(len(df), -1, dtype=np.int64)
+        for key, posicoes in indice.items():
+            codigo = codigos.get(key)
+            if codigo is not None:
+                grupo[posicoes] = codigo
+        selecionadas = np.flatnonzero(grupo >= 0)
+        partes.append(_vehicle_rows(df.iloc[selecionadas]))
+        grupos.append(grupo[selecionadas])
+
+    if partes:
+        veiculos = pd.concat(partes, ignore_index=True)
+        posicoes_por_grupo = pd.Series(np.arange(len(veiculos))).groupby(np.concatenate(grupos)).indices
+    else:
+        veiculos = _empty_vehicles()
+        posicoes_por_grupo = {}
+
+    for codigo, key in enumerate(keys):
+        posicoes = posicoes_por_grupo.get(codigo)
+        if posicoes is None:
+            yield key, veiculos.iloc[0:0].reset_index(drop=True)
+        else:
+            yield key, veiculos.iloc[posicoes].reset_index(drop=True)
+
+
+def normalize_matriculas(matriculas):
+    """Normaliza matrículas para comparação entre a planilha e o cadastro.
+
+    Remove pontuação, espaços e zeros à esquerda, de modo que
+    '000008267569723' e '8267569723', ou '068.102.626-01 ' e '06810262601',
+    sejam considerados a mesma matrícula.
+
+    Args:
+        matriculas (pandas.Series): Matrículas em qualquer formato
+
+    Returns:
+        pandas.Series: Matrículas normalizadas ('' quando vazia)
+    """
+    return (
+        matriculas.astype('string')
+        .str.replace(r'[^0-9A-Za-z]', '', regex=True)
+        .str.upper()
+        .str.lstrip('0')
+        .fillna('')
+    )
+
+
+def filter_registered(result_df, employees_df):
+    """Mantém apenas os manobristas cadastrados e ativos (semi-join pela matrícula).
+
+    Args:
+        result_df (pandas.DataFrame): Resultado de aggregate_driver_data
+        employees_df (pandas.DataFrame): Funcionários cadastrados (colunas matricula e ativo)
+
+    Returns:
+        tuple: (resultado filtrado, linhas do resultado cujas matrículas não
+                foram encontradas entre os funcionários ativos)
+    """
+    ativos = employees_df[employees_df['ativo'] == True]
+    matriculas_ativas = pd.Index(normalize_matriculas(ativos['matricula'])).difference([''])
+
+    encontrados = normalize_matriculas(result_df['MATRICULA']).isin(matriculas_ativas).to_numpy()
+    return result_df[encontrados], result_df[~encontrados]
+
+
+# Arquivo de configuração da identificação de terceiros, na pasta do aplicativo
+# (independente da pasta de onde a análise é executada)
+TERCEIROS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'terceiros.toml')
+
+
+class TerceirosMatcher:
+    """Identifica manobristas terceirizados pelo nome e pelo tipo no cadastro.
+
+    As palavras-chave são compiladas em uma única expressão regular
+    (alternância), aplicada de forma vetorizada sobre a coluna de nomes.
+    """
+
+    # Valores usados quando o arquivo de configuração não existe
+    PALAVRAS_CHAVE_PADRAO = ['teclight', 'techlight', 'teclighit', 'pdi', 'ddr']
+    TIPOS_PADRAO = ['terceiro', 'teclight']
+
+    def __init__(self, palavras_chave, tipos=()):
+        """Inicializa o identificador.
+
+        Args:
+            palavras_chave (list): Trechos do nome que identificam terceiros
+            tipos (list): Tipos do cadastro de funcionários considerados terceiros
+        """
+        palavras_chave = [p.strip() for p in palavras_chave if p and p.strip()]
+        # Palavras mais longas primeiro para a alternância preferir o trecho maior
+        palavras_chave.sort(key=len, reverse=True)
+        self.pattern = re.compile('|'.join(map(re.escape, palavras_chave)), re.IGNORECASE) if palavras_chave else None
+        self.tipos = {str(t).strip().lower() for t in tipos}
+
+    @classmethod
+    def from_config(cls, config_file=TERCEIROS_CONFIG):
+        """Cria o identificador a partir do arquivo de configuração TOML."""
+        if not os.path.exists(config_file):
+            return cls(cls.PALAVRAS_CHAVE_PADRAO, cls.TIPOS_PADRAO)
+        try:
+            with open(config_file, 'rb') as f:
+                config = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            print(f"Erro ao ler configuração de terceiros: {e}")
+            return cls(cls.PALAVRAS_CHAVE_PADRAO, cls.TIPOS_PADRAO)
+        return cls(
+            config.get('palavras_chave', cls.PALAVRAS_CHAVE_PADRAO),
+            config.get('tipos', cls.TIPOS_PADRAO)
+        )
+
+    def match_names(self, nomes):
+        """Retorna uma máscara indicando quais nomes contêm uma palavra-chave."""
+        if self.pattern is None:
+            return pd.Series(False, index=nomes.index)
+        return nomes.astype('string').str.contains(self.pattern, na=False).astype(bool)
+
+    def match(self, result_df, employees_df=None):
+        """Identifica os terceiros de um resultado de aggregate_driver_data.
+
+        Args:
+            result_df (pandas.DataFrame): Resultado com colunas MATRICULA e MANOBRISTA
+            employees_df (pandas.DataFrame, optional): Funcionários cadastrados; quando
+                o manobrista está cadastrado, o tipo do cadastro decide
+
+        Returns:
+            pandas.Series: Máscara booleana (True para terceiros)
+        """
+        por_nome = self.match_names(result_df['MANOBRISTA'])
+        if employees_df is None or employees_df.empty or not self.tipos:
+            return por_nome
+
+        cadastro = pd.Series(
+            employees_df['tipo'].astype('string').str.strip().str.lower().to_numpy(),
+            index=normalize_matriculas(employees_df['matricula']).to_numpy()
+        )
+        cadastro = cadastro[(cadastro.index != '') & ~cadastro.index.duplicated()]
+
+        tipos = normalize_matriculas(result_df['MATRICULA']).map(cadastro)
+        por_tipo = tipos.isin(self.tipos).astype(bool)
+        return por_tipo.where(tipos.notna(), por_nome).astype(bool)
@@ -1,15 +1,30 @@
 import os
 import pandas as pd
 import csv
+import tempfile
+import threading
+
+COLUNAS = ['matricula', 'nome', 'tipo', 'ativo']
 
 class EmployeeDatabase:
-    """Classe para gerenciar o banco de dados de funcionários."""
+    """Classe para gerenciar o banco de dados de funcionários.
+    
+    Os dados ficam em memória, indexados pela matrícula, e são recarregados
+    apenas quando o arquivo CSV é modificado (data de modificação diferente).
+    Alterações são gravadas imediatamente no arquivo de forma atômica.
+    """
     
     def __init__(self, db_file='funcionarios.csv'):
         """Inicializa o banco de dados de funcionários."""
         # Caminho para o arquivo de banco de dados
         self.db_file = db_file
         
+        # Cache em memória: DataFrame, índice matrícula -> posição e mtime do arquivo
+        self._lock = threading.RLock()
+        self._df = None
+        self._index = {}
+        self._mtime = None
+        
         # Criar o arquivo se não existir
         if not os.path.exists(db_file):
             self._create_empty_db()
@@ -18,21 +33,61 @@ class EmployeeDatabase:
         """Cria um banco de dados vazio com as colunas necessárias."""
         with open(self.db_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(['matricula', 'nome', 'tipo', 'ativo'])
+            writer.writerow(COLUNAS)
+    
+    def _file_mtime(self):
+        """Identifica a versão do arquivo em disco (data de modificação e tamanho)."""
+        try:
+            stat = os.stat(self.db_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def _set_data(self, df, mtime):
+        """Atualiza o cache em memória e o índice por matrícula."""
+        self._df = df.reset_index(drop=True)
+        self._index = {}
+        for pos, matricula in enumerate(self._df['matricula']):
+            # Em caso de matrícula repetida vale a primeira ocorrência
+            self._index.setdefault(matricula, pos)
+        self._mtime = mtime
+    
+    def _load(self):
+        """Retorna os dados em memória, relendo o arquivo apenas se ele mudou."""
+        with self._lock:
+            mtime = self._file_mtime()
+            if self._df is None or mtime != self._mtime:
+                try:
+                    df = pd.read_csv(self.db_file, encoding='utf-8', dtype={'matricula': str})
+                except Exception as e:
+                    print(f"Erro ao ler banco de dados: {e}")
+                    df = pd.DataFrame(columns=COLUNAS)
+                self._set_data(df, mtime)
+            return self._df
+    
+    def _save(self, df):
+        """Grava o DataFrame no arquivo (temporário + renomeação) e atualiza o cache."""
+        with self._lock:
+            pasta = os.path.dirname(os.path.abspath(self.db_file))
+            fd, tmp_path = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                    df.to_csv(f, index=False)
+                os.replace(tmp_path, self.db_file)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._set_data(df, self._file_mtime())
     
     def get_all_employees(self):
         """Retorna todos os funcionários do banco de dados."""
-        try:
-            df = pd.read_csv(self.db_file, encoding='utf-8')
-            return df
-        except Exception as e:
-            print(f"Erro ao ler banco de dados: {e}")
-            return pd.DataFrame(columns=['matricula', 'nome', 'tipo', 'ativo'])
+        return self._load().copy()
     
     def get_active_employees(self):
         """Retorna apenas os funcionários ativos."""
-        df = self.get_all_employees()
-        return df[df['ativo'] == True]
+        df = self._load()
+        return df[df['ativo'] == True].copy()
     
     def add_employee(self, matricula, nome, tipo='interno', ativo=True):
         """Adiciona um novo funcionário ao banco de dados.
@@ -43,66 +98,85 @@ class EmployeeDatabase:
             tipo (str): Tipo do funcionário (interno, chofer, teclight, etc)
             ativo (bool): Se o funcionário está ativo
         """
-        # Verificar se a matrícula já existe
-        df = self.get_all_employees()
-        if not df.empty and matricula in df['matricula'].values:
-            return False, "Matrícula já cadastrada"
-        
-        # Adicionar novo funcionário
-        new_row = pd.DataFrame({
-            'matricula': [matricula],
-            'nome': [nome],
-            'tipo': [tipo],
-            'ativo': [ativo]
-        })
-        
-        # Concatenar com o DF existente e salvar
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(self.db_file, index=False, encoding='utf-8')
+        with self._lock:
+            # Verificar se a matrícula já existe
+            df = self._load()
+            if matricula in self._index:
+                return False, "Matrícula já cadastrada"
+            
+            # Adicionar novo funcionário
+            new_row = pd.DataFrame({
+                'matricula': [matricula],
+                'nome': [nome],
+                'tipo': [tipo],
+                'ativo': [ativo]
+            })
+            
+            # Concatenar com o DF existente e salvar
+            df = pd.concat([df, new_row], ignore_index=True) if not df.empty else new_row
+            self._save(df)
         return True, "Funcionário cadastrado com sucesso"
     
     def update_employee(self, matricula, nome=None, tipo=None, ativo=None):
         """Atualiza os dados de um funcionário existente."""
-        df = self.get_all_employees()
-        
-        # Verificar se a matrícula existe
-        if df.empty or matricula not in df['matricula'].values:
-            return False, "Matrícula não encontrada"
-        
-        # Atualizar os campos fornecidos
-        idx = df[df['matricula'] == matricula].index[0]
-        if nome is not None:
-            df.loc[idx, 'nome'] = nome
-        if tipo is not None:
-            df.loc[idx, 'tipo'] = tipo
-        if ativo is not None:
-            df.loc[idx, 'ativo'] = ativo
-        
-        # Salvar alterações
-        df.to_csv(self.db_file, index=False, encoding='utf-8')
+        with self._lock:
+            df = self._load()
+            
+            # Verificar se a matrícula existe
+            if matricula not in self._index:
+                return False, "Matrícula não encontrada"
+            
+            # Atualizar os campos fornecidos
+            df = df.copy()
+            idx = self._index[matricula]
+            if nome is not None:
+                df.loc[idx, 'nome'] = nome
+            if tipo is not None:
+                df.loc[idx, 'tipo'] = tipo
+            if ativo is not None:
+                df.loc[idx, 'ativo'] = ativo
+            
+            # Salvar alterações
+            self._save(df)
         return True, "Dados atualizados com sucesso"
     
     def delete_employee(self, matricula):
         """Remove um funcionário do banco de dados."""
-        df = self.get_all_employees()
-        
-        # Verificar se a matrícula existe
-        if df.empty or matricula not in df['matricula'].values:
-            return False, "Matrícula não encontrada"
-        
-        # Remover o funcionário
-        df = df[df['matricula'] != matricula]
-        df.to_csv(self.db_file, index=False, encoding='utf-8')
+        with self._lock:
+            df = self._load()
+            
+            # Verificar se a matrícula existe
+            if matricula not in self._index:
+                return False, "Matrícula não encontrada"
+            
+            # Remover o funcionário
+            df = df[df['matricula'] != matricula]
+            self._save(df)
         return True, "Funcionário removido com sucesso"
     
     def get_employee_by_matricula(self, matricula):
         """Busca um funcionário pela matrícula."""
-        df = self.get_all_employees()
+        with self._lock:
+            df = self._load()
+            pos = self._index.get(matricula)
+            if pos is None:
+                return None
+            return df.iloc[pos].copy()
+    
+    def get_many(self, matriculas):
+        """Busca vários funcionários de uma vez pela matrícula.
         
-        if df.empty or matricula not in df['matricula'].values:
-            return None
+        Args:
+            matriculas (iterable): Matrículas a buscar
         
-        return df[df['matricula'] == matricula].iloc[0]
+        Returns:
+            pandas.DataFrame: Funcionários encontrados, na ordem das matrículas
+                              informadas (matrículas não cadastradas são ignoradas)
+        """
+        with self._lock:
+            df = self._load()
+            posicoes = [self._index[m] for m in matriculas if m in self._index]
+            return df.iloc[posicoes].copy()
     
     def search_employees(self, query):
         """Pesquisa funcionários por nome ou matrícula."""
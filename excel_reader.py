@@ -0,0 +1,203 @@
+import json
+from array import array
+from operator import itemgetter
+
+import pandas as pd
+
+# openpyxl e pyarrow são importados apenas quando usados, para que os módulos
+# que dependem só das constantes (ex: producao.core) carreguem rapidamente
+
+# Colunas utilizadas pelo sistema e sua posição padrão na planilha
+# (usada quando o cabeçalho não tem o nome esperado)
+COLUNAS_ESPERADAS = {
+    'Chassi': 0,          # Coluna A
+    'Versão do modelo': 2, # Coluna C
+    'Cor': 3,             # Coluna D
+    'Status': 4,          # Coluna E
+    'Descrição': 5,       # Coluna F
+    'Data/Hora movimentação': 6, # Coluna G
+    'Manobrista': 7       # Coluna H
+}
+
+# Data e hora de cada movimentação, no formato '24/04/2025 - 22:15'
+COLUNA_DATA_HORA = 'Data/Hora movimentação'
+FORMATO_DATA_HORA = '%d/%m/%Y - %H:%M'
+
+# Colunas de texto repetitivo, guardadas como Categorical já durante a leitura
+# (uma exportação tem várias movimentações no mesmo minuto)
+COLUNAS_CATEGORICAS = ['Versão do modelo', 'Cor', 'Status', COLUNA_DATA_HORA, 'Manobrista']
+
+# Versão do mapeamento de colunas. Deve ser incrementada sempre que
+# COLUNAS_ESPERADAS ou o formato dos dados lidos mudar, invalidando o cache
+SCHEMA_VERSION = 4
+
+# Intervalo (em linhas) entre as atualizações de progresso
+PROGRESS_INTERVAL = 5000
+
+
+def _vazio(valor):
+    """Indica se a célula está vazia: None ou texto em branco.
+
+    Como em pandas.read_excel, células vazias são lidas como valores ausentes
+    (e não como ''), para que linhas sem manobrista possam ser descartadas.
+    """
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+class _TextColumn(list):
+    """Coluna comum, com células em branco guardadas como None."""
+
+    def append(self, valor):
+        super().append(None if _vazio(valor) else valor)
+
+
+def resolve_columns(header):
+    """Determina a posição de cada coluna utilizada a partir do cabeçalho.
+
+    Args:
+        header (list): Valores da primeira linha da planilha
+
+    Returns:
+        dict: Nome da coluna -> índice na linha (apenas colunas encontradas)
+    """
+    header = [str(valor).strip() if valor is not None else '' for valor in header]
+    posicoes = {}
+    for nome_coluna, indice in COLUNAS_ESPERADAS.items():
+        if nome_coluna in header:
+            posicoes[nome_coluna] = header.index(nome_coluna)
+        elif len(header) > indice:
+            posicoes[nome_coluna] = indice
+    return posicoes
+
+
+class _CategoricalColumn:
+    """Acumula uma coluna como códigos inteiros e uma tabela de valores distintos.
+
+    Cada linha ocupa 4 bytes em vez de uma referência para um texto.
+    """
+
+    def __init__(self):
+        self.codigos = array('i')
+        self.valores = {}
+        self.categorias = []
+
+    def append(self, valor):
+        codigo = self.valores.get(valor)
+        if codigo is None:
+            # Valor novo: células em branco (verificadas uma vez por valor) ficam com -1
+            if _vazio(valor):
+                codigo = -1
+            else:
+                codigo = len(self.categorias)
+                self.categorias.append(valor)
+            self.valores[valor] = codigo
+        self.codigos.append(codigo)
+
+    def to_categorical(self):
+        categorias = self.categorias
+        if any(not isinstance(valor, str) for valor in categorias):
+            # Tipos misturados: voltar para valores comuns
+            return [categorias[c] if c >= 0 else None for c in self.codigos]
+        return pd.Categorical.from_codes(self.codigos, categories=pd.Index(categorias, dtype=object))
+
+
+def read_movement_sheet(source, progress_callback=None):
+    """Lê a planilha de movimentação de veículos em uma única passada.
+
+    A primeira planilha é percorrida linha a linha em modo somente leitura,
+    mantendo em memória apenas as colunas utilizadas pelo sistema. O tempo
+    de leitura cresce linearmente com o número de linhas. As colunas de
+    COLUNAS_CATEGORICAS são retornadas como Categorical.
+
+    Args:
+        source (str or file): Caminho do arquivo ou objeto de arquivo (upload)
+        progress_callback (callable, optional): Função chamada com
+            (linhas_lidas, total_linhas) durante a leitura. total_linhas é
+            None quando a planilha não informa suas dimensões.
+
+    Returns:
+        tuple: (DataFrame com as colunas utilizadas, cabeçalho original)
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+
+        header = list(next(rows, ()))
+        posicoes = resolve_columns(header)
+        nomes = list(posicoes.keys())
+        indices = [posicoes[nome] for nome in nomes]
+        largura = max(indices) + 1 if indices else 0
+
+        # max_row vem da tag <dimension> do arquivo e pode não existir
+        total = ws.max_row - 1 if ws.max_row else None
+
+        colunas = {
+            nome: _CategoricalColumn() if nome in COLUNAS_CATEGORICAS else _TextColumn()
+            for nome in nomes
+        }
+        destinos = [colunas[nome].append for nome in nomes]
+        if len(indices) > 1:
+            pegar = itemgetter(*indices)
+        elif indices:
+            pegar = lambda row: (row[indices[0]],)
+        else:
+            pegar = lambda row: ()
+
+        lidas = 0
+        for row in rows:
+            lidas += 1
+            if len(row) < largura:
+                row = tuple(row) + (None,) * (largura - len(row))
+            valores = pegar(row)
+            if all(_vazio(valor) for valor in valores):
+                continue
+            for destino, valor in zip(destinos, valores):
+                destino(valor)
+
+            if progress_callback is not None and lidas % PROGRESS_INTERVAL == 0:
+                progress_callback(lidas, total)
+
+        if progress_callback is not None:
+            progress_callback(lidas, lidas)
+    finally:
+        wb.close()
+
+    dados = {
+        nome: coluna.to_categorical() if isinstance(coluna, _CategoricalColumn) else list(coluna)
+        for nome, coluna in colunas.items()
+    }
+    return pd.DataFrame(dados, columns=nomes), header
+
+
+def to_arrow_table(df, cabecalho):
+    """Converte os dados lidos em uma tabela Arrow, com o cabeçalho nos metadados.
+
+    Colunas com tipos misturados (ex: números e textos) são convertidas para texto.
+    """
+    import pyarrow as pa
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for coluna in df.columns[df.dtypes == object]:
+            df[coluna] = df[coluna].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'cabecalho'] = json.dumps([str(c) if c is not None else None for c in cabecalho]).encode('utf-8')
+    return table.replace_schema_metadata(metadata)
+
+
+def from_arrow_table(table):
+    """Operação inversa de to_arrow_table.
+
+    Returns:
+        tuple: (DataFrame, cabeçalho original)
+    """
+    metadata = table.schema.metadata or {}
+    cabecalho = json.loads(metadata.get(b'cabecalho', b'[]'))
+    return table.to_pandas(), cabecalho
@@ -0,0 +1,289 @@
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tipo MIME de cada formato de exportação
+MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+    'zip': 'application/zip',
+}
+
+# Compressão usada nos arquivos Parquet e Arrow IPC
+COMPRESSAO = 'zstd'
+
+# Esquemas das tabelas exportadas; matrícula é sempre texto para manter
+# zeros à esquerda
+SCHEMA_RESULTADO = pa.schema([
+    ('MATRICULA', pa.string()),
+    ('MANOBRISTA', pa.string()),
+    ('EM SAIDA', pa.int64()),
+    ('PARQUEADOS', pa.int64()),
+    ('TOTAL', pa.int64()),
+])
+
+SCHEMA_VEICULOS = pa.schema([
+    ('Chassi', pa.string()),
+    ('Versão', pa.string()),
+    ('Cor', pa.string()),
+    ('Descrição', pa.string()),
+    ('Status', pa.string()),
+    ('Tipo', pa.string()),
+])
+
+SCHEMA_FUNCIONARIOS = pa.schema([
+    ('matricula', pa.string()),
+    ('nome', pa.string()),
+    ('tipo', pa.string()),
+    ('ativo', pa.bool_()),
+])
+
+# Linhas convertidas de cada vez ao gravar o Excel; limita a memória usada
+# na conversão para valores Python independentemente do tamanho da tabela
+LINHAS_POR_BLOCO = 10000
+
+
+def _write_sheet(workbook, df, sheet_name, cabecalho_format):
+    """Grava o DataFrame em uma nova planilha, linha a linha e em blocos."""
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(coluna) for coluna in df.columns], cabecalho_format)
+
+    linha = 1
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        # Valores Python (int, float, str) com vazios como None (célula em branco)
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO].astype(object)
+        bloco = bloco.where(bloco.notna(), None)
+        for valores in bloco.itertuples(index=False, name=None):
+            worksheet.write_row(linha, 0, valores)
+            linha += 1
+
+
+def write_xlsx(df, destino, sheet_name='Sheet1', in_memory=False):
+    """Grava o DataFrame em .xlsx no modo de memória constante do xlsxwriter.
+
+    As linhas são gravadas em sequência e descarregadas em disco a cada
+    nova linha, em vez de montar a planilha inteira em memória como em
+    DataFrame.to_excel. Textos como matrículas com zeros à esquerda são
+    mantidos como texto.
+
+    Args:
+        df (pandas.DataFrame): Dados a exportar
+        destino (str or file): Caminho do arquivo ou objeto de arquivo (ex: BytesIO)
+        sheet_name (str): Nome da planilha
+        in_memory (bool): Montar a planilha em memória, sem arquivos
+            temporários (apenas para tabelas pequenas)
+    """
+    write_xlsx_sheets([(sheet_name, df)], destino, in_memory=in_memory)
+
+
+def write_xlsx_sheets(planilhas, destino, in_memory=False):
+    """Grava várias planilhas em um único .xlsx, no modo de memória constante.
+
+    Cada planilha é gravada por completo antes da próxima, de modo que
+    planilhas podem ser geradas sob demanda (ex: por um gerador).
+
+    Args:
+        planilhas (iterable): Pares (nome da planilha, DataFrame); nomes
+            inválidos no Excel são ajustados (ver sheet_name)
+        destino (str or file): Caminho do arquivo ou objeto de arquivo (ex: BytesIO)
+        in_memory (bool): Ver write_xlsx
+    """
+    import xlsxwriter
+
+    opcoes = {'in_memory': True} if in_memory else {'constant_memory': True}
+    workbook = xlsxwriter.Workbook(destino, opcoes)
+    try:
+        negrito = workbook.add_format({'bold': True})
+        usados = set()
+        for nome, df in planilhas:
+            _write_sheet(workbook, df, sheet_name(nome, usados), negrito)
+        if not usados:
+            workbook.add_worksheet()
+    finally:
+        workbook.close()
+
+
+# Caracteres não aceitos pelo Excel em nomes de planilha
+_CARACTERES_PLANILHA = re.compile(r'[\[\]:*?/\\]')
+
+# Tamanho máximo do nome de uma planilha no Excel
+TAMANHO_NOME_PLANILHA = 31
+
+
+def sheet_name(nome, usados):
+    """Nome de planilha válido no Excel e diferente dos já usados.
+
+    Remove caracteres não aceitos, limita a 31 caracteres e acrescenta um
+    número quando o nome já existir (comparação sem diferenciar maiúsculas).
+
+    Args:
+        nome (str): Nome desejado
+        usados (set): Nomes já usados (em minúsculas); o nome escolhido é adicionado
+
+    Returns:
+        str: Nome da planilha
+    """
+    base = _CARACTERES_PLANILHA.sub('_', str(nome)).strip().strip("'") or 'Planilha'
+    candidato = base[:TAMANHO_NOME_PLANILHA]
+    numero = 2
+    while candidato.lower() in usados:
+        sufixo = f" ({numero})"
+        candidato = base[:TAMANHO_NOME_PLANILHA - len(sufixo)] + sufixo
+        numero += 1
+    usados.add(candidato.lower())
+    return candidato
+
+
+def xlsx_bytes(df, sheet_name='Sheet1'):
+    """Conteúdo de um arquivo .xlsx com os dados (ver write_xlsx)."""
+    buffer = BytesIO()
+    write_xlsx(df, buffer, sheet_name=sheet_name)
+    return buffer.getvalue()
+
+
+def csv_bytes(df):
+    """Conteúdo de um arquivo CSV (UTF-8) com os dados."""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def to_arrow(df, schema=None):
+    """Converte o DataFrame em tabela Arrow, coluna a coluna.
+
+    Cada coluna é convertida diretamente para o tipo do esquema, sem copiar
+    o DataFrame inteiro antes. Colunas de texto no esquema que não são texto
+    no DataFrame (ex: matrícula lida como número) são convertidas para str,
+    mantendo os valores vazios.
+
+    Args:
+        df (pandas.DataFrame): Dados a converter
+        schema (pyarrow.Schema, optional): Esquema da tabela; sem esquema os
+            tipos são inferidos
+
+    Returns:
+        pyarrow.Table: Tabela com as colunas do esquema, na ordem do esquema
+    """
+    if schema is None:
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    colunas = {}
+    for campo in schema:
+        serie = df[campo.name]
+        if pa.types.is_string(campo.type) and not (
+            pd.api.types.is_string_dtype(serie) or isinstance(serie.dtype, pd.CategoricalDtype)
+        ):
+            serie = serie.astype(str).where(serie.notna(), None)
+        colunas[campo.name] = pa.array(serie, type=campo.type, from_pandas=True)
+    return pa.Table.from_pydict(colunas, schema=schema)
+
+
+def parquet_bytes(df, schema=None):
+    """Conteúdo de um arquivo Parquet (compressão COMPRESSAO) com os dados."""
+    buffer = pa.BufferOutputStream()
+    pq.write_table(to_arrow(df, schema), buffer, compression=COMPRESSAO)
+    return buffer.getvalue().to_pybytes()
+
+
+def arrow_bytes(df, schema=None):
+    """Conteúdo de um arquivo Arrow IPC (compressão COMPRESSAO) com os dados."""
+    tabela = to_arrow(df, schema)
+    buffer = pa.BufferOutputStream()
+    opcoes = pa.ipc.IpcWriteOptions(compression=COMPRESSAO)
+    with pa.ipc.new_file(buffer, tabela.schema, options=opcoes) as writer:
+        writer.write_table(tabela)
+    return buffer.getvalue().to_pybytes()
+
+
+# Funções que geram o conteúdo de cada formato
+CONVERSORES = {
+    'xlsx': xlsx_bytes,
+    'csv': csv_bytes,
+    'parquet': parquet_bytes,
+    'arrow': arrow_bytes,
+}
+
+# Formatos que usam o esquema informado em export_bytes
+FORMATOS_COLUNARES = ('parquet', 'arrow')
+
+
+def export_bytes(df, formato, schema=None):
+    """Gera o conteúdo do arquivo exportado no formato pedido.
+
+    Args:
+        df (pandas.DataFrame): Dados a exportar
+        formato (str): Uma das chaves de CONVERSORES
+        schema (pyarrow.Schema, optional): Esquema dos formatos colunares
+            (ex: SCHEMA_RESULTADO); ignorado em xlsx e csv
+
+    Returns:
+        bytes: Conteúdo do arquivo
+    """
+    if formato in FORMATOS_COLUNARES:
+        return CONVERSORES[formato](df, schema)
+    return CONVERSORES[formato](df)
+
+
+class ExportCache:
+    """Arquivos exportados, compartilhados entre sessões.
+
+    Cada arquivo é identificado pelo identificador dos dados
+    (producao.core.result_fingerprint) e pelo formato, de modo que baixar
+    novamente os mesmos dados não gera o arquivo outra vez. O tamanho total
+    é limitado e os arquivos usados há mais tempo são removidos primeiro.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """Inicializa o cache.
+
+        Args:
+            max_bytes (int): Tamanho máximo ocupado pelos arquivos
+        """
+        self.max_bytes = max_bytes
+        self._arquivos = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint, formato, df, schema=None):
+        """Retorna o conteúdo exportado, gerando-o apenas se ainda não estiver no cache.
+
+        Args:
+            fingerprint (str): Identificador dos dados
+            formato (str): Formato do arquivo (ver export_bytes)
+            df (pandas.DataFrame): Dados, usados apenas se o arquivo precisar ser gerado
+            schema (pyarrow.Schema, optional): Esquema dos formatos colunares
+
+        Returns:
+            bytes: Conteúdo do arquivo
+        """
+        key = (fingerprint, formato)
+        with self._lock:
+            conteudo = self._arquivos.get(key)
+            if conteudo is not None:
+                self._arquivos.move_to_end(key)
+                return conteudo
+
+        conteudo = export_bytes(df, formato, schema)
+
+        with self._lock:
+            anterior = self._arquivos.pop(key, None)
+            if anterior is not None:
+                self._total -= len(anterior)
+            self._arquivos[key] = conteudo
+            self._total += len(conteudo)
+            while self._total > self.max_bytes and len(self._arquivos) > 1:
+                _, removido = self._arquivos.popitem(last=False)
+                self._total -= len(removido)
+        return conteudo
+
+    def memory_usage(self):
+        """Tamanho dos arquivos guardados, em bytes."""
+        return self._total
+
+    def __len__(self):
+        return len(self._arquivos)
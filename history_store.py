@@ -0,0 +1,469 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from driver_analysis import (
+    STATUS_CLASS_COL, aggregate_driver_data, blank_names, classify_status, count_by_driver,
+    driver_result, extract_matricula, upper_names
+)
+from excel_reader import COLUNA_DATA_HORA, COLUNAS_CATEGORICAS, FORMATO_DATA_HORA
+
+# Colunas gravadas no histórico (a data/hora é convertida para timestamp)
+SCHEMA_HISTORICO = pa.schema([
+    ('Chassi', pa.string()),
+    ('Versão do modelo', pa.string()),
+    ('Cor', pa.string()),
+    ('Status', pa.string()),
+    ('Descrição', pa.string()),
+    (COLUNA_DATA_HORA, pa.timestamp('s')),
+    ('Manobrista', pa.string()),
+])
+
+# Colunas que identificam uma movimentação
+CHAVE_MOVIMENTACAO = ['Chassi', 'Status', 'Manobrista', COLUNA_DATA_HORA]
+
+# Prefixo das pastas de partição (uma por dia: data=2025-04-24)
+PREFIXO_PARTICAO = 'data='
+
+# Resumo diário por manobrista mantido junto com o histórico
+COLUNAS_CONTAGEM = ['EM SAIDA', 'PARQUEADOS', 'TOTAL']
+SCHEMA_RESUMO = pa.schema([
+    ('Data', pa.date32()),
+    ('MATRICULA', pa.string()),
+    ('Manobrista', pa.string()),
+    ('EM SAIDA', pa.int64()),
+    ('PARQUEADOS', pa.int64()),
+    ('TOTAL', pa.int64()),
+])
+
+
+def parse_movement_times(valores):
+    """Converte a coluna Data/Hora movimentação para datetime.
+
+    Aceita textos no formato da exportação ('24/04/2025 - 22:15') e datas
+    já convertidas pelo Excel; valores em outro formato ficam como NaT.
+
+    Args:
+        valores (pandas.Series): Coluna Data/Hora movimentação
+
+    Returns:
+        pandas.Series: Coluna datetime64 com o mesmo índice
+    """
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        # Converter apenas os valores distintos
+        categorias = pd.to_datetime(
+            pd.Series(valores.cat.categories, dtype=object), format=FORMATO_DATA_HORA, errors='coerce'
+        )
+        codigos = valores.cat.codes.to_numpy()
+        convertidos = categorias.to_numpy()[codigos]
+        convertidos[codigos == -1] = None
+        return pd.Series(convertidos, index=valores.index, name=valores.name).astype('datetime64[s]')
+    return pd.to_datetime(valores.astype(object), format=FORMATO_DATA_HORA, errors='coerce').astype('datetime64[s]')
+
+
+def _as_text(serie):
+    """Converte uma coluna para texto, mantendo valores vazios como None."""
+    serie = serie.astype(object).where(serie.notna(), None)
+    return serie.map(lambda valor: valor if valor is None or isinstance(valor, str) else str(valor))
+
+
+def _occurrences(df):
+    """Numera as repetições de cada chave de movimentação (0, 1, 2...).
+
+    A mesma chave pode aparecer mais de uma vez em uma exportação (ex: saída
+    da vaga e separação para expedição no mesmo minuto). Comparando a chave
+    junto com a ocorrência, cada repetição só é descartada se o histórico já
+    tiver o mesmo número de repetições.
+    """
+    return df.groupby(CHAVE_MOVIMENTACAO, dropna=False, sort=False, observed=True).cumcount()
+
+
+def _analysis_rows(df):
+    """Status classificado e nomes em maiúsculas, sem linhas de manobrista vazio.
+
+    Mesmo tratamento de producao.core.prepare e analysis_frame, aplicado às
+    movimentações lidas do histórico.
+    """
+    status, classes = classify_status(df['Status'])
+    analise = pd.DataFrame({
+        'Status': status,
+        'Manobrista': upper_names(df['Manobrista']),
+        STATUS_CLASS_COL: classes,
+    }, index=df.index)
+    return analise[~blank_names(analise['Manobrista'])]
+
+
+def daily_counts(df, dia):
+    """Conta EM SAIDA, PARQUEADOS e TOTAL por manobrista nas movimentações de um dia.
+
+    Args:
+        df (pandas.DataFrame): Movimentações do dia (colunas Status e Manobrista)
+        dia (datetime.date): Dia das movimentações
+
+    Returns:
+        pandas.DataFrame: Linhas do resumo diário (colunas de SCHEMA_RESUMO)
+    """
+    contagens = count_by_driver(_analysis_rows(df))
+    nomes = pd.Series(contagens.index, dtype=object).astype(str)
+    return pd.DataFrame({
+        'Data': [dia] * len(contagens),
+        'MATRICULA': nomes.map(extract_matricula).tolist(),
+        'Manobrista': nomes.tolist(),
+        **{coluna: contagens[coluna].to_numpy(dtype='int64') for coluna in COLUNAS_CONTAGEM},
+    })
+
+
+class DailyRollup:
+    """Resumo diário da produção por manobrista: EM SAIDA, PARQUEADOS e TOTAL.
+
+    Uma linha por dia e manobrista ('matrícula - nome', como na agregação),
+    gravada em um único arquivo Parquet pequeno e mantida em memória. As
+    consultas de período somam essas linhas em vez de ler as movimentações.
+    """
+
+    def __init__(self, path):
+        """Inicializa o resumo.
+
+        Args:
+            path (str): Arquivo Parquet do resumo
+        """
+        self.path = path
+        self._df = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _frame(self):
+        if self._df is None:
+            try:
+                self._df = pq.read_table(self.path).to_pandas()
+            except (FileNotFoundError, OSError, pa.ArrowInvalid):
+                self._df = SCHEMA_RESUMO.empty_table().to_pandas()
+        return self._df
+
+    def _save(self, df):
+        """Grava o resumo completo (escrita atômica) e atualiza a cópia em memória."""
+        table = pa.Table.from_pandas(df, schema=SCHEMA_RESUMO, preserve_index=False)
+        pasta = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._df = df
+
+    def add(self, linhas):
+        """Soma ao resumo as contagens de movimentações novas.
+
+        Args:
+            linhas (pandas.DataFrame): Linhas no formato de daily_counts
+        """
+        if linhas.empty:
+            return
+        atual = self._frame()
+        combinado = pd.concat([atual, linhas], ignore_index=True) if not atual.empty else linhas
+        combinado = combinado.groupby(['Data', 'MATRICULA', 'Manobrista'], sort=False, as_index=False)[COLUNAS_CONTAGEM].sum()
+        self._save(combinado.sort_values('Data', kind='stable').reset_index(drop=True))
+
+    def replace(self, linhas):
+        """Substitui todo o resumo (usado na reconstrução a partir do histórico)."""
+        if linhas.empty:
+            linhas = SCHEMA_RESUMO.empty_table().to_pandas()
+        self._save(linhas.reset_index(drop=True))
+
+    def rows(self, inicio=None, fim=None):
+        """Linhas do resumo entre inicio e fim (inclusive)."""
+        df = self._frame()
+        if inicio is not None:
+            df = df[df['Data'] >= inicio]
+        if fim is not None:
+            df = df[df['Data'] <= fim]
+        return df
+
+    def aggregate(self, inicio=None, fim=None):
+        """Tabela de produção do período, no formato de aggregate_driver_data.
+
+        Returns:
+            pandas.DataFrame: Colunas MATRICULA, MANOBRISTA, EM SAIDA, PARQUEADOS e TOTAL
+                              (vazio se não houver movimentações no período)
+        """
+        linhas = self.rows(inicio, fim)
+        # Resumos gravados antes de as células em branco serem lidas como vazias
+        # podem ter linhas de manobrista ''
+        linhas = linhas[~blank_names(linhas['Manobrista'])]
+        if linhas.empty:
+            return pd.DataFrame()
+        return driver_result(linhas.groupby('Manobrista', sort=False)[COLUNAS_CONTAGEM].sum())
+
+
+class HistoryStore:
+    """Histórico de movimentações acumulado a partir das exportações diárias.
+
+    As movimentações ficam em um conjunto Parquet particionado por dia
+    (uma pasta data=AAAA-MM-DD por dia). Cada exportação é incorporada uma
+    única vez (identificada pelo hash do arquivo) e as movimentações já
+    registradas por exportações anteriores, com a mesma chave (Chassi,
+    Status, Manobrista e data/hora), são descartadas. Consultas por período
+    leem apenas as partições dos dias pedidos.
+
+    Um resumo diário por manobrista (DailyRollup) é atualizado a cada
+    exportação incorporada e atende às consultas de produção por período.
+    """
+
+    def __init__(self, base_dir='historico'):
+        """Inicializa o histórico.
+
+        Args:
+            base_dir (str): Pasta onde as partições são armazenadas
+        """
+        self.base_dir = base_dir
+        self._manifest_path = os.path.join(base_dir, 'arquivos.json')
+        self._lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+        self.rollup = DailyRollup(os.path.join(base_dir, 'resumo_diario.parquet'))
+
+    def _partition_dir(self, dia):
+        return os.path.join(self.base_dir, f"{PREFIXO_PARTICAO}{dia.isoformat()}")
+
+    def _partition_files(self, dia):
+        pasta = self._partition_dir(dia)
+        if not os.path.isdir(pasta):
+            return []
+        return sorted(
+            os.path.join(pasta, nome) for nome in os.listdir(pasta) if nome.endswith('.parquet')
+        )
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar registro de arquivos do histórico: {e}")
+            return {}
+
+    def _save_manifest(self, manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _write_partition(self, dia, df):
+        """Grava um novo arquivo na partição do dia (escrita atômica)."""
+        pasta = self._partition_dir(dia)
+        os.makedirs(pasta, exist_ok=True)
+        table = pa.Table.from_pandas(df, schema=SCHEMA_HISTORICO, preserve_index=False)
+        fd, tmp_path = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, os.path.join(pasta, f"part-{uuid.uuid4().hex}.parquet"))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def has_file(self, file_key):
+        """Indica se a exportação já foi incorporada ao histórico."""
+        return file_key in self._load_manifest()
+
+    def dates(self):
+        """Dias com movimentações no histórico, em ordem crescente.
+
+        Returns:
+            list: Objetos datetime.date
+        """
+        dias = []
+        for nome in os.listdir(self.base_dir):
+            if not nome.startswith(PREFIXO_PARTICAO):
+                continue
+            try:
+                dia = date.fromisoformat(nome[len(PREFIXO_PARTICAO):])
+            except ValueError:
+                continue
+            if self._partition_files(dia):
+                dias.append(dia)
+        return sorted(dias)
+
+    def add(self, df, file_key=None, nome_arquivo=None):
+        """Incorpora ao histórico as movimentações de uma exportação.
+
+        Movimentações sem data/hora válida são atribuídas ao dia com mais
+        movimentações do arquivo.
+
+        Args:
+            df (pandas.DataFrame): Dados lidos por read_movement_sheet (antes de prepare)
+            file_key (str, optional): Chave do arquivo (ParseCache.file_key); exportações
+                                      já incorporadas são ignoradas
+            nome_arquivo (str, optional): Nome do arquivo, guardado no registro de arquivos
+
+        Returns:
+            dict: Resumo com linhas, novas, duplicadas, dias afetados e se o
+                  arquivo já havia sido incorporado
+        """
+        resumo = {'linhas': len(df), 'novas': 0, 'duplicadas': 0, 'dias': [], 'ja_incorporado': False}
+
+        with self._lock:
+            manifest = self._load_manifest()
+            if file_key is not None and file_key in manifest:
+                resumo['ja_incorporado'] = True
+                resumo['duplicadas'] = len(df)
+                return resumo
+
+            novos = pd.DataFrame({
+                coluna: _as_text(df[coluna]) if coluna in df.columns else None
+                for coluna in SCHEMA_HISTORICO.names if coluna != COLUNA_DATA_HORA
+            }, index=df.index)
+            if COLUNA_DATA_HORA in df.columns:
+                novos[COLUNA_DATA_HORA] = parse_movement_times(df[COLUNA_DATA_HORA])
+            else:
+                novos[COLUNA_DATA_HORA] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[s]')
+            novos = novos[SCHEMA_HISTORICO.names].reset_index(drop=True)
+
+            dias = novos[COLUNA_DATA_HORA].dt.date
+            if dias.notna().any():
+                dia_padrao = dias.mode().iloc[0]
+            else:
+                dia_padrao = date.today()
+            dias = dias.where(dias.notna(), dia_padrao)
+
+            # Históricos anteriores ao resumo diário: montar o resumo antes de somar
+            self._ensure_rollup()
+
+            contagens = []
+            for dia, parte in novos.groupby(dias.to_numpy(), sort=True):
+                parte = parte.reset_index(drop=True)
+                parte['_ocorrencia'] = _occurrences(parte)
+                linhas_dia = len(parte)
+
+                arquivos = self._partition_files(dia)
+                if arquivos:
+                    existentes = pq.read_table(arquivos, columns=CHAVE_MOVIMENTACAO).to_pandas()
+                    existentes['_ocorrencia'] = _occurrences(existentes)
+                    comparacao = parte.merge(
+                        existentes, on=CHAVE_MOVIMENTACAO + ['_ocorrencia'], how='left', indicator=True
+                    )
+                    parte = parte[(comparacao['_merge'] == 'left_only').to_numpy()]
+
+                resumo['duplicadas'] += linhas_dia - len(parte)
+                if parte.empty:
+                    continue
+                self._write_partition(dia, parte.drop(columns='_ocorrencia'))
+                contagens.append(daily_counts(parte, dia))
+                resumo['novas'] += len(parte)
+                resumo['dias'].append(dia)
+
+            if contagens:
+                self.rollup.add(pd.concat(contagens, ignore_index=True))
+
+            if file_key is not None:
+                manifest[file_key] = {
+                    'nome_arquivo': nome_arquivo,
+                    'linhas': resumo['linhas'],
+                    'novas': resumo['novas'],
+                    'incorporado_em': datetime.now().isoformat(timespec='seconds'),
+                }
+                try:
+                    self._save_manifest(manifest)
+                except OSError as e:
+                    print(f"Erro ao gravar registro de arquivos do histórico: {e}")
+
+        return resumo
+
+    def load(self, inicio=None, fim=None, colunas=None):
+        """Lê as movimentações de um período.
+
+        Apenas as partições dos dias entre inicio e fim são abertas.
+
+        Args:
+            inicio (datetime.date, optional): Primeiro dia (padrão: início do histórico)
+            fim (datetime.date, optional): Último dia, inclusive (padrão: fim do histórico)
+            colunas (list, optional): Colunas a ler (padrão: todas)
+
+        Returns:
+            pandas.DataFrame: Movimentações do período, com as colunas de texto
+                              repetitivo como Categorical (vazio se não houver)
+        """
+        colunas = list(colunas or SCHEMA_HISTORICO.names)
+        arquivos = []
+        for dia in self.dates():
+            if (inicio is None or dia >= inicio) and (fim is None or dia <= fim):
+                arquivos.extend(self._partition_files(dia))
+
+        if not arquivos:
+            vazio = SCHEMA_HISTORICO.empty_table().select(colunas)
+            return vazio.to_pandas()
+
+        table = pq.read_table(
+            arquivos,
+            columns=colunas,
+            read_dictionary=[coluna for coluna in COLUNAS_CATEGORICAS if coluna in colunas and coluna != COLUNA_DATA_HORA],
+        )
+        return table.to_pandas()
+
+    def _ensure_rollup(self):
+        if not self.rollup.exists() and self.dates():
+            self._rebuild_rollup()
+
+    def _rebuild_rollup(self):
+        linhas = []
+        for dia in self.dates():
+            df = self.load(dia, dia, colunas=['Status', 'Manobrista'])
+            if not df.empty:
+                linhas.append(daily_counts(df, dia))
+        self.rollup.replace(pd.concat(linhas, ignore_index=True) if linhas else pd.DataFrame())
+        return sum(len(parte) for parte in linhas)
+
+    def rebuild_rollup(self):
+        """Reconstrói o resumo diário a partir das movimentações do histórico.
+
+        Returns:
+            int: Número de linhas (dia e manobrista) do novo resumo
+        """
+        with self._lock:
+            return self._rebuild_rollup()
+
+    def aggregate(self, inicio=None, fim=None):
+        """Produção por manobrista no período, calculada pelo resumo diário.
+
+        Args:
+            inicio (datetime.date, optional): Primeiro dia (padrão: início do histórico)
+            fim (datetime.date, optional): Último dia, inclusive (padrão: fim do histórico)
+
+        Returns:
+            pandas.DataFrame: Mesmo formato de aggregate_driver_data
+        """
+        with self._lock:
+            self._ensure_rollup()
+        return self.rollup.aggregate(inicio, fim)
+
+    def verify_rollup(self, inicio=None, fim=None):
+        """Confere o resumo diário com a agregação das movimentações do período.
+
+        Returns:
+            tuple: (True se os resultados forem iguais, mensagem)
+        """
+        esperado = aggregate_driver_data([_analysis_rows(self.load(inicio, fim, colunas=['Status', 'Manobrista']))])
+        obtido = self.aggregate(inicio, fim)
+        if esperado.empty and obtido.empty:
+            return True, "Histórico vazio no período."
+
+        # A ordem entre manobristas com o mesmo TOTAL não é significativa
+        chaves = ['MATRICULA', 'MANOBRISTA']
+        esperado = esperado.sort_values(chaves).reset_index(drop=True)
+        obtido = obtido.sort_values(chaves).reset_index(drop=True)
+        if esperado.equals(obtido):
+            return True, f"Resumo diário confere com as movimentações ({len(obtido)} manobristas)."
+        return False, "Resumo diário diferente das movimentações. Use rebuild_rollup para reconstruí-lo."
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pyarrow as pa
+
+from excel_reader import from_arrow_table, read_movement_sheet, to_arrow_table
+
+
+def _parse_worker(indice, file_bytes, fila_progresso):
+    """Lê uma planilha em um processo separado.
+
+    Retorna os dados como um buffer Arrow IPC (colunar) em vez de um DataFrame
+    serializado com pickle, reduzindo o custo de transferência entre processos.
+    """
+    def informar(lidas, total):
+        fila_progresso.put((indice, lidas, total))
+
+    df, cabecalho = read_movement_sheet(BytesIO(file_bytes), progress_callback=informar)
+    table = to_arrow_table(df, cabecalho)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _read_ipc(buffer):
+    with pa.ipc.open_stream(buffer) as reader:
+        return from_arrow_table(reader.read_all())
+
+
+class ParallelIngest:
+    """Leitura de várias planilhas em paralelo, uma por processo.
+
+    A leitura do XML do xlsx é limitada pela CPU e mantém o GIL, por isso os
+    arquivos são distribuídos entre processos. O pool é criado na primeira
+    utilização e reaproveitado nas próximas.
+    """
+
+    def __init__(self, max_workers=None):
+        """Inicializa o leitor paralelo.
+
+        Args:
+            max_workers (int, optional): Número máximo de processos (padrão: núcleos da CPU)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # 'spawn' evita copiar (fork) um servidor com várias threads em execução
+                contexto = multiprocessing.get_context('spawn')
+                self._manager = contexto.Manager()
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=contexto)
+            return self._pool, self._manager
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            if self._manager is not None:
+                self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+
+    def _parse_sequential(self, arquivos, progress_callback):
+        resultados = []
+        for indice, file_bytes in enumerate(arquivos):
+            def informar(lidas, total, indice=indice):
+                if progress_callback is not None:
+                    fracao = min(1.0, lidas / total) if total else 0.0
+                    progress_callback((indice + fracao) / len(arquivos))
+            try:
+                resultados.append(read_movement_sheet(BytesIO(file_bytes), progress_callback=informar))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+    def parse_many(self, arquivos, progress_callback=None):
+        """Lê várias planilhas, em paralelo quando houver mais de uma.
+
+        Args:
+            arquivos (list): Conteúdo (bytes) de cada arquivo
+            progress_callback (callable, optional): Função chamada com o progresso
+                combinado de todos os arquivos (0.0 a 1.0)
+
+        Returns:
+            list: (DataFrame, cabeçalho original) de cada arquivo, na mesma ordem.
+                  Arquivos com erro de leitura retornam a exceção no lugar da tupla.
+        """
+        # Um único arquivo, ou executável empacotado (onde 'spawn' iniciaria o
+        # programa novamente): leitura no próprio processo
+        if len(arquivos) <= 1 or self.max_workers <= 1 or getattr(sys, 'frozen', False):
+            return self._parse_sequential(arquivos, progress_callback)
+
+        try:
+            pool, manager = self._get_pool()
+            fila = manager.Queue()
+            futures = {
+                pool.submit(_parse_worker, indice, file_bytes, fila): indice
+                for indice, file_bytes in enumerate(arquivos)
+            }
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Leitura paralela indisponível, lendo em sequência: {e}")
+            self._reset_pool()
+            return self._parse_sequential(arquivos, progress_callback)
+
+        # Fração lida de cada arquivo, combinada em uma única barra de progresso
+        fracoes = [0.0] * len(arquivos)
+        pendentes = set(futures)
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                fracoes[futures[future]] = 1.0
+            while True:
+                try:
+                    indice, lidas, total = fila.get_nowait()
+                except queue.Empty:
+                    break
+                if total and fracoes[indice] < 1.0:
+                    fracoes[indice] = min(1.0, lidas / total)
+            if progress_callback is not None:
+                progress_callback(sum(fracoes) / len(fracoes))
+
+        resultados = [None] * len(arquivos)
+        for future, indice in futures.items():
+            try:
+                resultados[indice] = _read_ipc(future.result())
+            except BrokenProcessPool as e:
+                self._reset_pool()
+                resultados[indice] = e
+            except Exception as e:
+                resultados[indice] = e
+        return resultados
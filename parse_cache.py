@@ -0,0 +1,115 @@
+import hashlib
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from excel_reader import SCHEMA_VERSION, from_arrow_table, to_arrow_table
+
+
+class ParseCache:
+    """Cache em disco das planilhas já processadas, no formato Parquet.
+
+    Cada entrada é identificada pelo SHA-256 do conteúdo do arquivo e pela
+    versão do mapeamento de colunas, de modo que o mesmo arquivo enviado
+    novamente (mesmo após reiniciar o servidor ou por outro usuário) não
+    precisa ser lido do Excel outra vez. O tamanho total é limitado e as
+    entradas usadas há mais tempo são removidas primeiro (LRU).
+    """
+
+    def __init__(self, cache_dir='cache_planilhas', max_bytes=500 * 1024 * 1024):
+        """Inicializa o cache.
+
+        Args:
+            cache_dir (str): Pasta onde as entradas são armazenadas
+            max_bytes (int): Tamanho máximo ocupado pelo cache em disco
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_key(data):
+        """Gera a chave de cache de um arquivo.
+
+        Args:
+            data (bytes): Conteúdo do arquivo
+
+        Returns:
+            str: SHA-256 do conteúdo seguido da versão do mapeamento de colunas
+        """
+        return f"{hashlib.sha256(data).hexdigest()}-v{SCHEMA_VERSION}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key):
+        """Busca uma planilha processada no cache.
+
+        Args:
+            key (str): Chave gerada por file_key
+
+        Returns:
+            tuple or None: (DataFrame, cabeçalho original) ou None se não houver
+        """
+        path = self._path(key)
+        try:
+            table = pq.read_table(path)
+        except (FileNotFoundError, OSError, pa.ArrowInvalid):
+            return None
+
+        # Atualizar a data de acesso para a política LRU
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return from_arrow_table(table)
+
+    def put(self, key, df, cabecalho):
+        """Armazena uma planilha processada no cache.
+
+        Args:
+            key (str): Chave gerada por file_key
+            df (pandas.DataFrame): Dados lidos da planilha
+            cabecalho (list): Cabeçalho original da planilha
+        """
+        table = to_arrow_table(df, cabecalho)
+
+        # Escrita atômica: arquivo temporário seguido de renomeação
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Erro ao gravar cache de planilha: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """Remove as entradas usadas há mais tempo até respeitar o limite de tamanho."""
+        entradas = []
+        for nome in os.listdir(self.cache_dir):
+            if not nome.endswith('.parquet'):
+                continue
+            path = os.path.join(self.cache_dir, nome)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entradas.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, path in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= tamanho
+            except OSError:
+                pass
@@ -0,0 +1,5 @@
+"""Análise de produtividade de manobristas sem interface gráfica.
+
+Permite processar planilhas de movimentação de veículos em scripts e tarefas
+agendadas, sem importar streamlit, plotly ou matplotlib.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from producao.cli import main
+
+sys.exit(main())
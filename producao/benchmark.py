@@ -0,0 +1,316 @@
+"""Medição de desempenho das etapas da análise com dados sintéticos.
+
+Gera planilhas MovimentacaoVeiculos com semente fixa (reprodutíveis entre
+execuções e máquinas) e mede, para cada tamanho, o tempo e o pico de memória
+(RSS) das etapas principais: leitura, agregação, consulta de veículos,
+filtros de funcionários e exportação. Cada etapa é executada em um processo
+novo, para que o pico de memória de uma não contamine as outras.
+
+Uso:
+    python -m producao.benchmark --rows 10000 100000 --out benchmark.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from producao import core
+
+# Tamanhos padrão (linhas); 1.000.000 pode ser incluído com --rows
+TAMANHOS_PADRAO = (10_000, 100_000)
+
+# Etapas medidas, na ordem do relatório
+ETAPAS = ('ingest', 'aggregate', 'vehicles', 'filters', 'export_xlsx', 'export_csv')
+
+CABECALHO = [
+    'Chassi', 'Placa', 'Versão do modelo', 'Cor', 'Status', 'Descrição',
+    'Data/Hora movimentação', 'Manobrista', 'Usuário', 'DN', 'Tipo de embarque', 'Canal de venda'
+]
+
+MODELOS = [
+    'Fiat - Argo - Argo', 'Fiat - Mobi - Mobi', 'Fiat - Pulse - Pulse', 'Fiat - Cronos - Cronos',
+    'Fiat - Fastback - Fastback', 'Fiat - Nova Strada - Strada', 'Fiat - Fiorino - Fiorino',
+    'Jeep - Compass - Compass', 'Jeep - Renegade - Limited', 'Jeep - Commander - Commander',
+    'Jeep - Toro - Toro Endurance', 'Jeep - Ram - Rampage - Ram - Rampage',
+    'Peugeot - 208 - Peugeot 208', 'Peugeot - 2008 - 2008', 'Citroen - C3 Aircross - C3 Aircross',
+]
+CORES = ['Branco', 'Preto', 'Cinza', 'Prata', 'Vermelho', 'Azul', 'Bege', 'Verde', 'Granito', 'Sem cor']
+STATUS = ['Em saída (expedição)', 'Parqueado', 'Em trânsito']
+PESOS_STATUS = [0.63, 0.36, 0.01]
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eliane', 'Fabio', 'Gabriela', 'Heberth', 'Ivone', 'Jorge',
+         'Karina', 'Luan', 'Monica', 'Natalia', 'Otavio', 'Paula', 'Rosilane', 'Sergio', 'Tatiane', 'Valdete']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Pereira', 'Ferreira', 'Santos', 'Gomes', 'Barbosa',
+              'Ribeiro', 'Martins', 'de Jesus', 'Rodrigues', 'Almeida', 'Costa', 'Lima']
+# Sufixos encontrados nas exportações reais (terceirizados e choferes)
+SUFIXOS = ['', '', '', '', '', '', ' (chofer)', ' (teclight)', '(teclight)', ' (teclighit)']
+
+
+def generate_drivers(quantidade, rng):
+    """Gera nomes de manobristas no formato 'matrícula - Nome Sobrenome (sufixo)'."""
+    matriculas = rng.choice(10 ** 9, size=quantidade, replace=False) + 64_800_000_000
+    nomes = []
+    for matricula in matriculas:
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+        nomes.append(f"{matricula:015d} - {nome}{rng.choice(SUFIXOS)}")
+    return nomes
+
+
+def generate_movements(n_rows, seed=42, n_drivers=None):
+    """Gera um DataFrame sintético com o layout da planilha MovimentacaoVeiculos.
+
+    Args:
+        n_rows (int): Número de linhas
+        seed (int): Semente do gerador aleatório
+        n_drivers (int, optional): Número de manobristas (padrão: proporcional às linhas)
+
+    Returns:
+        pandas.DataFrame: Colunas de CABECALHO, como na exportação original
+    """
+    rng = np.random.default_rng(seed)
+    n_drivers = n_drivers or min(2000, max(50, n_rows // 100))
+    manobristas = np.array(generate_drivers(n_drivers, rng) + [''], dtype=object)
+
+    # Alguns manobristas concentram mais movimentações; ~4% das linhas sem manobrista
+    pesos = rng.pareto(2.0, n_drivers) + 1
+    pesos = np.append(pesos / pesos.sum() * 0.96, 0.04)
+
+    inicio = pd.Timestamp('2025-04-24 06:00')
+    minutos = np.sort(rng.integers(0, 60 * 24 * max(1, n_rows // 5000), n_rows))
+    datas = (inicio + pd.to_timedelta(minutos, unit='min')).strftime('%d/%m/%Y - %H:%M')
+
+    setores = rng.integers(1, 20, n_rows)
+    vagas = rng.integers(1, 400, n_rows)
+    return pd.DataFrame({
+        'Chassi': [f"9BD{valor:014d}" for valor in rng.choice(10 ** 14, n_rows, replace=False)],
+        'Placa': '',
+        'Versão do modelo': rng.choice(MODELOS, n_rows),
+        'Cor': rng.choice(CORES, n_rows),
+        'Status': rng.choice(STATUS, n_rows, p=PESOS_STATUS),
+        'Descrição': [f"Veículo parqueado na vaga Igarapé - Setor {s} - F - {v}" for s, v in zip(setores, vagas)],
+        'Data/Hora movimentação': np.asarray(datas, dtype=object),
+        'Manobrista': manobristas[rng.choice(len(manobristas), n_rows, p=pesos)],
+        'Usuário': rng.choice(NOMES, n_rows),
+        'DN': '',
+        'Tipo de embarque': '',
+        'Canal de venda': '',
+    }, columns=CABECALHO)
+
+
+def generate_roster(movimentos, seed=42, fracao=0.6):
+    """Gera um cadastro de funcionários com parte dos manobristas da planilha.
+
+    Returns:
+        pandas.DataFrame: Colunas matricula, nome, tipo e ativo (como EmployeeDatabase)
+    """
+    rng = np.random.default_rng(seed + 1)
+    nomes = pd.Series(movimentos['Manobrista'].unique())
+    nomes = nomes[nomes.str.contains(' - ', regex=False)]
+    escolhidos = nomes.sample(frac=fracao, random_state=seed).str.split(' - ', n=1)
+    tipos = np.where(escolhidos.str[1].str.contains('teclig', case=False), 'teclight', 'interno')
+    return pd.DataFrame({
+        'matricula': escolhidos.str[0].str.lstrip('0').to_numpy(),
+        'nome': escolhidos.str[1].str.upper().to_numpy(),
+        'tipo': tipos,
+        'ativo': rng.random(len(escolhidos)) < 0.9,
+    })
+
+
+def write_workbook(df, path):
+    """Grava o DataFrame como .xlsx em modo de escrita contínua (openpyxl write_only)."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Movimentação')
+    ws.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None):
+        ws.append(linha)
+    wb.save(path)
+
+
+def prepare_inputs(n_rows, seed, workdir):
+    """Gera (ou reaproveita) a planilha, os dados lidos e o cadastro de um tamanho.
+
+    Returns:
+        dict: Caminhos 'xlsx', 'parquet' (dados após core.ingest) e 'roster' (CSV)
+    """
+    from excel_reader import to_arrow_table
+    import pyarrow.parquet as pq
+
+    base = os.path.join(workdir, f"movimentacao_{n_rows}_s{seed}")
+    caminhos = {'xlsx': base + '.xlsx', 'parquet': base + '.parquet', 'roster': base + '_cadastro.csv'}
+    if all(os.path.exists(caminho) for caminho in caminhos.values()):
+        return caminhos
+
+    movimentos = generate_movements(n_rows, seed)
+    write_workbook(movimentos, caminhos['xlsx'])
+    generate_roster(movimentos, seed).to_csv(caminhos['roster'], index=False)
+    df, cabecalho = core.ingest(caminhos['xlsx'])
+    pq.write_table(to_arrow_table(df, cabecalho), caminhos['parquet'])
+    return caminhos
+
+
+def peak_rss():
+    """Pico de memória residente do processo atual, em bytes (None se indisponível)."""
+    # No Linux, ru_maxrss mantém o pico do processo pai após o exec; VmHWM não
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB e macOS em bytes
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def _mb(valor):
+    return round(valor / 2 ** 20, 1) if valor is not None else None
+
+
+def _load_prepared(caminhos):
+    import pyarrow.parquet as pq
+    from excel_reader import from_arrow_table
+
+    df, _ = from_arrow_table(pq.read_table(caminhos['parquet']))
+    return df
+
+
+def _setup_stage(etapa, caminhos):
+    """Prepara as entradas de uma etapa (fora da medição) e retorna a função medida."""
+    from driver_analysis import TerceirosMatcher, filter_registered
+    from export_writer import export_bytes
+
+    if etapa == 'ingest':
+        return lambda: core.ingest(caminhos['xlsx'])
+
+    df = _load_prepared(caminhos)
+    if etapa == 'aggregate':
+        return lambda: core.aggregate([core.analysis_frame(df)])
+
+    if etapa == 'vehicles':
+        chaves = core.result_driver_keys(core.aggregate([core.analysis_frame(df)])).head(20).tolist()
+
+        def consultar():
+            indice = core.build_driver_index(df)
+            for chave in chaves:
+                core.vehicles_for([df], [indice], chave)
+        return consultar
+
+    result_df = core.aggregate([core.analysis_frame(df)])
+    if etapa == 'filters':
+        cadastro = pd.read_csv(caminhos['roster'], dtype={'matricula': str})
+        matcher = TerceirosMatcher.from_config()
+
+        def filtrar():
+            terceiros = matcher.match(result_df, cadastro)
+            filter_registered(result_df[~terceiros.to_numpy()], cadastro[cadastro['ativo']])
+        return filtrar
+
+    if etapa == 'export_xlsx':
+        return lambda: export_bytes(result_df, 'xlsx')
+    if etapa == 'export_csv':
+        return lambda: export_bytes(result_df, 'csv')
+    raise ValueError(f"Etapa desconhecida: {etapa}")
+
+
+def _run_stage(etapa, caminhos, repeticoes):
+    """Executa uma etapa no processo atual (chamado em um processo novo)."""
+    medir = _setup_stage(etapa, caminhos)
+    rss_inicial = peak_rss()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        medir()
+        tempos.append(time.perf_counter() - inicio)
+    return {'tempos': tempos, 'rss_inicial': rss_inicial, 'rss_pico': peak_rss()}
+
+
+def run_benchmarks(tamanhos=TAMANHOS_PADRAO, etapas=ETAPAS, repeticoes=3, seed=42, workdir=None):
+    """Executa as medições para cada tamanho e etapa.
+
+    Args:
+        tamanhos (iterable): Números de linhas das planilhas sintéticas
+        etapas (iterable): Etapas a medir (ver ETAPAS)
+        repeticoes (int): Execuções de cada etapa (o relatório traz mínimo e mediana)
+        seed (int): Semente dos dados sintéticos
+        workdir (str, optional): Pasta das planilhas geradas (reaproveitadas entre execuções)
+
+    Returns:
+        dict: Relatório com o ambiente e uma entrada por (tamanho, etapa)
+    """
+    workdir = workdir or os.path.join(tempfile.gettempdir(), 'producao_benchmark')
+    os.makedirs(workdir, exist_ok=True)
+    contexto = multiprocessing.get_context('spawn')
+
+    resultados = []
+    for n_rows in tamanhos:
+        caminhos = prepare_inputs(n_rows, seed, workdir)
+        for etapa in etapas:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                medida = executor.submit(_run_stage, etapa, caminhos, repeticoes).result()
+            tempos = medida['tempos']
+            resultados.append({
+                'linhas': n_rows,
+                'etapa': etapa,
+                'repeticoes': repeticoes,
+                'segundos_min': round(min(tempos), 4),
+                'segundos_mediana': round(float(np.median(tempos)), 4),
+                'linhas_por_segundo': round(n_rows / min(tempos)) if min(tempos) > 0 else None,
+                'rss_inicial_mb': _mb(medida['rss_inicial']),
+                'rss_pico_mb': _mb(medida['rss_pico']),
+            })
+            print(f"{n_rows:>9} linhas  {etapa:<12} {min(tempos):8.3f} s  "
+                  f"pico {_mb(medida['rss_pico'])} MB", file=sys.stderr)
+
+    return {
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'seed': seed,
+        'resultados': resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m producao.benchmark',
+        description='Mede tempo e memória das etapas da análise com planilhas sintéticas.'
+    )
+    parser.add_argument('--rows', type=int, nargs='+', default=list(TAMANHOS_PADRAO),
+                        help='Tamanhos das planilhas em linhas (ex: 10000 100000 1000000)')
+    parser.add_argument('--stages', nargs='+', choices=ETAPAS, default=list(ETAPAS), help='Etapas a medir')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções de cada etapa')
+    parser.add_argument('--seed', type=int, default=42, help='Semente dos dados sintéticos')
+    parser.add_argument('--workdir', help='Pasta das planilhas geradas')
+    parser.add_argument('--out', '-o', default='-', help='Arquivo JSON do relatório (padrão: saída padrão)')
+    args = parser.parse_args(argv)
+
+    relatorio = run_benchmarks(args.rows, args.stages, args.repeat, args.seed, args.workdir)
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.out == '-':
+        print(texto)
+    else:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
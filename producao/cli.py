@@ -0,0 +1,343 @@
+import argparse
+import glob
+import os
+import sys
+
+from driver_analysis import TerceirosMatcher, filter_registered
+from export_writer import SCHEMA_RESULTADO, export_bytes, write_xlsx
+from parallel_ingest import ParallelIngest
+from producao.core import aggregate_counts, analysis_frame, count, prepare
+
+# Formatos de saída aceitos, identificados pela extensão do arquivo
+FORMATOS_SAIDA = ('csv', 'xlsx', 'parquet', 'arrow')
+
+# Pasta do aplicativo, onde a interface grava o cadastro de funcionários
+PASTA_APLICATIVO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Arquivo padrão do cadastro em cada armazenamento
+ARQUIVOS_CADASTRO = {'sqlite': 'manobristas.db', 'csv': 'funcionarios.csv'}
+
+
+def expand_inputs(entradas):
+    """Expande a lista de entradas da linha de comando em arquivos .xlsx.
+
+    Pastas são substituídas pelos arquivos .xlsx contidos nelas e padrões
+    (ex: '*.xlsx') são expandidos mesmo quando o shell não o faz (Windows).
+
+    Args:
+        entradas (list): Arquivos, pastas ou padrões
+
+    Returns:
+        list: Caminhos dos arquivos, sem repetições e na ordem informada
+    """
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            encontrados = sorted(glob.glob(os.path.join(entrada, '*.xlsx')))
+        elif glob.has_magic(entrada):
+            encontrados = sorted(glob.glob(entrada))
+        else:
+            encontrados = [entrada]
+        for caminho in encontrados:
+            # Ignorar arquivos temporários do Excel (~$arquivo.xlsx)
+            if os.path.basename(caminho).startswith('~$'):
+                continue
+            if caminho not in caminhos:
+                caminhos.append(caminho)
+    return caminhos
+
+
+def load_files(caminhos, cache_dir=None, workers=None):
+    """Lê as planilhas informadas, em paralelo quando houver mais de uma.
+
+    Args:
+        caminhos (list): Caminhos dos arquivos .xlsx
+        cache_dir (str, optional): Pasta do cache de planilhas (ParseCache); sem cache se None
+        workers (int, optional): Número máximo de processos de leitura
+
+    Returns:
+        list: (caminho, DataFrame) de cada arquivo; arquivos com erro trazem a exceção no lugar do DataFrame
+    """
+    cache = None
+    if cache_dir:
+        from parse_cache import ParseCache
+        cache = ParseCache(cache_dir)
+
+    arquivos = []
+    for caminho in caminhos:
+        try:
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+        except OSError as e:
+            arquivos.append({'caminho': caminho, 'lido': e})
+            continue
+        chave = cache.file_key(dados) if cache else None
+        arquivos.append({
+            'caminho': caminho,
+            'bytes': dados,
+            'chave': chave,
+            'lido': cache.get(chave) if cache else None,
+        })
+
+    faltantes = [arquivo for arquivo in arquivos if arquivo['lido'] is None]
+    if faltantes:
+        lidos = ParallelIngest(max_workers=workers).parse_many([arquivo['bytes'] for arquivo in faltantes])
+        for arquivo, lido in zip(faltantes, lidos):
+            arquivo['lido'] = lido
+            if cache and not isinstance(lido, Exception):
+                cache.put(arquivo['chave'], *lido)
+
+    resultados = []
+    for arquivo in arquivos:
+        lido = arquivo['lido']
+        resultados.append((arquivo['caminho'], lido if isinstance(lido, Exception) else lido[0]))
+    return resultados
+
+
+def get_employee_database(storage=None, db_file=None):
+    """Abre o cadastro de funcionários no mesmo armazenamento usado pela interface.
+
+    O arquivo padrão fica na pasta do aplicativo, independentemente da pasta
+    de onde o comando é executado. O cadastro é apenas lido: um arquivo
+    inexistente não é criado.
+
+    Args:
+        storage (str, optional): 'sqlite' ou 'csv' (padrão: variável MANOBRISTAS_STORAGE ou 'sqlite')
+        db_file (str, optional): Arquivo do banco (padrão: ARQUIVOS_CADASTRO na pasta do aplicativo)
+
+    Returns:
+        EmployeeDatabase: Cadastro de funcionários
+
+    Raises:
+        FileNotFoundError: Se o arquivo do cadastro não existir
+    """
+    storage = (storage or os.environ.get('MANOBRISTAS_STORAGE', 'sqlite')).lower()
+    if storage not in ARQUIVOS_CADASTRO:
+        storage = 'sqlite'
+    db_file = db_file or os.path.join(PASTA_APLICATIVO, ARQUIVOS_CADASTRO[storage])
+    if not os.path.isfile(db_file):
+        raise FileNotFoundError(f"Cadastro de funcionários não encontrado: {db_file}")
+
+    if storage == 'csv':
+        from employee_db import EmployeeDatabase
+        return EmployeeDatabase(db_file)
+    from sqlite_backend import SQLiteEmployeeDatabase
+    # Sem importação de CSV: o banco é usado como está
+    return SQLiteEmployeeDatabase(db_file, csv_file=None)
+
+
+def analyze_files(caminhos, excluir_terceiros=True, apenas_cadastrados=False,
+                  employee_db=None, cache_dir=None, workers=None):
+    """Executa a análise de produtividade completa sobre uma lista de planilhas.
+
+    Args:
+        caminhos (list): Caminhos dos arquivos .xlsx
+        excluir_terceiros (bool): Remover manobristas terceirizados (terceiros.toml)
+        apenas_cadastrados (bool): Manter apenas funcionários ativos cadastrados
+        employee_db (EmployeeDatabase, optional): Cadastro usado pelos filtros (padrão:
+            get_employee_database; sem cadastro, os terceiros são identificados
+            apenas pelo nome)
+        cache_dir (str, optional): Pasta do cache de planilhas
+        workers (int, optional): Número máximo de processos de leitura
+
+    Returns:
+        tuple: (DataFrame com MATRICULA, MANOBRISTA, EM SAIDA, PARQUEADOS e TOTAL,
+                dicionário com o resumo do processamento)
+
+    Raises:
+        FileNotFoundError: Se apenas_cadastrados for usado sem cadastro de funcionários
+    """
+    resumo = {
+        'arquivos': 0,
+        'erros': [],
+        'terceiros_filtrados': 0,
+        'nao_cadastrados': None,
+    }
+
+    # Cada arquivo é contado separadamente e as contagens são combinadas no final
+    parciais = []
+    for caminho, df in load_files(caminhos, cache_dir=cache_dir, workers=workers):
+        if isinstance(df, Exception):
+            resumo['erros'].append((caminho, str(df)))
+            continue
+        parciais.append(count(analysis_frame(prepare(df))))
+        resumo['arquivos'] += 1
+
+    result_df = aggregate_counts(parciais)
+    if result_df.empty:
+        return result_df, resumo
+
+    if (excluir_terceiros or apenas_cadastrados) and employee_db is None:
+        try:
+            employee_db = get_employee_database()
+        except FileNotFoundError:
+            # Sem cadastro, os terceiros são identificados apenas pelo nome
+            if apenas_cadastrados:
+                raise
+
+    if excluir_terceiros:
+        funcionarios = employee_db.get_all_employees() if employee_db is not None else None
+        terceiros = TerceirosMatcher.from_config().match(result_df, funcionarios)
+        resumo['terceiros_filtrados'] = int(terceiros.sum())
+        result_df = result_df[~terceiros.to_numpy()]
+
+    if apenas_cadastrados:
+        filtered_df, nao_encontrados = filter_registered(result_df, employee_db.get_active_employees())
+        resumo['nao_cadastrados'] = nao_encontrados
+        # Como na interface, o filtro não é aplicado se nenhum manobrista estiver cadastrado
+        if not filtered_df.empty:
+            result_df = filtered_df
+
+    return result_df, resumo
+
+
+def output_format(destino, formato=None):
+    """Identifica o formato de saída pela extensão do destino.
+
+    Raises:
+        ValueError: Se o formato não for suportado
+    """
+    if destino == '-':
+        return 'csv'
+    formato = (formato or os.path.splitext(destino)[1].lstrip('.')).lower()
+    if formato not in FORMATOS_SAIDA:
+        raise ValueError(f"Formato de saída não suportado: '{formato}' (use {', '.join(FORMATOS_SAIDA)})")
+    return formato
+
+
+def write_result(result_df, destino, formato=None):
+    """Grava o resultado em CSV, Excel, Parquet ou Arrow IPC.
+
+    Args:
+        result_df (pandas.DataFrame): Resultado de analyze_files
+        destino (str): Arquivo de saída ('-' para CSV na saída padrão)
+        formato (str, optional): 'csv', 'xlsx', 'parquet' ou 'arrow' (padrão: extensão do destino)
+    """
+    if destino == '-':
+        result_df.to_csv(sys.stdout, index=False)
+        return
+
+    formato = output_format(destino, formato)
+    if formato == 'csv':
+        result_df.to_csv(destino, index=False, encoding='utf-8')
+    elif formato == 'xlsx':
+        write_xlsx(result_df, destino)
+    else:
+        # Parquet e Arrow com o esquema fixo da tabela de produção (matrícula como texto)
+        with open(destino, 'wb') as f:
+            f.write(export_bytes(result_df, formato, SCHEMA_RESULTADO))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m producao',
+        description='Análise de produtividade de manobristas sem interface gráfica.'
+    )
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    analyze = subparsers.add_parser('analyze', help='Gera a tabela de produção por manobrista')
+    analyze.add_argument('entradas', nargs='+', help='Arquivos .xlsx, pastas ou padrões (ex: exports/*.xlsx)')
+    analyze.add_argument('--out', '-o', default='-', help="Arquivo de saída .csv, .xlsx, .parquet ou .arrow (padrão: CSV na saída padrão)")
+    analyze.add_argument('--format', choices=FORMATOS_SAIDA, help='Formato de saída (padrão: extensão de --out)')
+    analyze.add_argument('--keep-terceiros', action='store_true', help='Não remover manobristas terceirizados')
+    analyze.add_argument('--only-registered', action='store_true', help='Mostrar apenas funcionários cadastrados e ativos')
+    analyze.add_argument('--storage', choices=('sqlite', 'csv'), help='Armazenamento do cadastro (padrão: MANOBRISTAS_STORAGE ou sqlite)')
+    analyze.add_argument('--db', help='Arquivo do cadastro de funcionários (padrão: manobristas.db ou '
+                                      'funcionarios.csv na pasta do aplicativo)')
+    analyze.add_argument('--cache-dir', help='Pasta do cache de planilhas já processadas')
+    analyze.add_argument('--workers', type=int, help='Número máximo de processos de leitura')
+
+    history = subparsers.add_parser('history', help='Manutenção do histórico acumulado de movimentações')
+    history.add_argument('acao', choices=('verify', 'rebuild'),
+                         help='verify: confere o resumo diário com as movimentações; rebuild: reconstrói o resumo')
+    history.add_argument('--dir', default='historico', help='Pasta do histórico (padrão: historico)')
+    return parser
+
+
+def run_history(args):
+    """Executa o subcomando history.
+
+    Returns:
+        int: Código de saída (0 em caso de sucesso)
+    """
+    from history_store import HistoryStore
+
+    if not os.path.isdir(args.dir):
+        print(f"Pasta do histórico não encontrada: {args.dir}", file=sys.stderr)
+        return 1
+    store = HistoryStore(args.dir)
+
+    if args.acao == 'rebuild':
+        linhas = store.rebuild_rollup()
+        print(f"Resumo diário reconstruído: {linhas} linhas (dia e manobrista).", file=sys.stderr)
+
+    ok, mensagem = store.verify_rollup()
+    print(mensagem, file=sys.stderr)
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando.
+
+    Returns:
+        int: Código de saída (0 em caso de sucesso)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.comando == 'history':
+        return run_history(args)
+
+    # Validar o formato de saída antes de ler os arquivos
+    try:
+        output_format(args.out, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    caminhos = expand_inputs(args.entradas)
+    if not caminhos:
+        print("Nenhum arquivo .xlsx encontrado.", file=sys.stderr)
+        return 1
+
+    employee_db = None
+    if not args.keep_terceiros or args.only_registered:
+        try:
+            employee_db = get_employee_database(args.storage, args.db)
+        except FileNotFoundError as e:
+            # O filtro de cadastrados e um arquivo informado em --db exigem o cadastro;
+            # o filtro de terceiros funciona apenas com as palavras-chave do nome
+            if args.only_registered or args.db:
+                print(f"{e}. Informe --db ou abra a interface uma vez para criá-lo.", file=sys.stderr)
+                return 1
+            print(f"{e}. Terceiros identificados apenas pelo nome.", file=sys.stderr)
+
+    result_df, resumo = analyze_files(
+        caminhos,
+        excluir_terceiros=not args.keep_terceiros,
+        apenas_cadastrados=args.only_registered,
+        employee_db=employee_db,
+        cache_dir=args.cache_dir,
+        workers=args.workers,
+    )
+
+    for caminho, erro in resumo['erros']:
+        print(f"Erro ao processar arquivo {caminho}: {erro}", file=sys.stderr)
+    if result_df.empty:
+        print("Nenhum dado de manobrista encontrado nos arquivos.", file=sys.stderr)
+        return 1
+
+    if resumo['terceiros_filtrados']:
+        print(f"Foram filtrados {resumo['terceiros_filtrados']} manobristas terceirizados.", file=sys.stderr)
+    nao_cadastrados = resumo['nao_cadastrados']
+    if nao_cadastrados is not None and not nao_cadastrados.empty:
+        print(f"Matrículas não encontradas no cadastro: {len(nao_cadastrados)}", file=sys.stderr)
+
+    try:
+        write_result(result_df, args.out, args.format)
+    except (ValueError, OSError, ImportError) as e:
+        print(f"Erro ao gravar o resultado: {e}", file=sys.stderr)
+        return 1
+
+    if args.out != '-':
+        print(f"{resumo['arquivos']} arquivo(s), {len(result_df)} manobristas -> {args.out}", file=sys.stderr)
+    return 0
@@ -0,0 +1,167 @@
+"""Núcleo da análise de produção, sem dependências de interface.
+
+Reúne as etapas usadas pela aplicação Streamlit (app.py, app_novo.py e a
+cópia embutida em app_launcher.py) e pela linha de comando: leitura das
+planilhas, classificação de status, agregação por manobrista e consulta dos
+veículos movimentados. Nenhuma função deste módulo importa streamlit, plotly
+ou matplotlib.
+
+O pandas e os módulos de leitura e agregação são importados apenas no
+primeiro uso: importar este módulo não carrega o pandas, de modo que
+comandos que não analisam planilhas iniciam rapidamente.
+"""
+import hashlib
+import importlib
+
+from producao.tracing import span
+
+# Nomes reexportados de outros módulos, carregados no primeiro acesso
+_REEXPORTADOS = {
+    'COLUNAS_ESPERADAS': 'excel_reader',
+    **{nome: 'driver_analysis' for nome in (
+        'STATUS_CLASS_COL', 'STATUS_CLASSES', 'STATUS_EM_SAIDA', 'STATUS_OUTRO', 'STATUS_PARQUEADO',
+        'DriverCounts', 'build_driver_index', 'classify_status', 'classify_status_value',
+        'driver_key', 'extract_matricula', 'result_driver_keys', 'vehicles_by_driver', 'vehicles_for',
+    )},
+}
+
+
+def __getattr__(nome):
+    modulo = _REEXPORTADOS.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(modulo), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_REEXPORTADOS))
+
+
+__all__ = [
+    'COLUNAS_ESPERADAS', 'STATUS_CLASS_COL', 'STATUS_CLASSES', 'STATUS_EM_SAIDA',
+    'STATUS_OUTRO', 'STATUS_PARQUEADO', 'DriverCounts', 'aggregate', 'aggregate_counts',
+    'analysis_frame', 'build_driver_index', 'classify_status', 'classify_status_value',
+    'count', 'driver_key', 'extract_matricula', 'result_fingerprint',
+    'ingest', 'prepare', 'result_driver_keys', 'vehicles_by_driver', 'vehicles_for',
+]
+
+
+def prepare(df):
+    """Classifica o Status e padroniza os nomes dos manobristas.
+
+    O DataFrame é alterado no próprio objeto: Status passa a Categorical, a
+    coluna STATUS_CLASS_COL é adicionada e Manobrista fica em maiúsculas.
+
+    Args:
+        df (pandas.DataFrame): Dados lidos por read_movement_sheet
+
+    Returns:
+        pandas.DataFrame: O mesmo DataFrame
+    """
+    from driver_analysis import STATUS_CLASS_COL, classify_status, upper_names
+
+    with span('classificacao', linhas=len(df)):
+        df['Status'], df[STATUS_CLASS_COL] = classify_status(df['Status'])
+        df['Manobrista'] = upper_names(df['Manobrista'])
+    return df
+
+
+def ingest(source, progress_callback=None):
+    """Lê uma planilha de movimentação e prepara os dados para a análise.
+
+    Args:
+        source (str or file): Caminho do arquivo ou objeto de arquivo (upload)
+        progress_callback (callable, optional): Função chamada com
+            (linhas_lidas, total_linhas) durante a leitura
+
+    Returns:
+        tuple: (DataFrame preparado por prepare, cabeçalho original)
+    """
+    from excel_reader import read_movement_sheet
+
+    with span('leitura'):
+        df, cabecalho = read_movement_sheet(source, progress_callback=progress_callback)
+    return prepare(df), cabecalho
+
+
+def analysis_frame(df):
+    """Seleciona as colunas usadas na agregação, sem linhas de manobrista vazio
+    (ausente ou só com espaços).
+
+    Args:
+        df (pandas.DataFrame): Dados preparados por prepare
+
+    Returns:
+        pandas.DataFrame: Colunas Status, Manobrista e STATUS_CLASS_COL
+    """
+    from driver_analysis import STATUS_CLASS_COL, blank_names
+
+    return df.loc[~blank_names(df['Manobrista']), ['Status', 'Manobrista', STATUS_CLASS_COL]]
+
+
+def aggregate(dataframes):
+    """Conta EM SAIDA, PARQUEADOS e TOTAL por manobrista em todos os arquivos.
+
+    Args:
+        dataframes (list): DataFrames preparados (ou analysis_frame de cada arquivo)
+
+    Returns:
+        pandas.DataFrame: Colunas MATRICULA, MANOBRISTA, EM SAIDA, PARQUEADOS e TOTAL,
+                          em ordem decrescente de TOTAL (vazio se não houver dados)
+    """
+    from driver_analysis import aggregate_driver_data
+
+    with span('agregacao', arquivos=len(dataframes)):
+        return aggregate_driver_data(dataframes)
+
+
+def count(df):
+    """Contagens parciais de um arquivo, para combinar com aggregate_counts.
+
+    Args:
+        df (pandas.DataFrame): Dados preparados (ou analysis_frame) de um arquivo
+
+    Returns:
+        DriverCounts: EM SAIDA, PARQUEADOS e TOTAL por manobrista
+    """
+    from driver_analysis import DriverCounts
+
+    with span('contagem', linhas=len(df)):
+        return DriverCounts.from_frame(df)
+
+
+def aggregate_counts(parciais):
+    """Combina as contagens parciais de vários arquivos na tabela de produção.
+
+    Args:
+        parciais (list): Objetos DriverCounts (ex: resultados de count)
+
+    Returns:
+        pandas.DataFrame: Mesmo formato de aggregate
+    """
+    from driver_analysis import DriverCounts
+
+    with span('agregacao', arquivos=len(parciais)):
+        return DriverCounts.combine(parciais).result()
+
+
+def result_fingerprint(result_df):
+    """Identificador do conteúdo de uma tabela de produção.
+
+    Tabelas com as mesmas colunas e os mesmos valores, na mesma ordem, têm o
+    mesmo identificador; serve de chave para caches de gráficos e exportações.
+
+    Args:
+        result_df (pandas.DataFrame): Tabela de produção (ex: resultado de aggregate)
+
+    Returns:
+        str: Hash hexadecimal do conteúdo
+    """
+    import pandas as pd
+
+    h = hashlib.sha1('\x1f'.join(map(str, result_df.columns)).encode('utf-8'))
+    if len(result_df):
+        h.update(pd.util.hash_pandas_object(result_df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
@@ -0,0 +1,267 @@
+"""Medição de tempo (e opcionalmente memória) das etapas de uma execução.
+
+Uma execução (trace_run) agrupa intervalos aninhados (span) medidos com
+relógio monotônico. Quando a medição de memória está ativa, cada intervalo
+registra também a variação e o pico de memória alocada pelo Python
+(tracemalloc). Como o tracemalloc é global ao processo, esses valores só são
+registrados quando nenhuma outra execução mediu memória durante o intervalo
+(ex: duas sessões do Streamlit processando ao mesmo tempo); nos demais casos
+ficam como None. A execução ativa fica em uma ContextVar, de modo que funções
+de outros módulos (ex: producao.core) podem abrir intervalos sem receber o
+rastreamento como parâmetro; sem execução ativa, span() não faz nada.
+
+Uso:
+    with trace_run('Processar Arquivos', log=TraceLog()) as trace:
+        with span('leitura', arquivos=2):
+            ...
+    trace.records()
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+_trace_atual = contextvars.ContextVar('producao_trace_atual', default=None)
+
+# tracemalloc é global ao processo: contagem de execuções que estão medindo memória
+_memoria_lock = threading.Lock()
+_memoria_usuarios = 0
+_memoria_iniciada_aqui = False
+# Número de execuções que já começaram a medir memória (muda quando outra execução começa)
+_memoria_inicios = 0
+
+
+def _iniciar_memoria():
+    global _memoria_usuarios, _memoria_iniciada_aqui, _memoria_inicios
+    with _memoria_lock:
+        if _memoria_usuarios == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memoria_iniciada_aqui = True
+        _memoria_usuarios += 1
+        _memoria_inicios += 1
+
+
+def _parar_memoria():
+    global _memoria_usuarios, _memoria_iniciada_aqui
+    with _memoria_lock:
+        _memoria_usuarios -= 1
+        if _memoria_usuarios == 0 and _memoria_iniciada_aqui:
+            tracemalloc.stop()
+            _memoria_iniciada_aqui = False
+
+
+def _abrir_medicao_memoria():
+    """Memória atual no início de um intervalo, zerando o pico do processo.
+
+    Returns:
+        tuple: (memória atual, número de inícios) ou None se outra execução
+        também estiver medindo memória
+    """
+    with _memoria_lock:
+        if _memoria_usuarios != 1:
+            return None
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return atual, _memoria_inicios
+
+
+def _ler_memoria(inicios):
+    """Memória atual e pico desde a abertura do intervalo.
+
+    Args:
+        inicios (int): Número de inícios registrado na abertura do intervalo
+
+    Returns:
+        tuple: (memória atual, pico) ou None se outra execução começou a medir
+        memória depois da abertura (o pico deixa de ser só deste intervalo)
+    """
+    with _memoria_lock:
+        if _memoria_usuarios != 1 or _memoria_inicios != inicios:
+            return None
+        return tracemalloc.get_traced_memory()
+
+
+class Trace:
+    """Intervalos medidos durante uma execução."""
+
+    def __init__(self, nome, medir_memoria=False, **atributos):
+        """Inicializa a execução.
+
+        Args:
+            nome (str): Nome da execução (ex: 'Processar Arquivos')
+            medir_memoria (bool): Registrar variação e pico de memória com tracemalloc
+            **atributos: Informações adicionais gravadas no log (ex: usuario)
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.nome = nome
+        self.atributos = atributos
+        self.medir_memoria = medir_memoria
+        self.iniciado_em = datetime.now().isoformat(timespec='seconds')
+        self.duracao_ms = None
+        self.spans = []
+        self._pilha = []
+        self._inicio = time.perf_counter()
+        if medir_memoria:
+            _iniciar_memoria()
+
+    @contextmanager
+    def span(self, nome, **atributos):
+        """Mede um intervalo; intervalos abertos dentro dele ficam como filhos."""
+        registro = {
+            'nome': nome,
+            'nivel': len(self._pilha),
+            'pai': self._pilha[-1]['nome'] if self._pilha else None,
+            'inicio_ms': round((time.perf_counter() - self._inicio) * 1000, 3),
+            'duracao_ms': None,
+            'atributos': atributos,
+        }
+        if self.medir_memoria:
+            # O pico é zerado para este intervalo; o pico até aqui fica com o pai
+            if self._pilha:
+                self._acumular_pico_pai()
+            abertura = _abrir_medicao_memoria()
+            registro['_memoria_inicial'], registro['_inicios'] = abertura or (None, None)
+            registro['_pico'] = registro['_memoria_inicial']
+
+        self.spans.append(registro)
+        self._pilha.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+            self._pilha.pop()
+            if self.medir_memoria:
+                inicial = registro.pop('_memoria_inicial')
+                inicios = registro.pop('_inicios')
+                pico_filhos = registro.pop('_pico')
+                leitura = _ler_memoria(inicios) if pico_filhos is not None else None
+                if leitura is None:
+                    # Outra execução mediu memória ao mesmo tempo: valores não confiáveis
+                    registro['memoria_kb'] = None
+                    registro['pico_kb'] = None
+                    if self._pilha:
+                        self._pilha[-1]['_pico'] = None
+                else:
+                    atual, pico = leitura
+                    pico = max(pico, pico_filhos)
+                    registro['memoria_kb'] = round((atual - inicial) / 1024, 1)
+                    registro['pico_kb'] = round((pico - inicial) / 1024, 1)
+                    if self._pilha and self._pilha[-1]['_pico'] is not None:
+                        self._pilha[-1]['_pico'] = max(self._pilha[-1]['_pico'], pico)
+
+    def _acumular_pico_pai(self):
+        """Guarda no intervalo pai o pico atingido até a abertura de um filho."""
+        pai = self._pilha[-1]
+        if pai['_pico'] is None:
+            return
+        leitura = _ler_memoria(pai['_inicios'])
+        if leitura is None:
+            pai['_pico'] = None
+        else:
+            pai['_pico'] = max(pai['_pico'], leitura[1])
+
+    def finish(self):
+        """Encerra a execução (chamado por trace_run)."""
+        if self.duracao_ms is None:
+            self.duracao_ms = round((time.perf_counter() - self._inicio) * 1000, 3)
+            if self.medir_memoria:
+                _parar_memoria()
+
+    def records(self):
+        """Intervalos da execução como dicionários, na ordem em que foram abertos.
+
+        Returns:
+            list: Um dicionário por intervalo, com os dados da execução
+        """
+        base = {
+            'execucao_id': self.id,
+            'execucao': self.nome,
+            'iniciado_em': self.iniciado_em,
+            'execucao_ms': self.duracao_ms,
+        }
+        base.update(self.atributos)
+        return [{**base, **registro} for registro in self.spans]
+
+
+@contextmanager
+def trace_run(nome, log=None, medir_memoria=False, **atributos):
+    """Ativa uma execução para as chamadas de span() feitas dentro do bloco.
+
+    Args:
+        nome (str): Nome da execução
+        log (TraceLog, optional): Log onde os intervalos são gravados ao final
+        medir_memoria (bool): Registrar memória com tracemalloc (mais lento)
+        **atributos: Informações adicionais da execução
+
+    Yields:
+        Trace: A execução ativa
+    """
+    trace = Trace(nome, medir_memoria=medir_memoria, **atributos)
+    token = _trace_atual.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace_atual.reset(token)
+        trace.finish()
+        if log is not None and trace.spans:
+            log.write(trace)
+
+
+@contextmanager
+def span(nome, **atributos):
+    """Mede um intervalo na execução ativa (não faz nada se não houver)."""
+    trace = _trace_atual.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(nome, **atributos) as registro:
+        yield registro
+
+
+def current_trace():
+    """Execução ativa no contexto atual (ou None)."""
+    return _trace_atual.get()
+
+
+class TraceLog:
+    """Log em JSON lines (um intervalo por linha) com rotação por tamanho."""
+
+    def __init__(self, log_file='logs/desempenho.jsonl', max_bytes=5 * 1024 * 1024, backup_count=5):
+        """Inicializa o log.
+
+        Args:
+            log_file (str): Caminho do arquivo de log
+            max_bytes (int): Tamanho a partir do qual o arquivo é rotacionado
+            backup_count (int): Número de arquivos antigos mantidos
+        """
+        self.log_file = log_file
+        pasta = os.path.dirname(log_file)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        # Logger exclusivo para este arquivo, sem repassar mensagens ao logger raiz
+        self._logger = logging.getLogger(f'producao.desempenho.{os.path.abspath(log_file)}')
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger.addHandler(handler)
+
+    def write(self, trace):
+        """Grava os intervalos de uma execução, um por linha."""
+        try:
+            for registro in trace.records():
+                self._logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"Erro ao gravar log de desempenho: {e}")
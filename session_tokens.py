@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+# Validade padrão de um token de sessão (um turno de trabalho), em segundos
+TTL_PADRAO = 12 * 60 * 60
+
+
+def _b64encode(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+class SessionTokens:
+    """Tokens de sessão assinados (HMAC-SHA256) e com prazo de validade.
+
+    O token identifica o usuário e a sessão do servidor onde estão os
+    arquivos processados, de modo que uma atualização da página ou uma
+    reconexão possam restaurar o login e os dados sem um novo envio. O token
+    não contém senha nem dados do usuário além do nome de usuário.
+
+    A chave de assinatura vem da variável de ambiente MANOBRISTAS_SESSION_SECRET
+    ou de um arquivo gerado na primeira execução, para que os tokens continuem
+    válidos após reiniciar o servidor.
+    """
+
+    def __init__(self, secret_file='.session_secret', ttl=TTL_PADRAO):
+        """Inicializa os tokens.
+
+        Args:
+            secret_file (str): Arquivo com a chave de assinatura (criado se não existir)
+            ttl (int): Validade de cada token, em segundos
+        """
+        self.ttl = ttl
+        self._chave = self._load_secret(secret_file)
+
+    @staticmethod
+    def _load_secret(secret_file):
+        chave = os.environ.get('MANOBRISTAS_SESSION_SECRET')
+        if chave:
+            return chave.encode('utf-8')
+        try:
+            with open(secret_file, 'rb') as f:
+                chave = f.read().strip()
+            if chave:
+                return chave
+        except FileNotFoundError:
+            pass
+
+        chave = secrets.token_hex(32).encode('ascii')
+        try:
+            # Criado apenas se ainda não existir, legível somente pelo dono
+            fd = os.open(secret_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(chave)
+        except FileExistsError:
+            # Outro processo criou o arquivo ao mesmo tempo: usar a chave dele
+            with open(secret_file, 'rb') as f:
+                return f.read().strip()
+        except OSError as e:
+            print(f"Erro ao gravar a chave de sessão (tokens valerão até reiniciar): {e}")
+        return chave
+
+    def _assinatura(self, conteudo):
+        return hmac.new(self._chave, conteudo.encode('ascii'), hashlib.sha256).digest()
+
+    def issue(self, username, session_id):
+        """Gera um token para o usuário e a sessão.
+
+        Args:
+            username (str): Nome de usuário autenticado
+            session_id (str): Identificador da sessão no servidor
+
+        Returns:
+            str: Token no formato 'conteudo.assinatura' (base64 para URL)
+        """
+        dados = {'usuario': username, 'sessao': session_id, 'expira_em': int(time.time()) + self.ttl}
+        conteudo = _b64encode(json.dumps(dados, separators=(',', ':')).encode('utf-8'))
+        return f"{conteudo}.{_b64encode(self._assinatura(conteudo))}"
+
+    def verify(self, token, is_revoked=None):
+        """Confere a assinatura e a validade de um token.
+
+        Args:
+            token (str): Token gerado por issue
+            is_revoked (callable, optional): Recebe o identificador da sessão e
+                indica se ela foi encerrada (ex: SessionIndex.is_revoked)
+
+        Returns:
+            dict or None: Dados do token (usuario, sessao, expira_em) ou None se
+                          o token for inválido, adulterado, estiver vencido ou
+                          for de uma sessão encerrada
+        """
+        try:
+            conteudo, assinatura = str(token).split('.')
+            if not hmac.compare_digest(_b64decode(assinatura), self._assinatura(conteudo)):
+                return None
+            dados = json.loads(_b64decode(conteudo))
+        except (ValueError, TypeError, UnicodeError):
+            return None
+        if not isinstance(dados, dict) or dados.get('expira_em', 0) < time.time():
+            return None
+        if is_revoked is not None and is_revoked(dados.get('sessao')):
+            return None
+        return dados
@@ -0,0 +1,417 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+from employee_db import COLUNAS as COLUNAS_FUNCIONARIOS
+from employee_db import EmployeeDatabase
+from user_auth import UserAuth
+
+# Arquivo SQLite compartilhado por funcionários e usuários
+DEFAULT_DB_FILE = 'manobristas.db'
+
+COLUNAS_USUARIOS = ['username', 'password_hash', 'salt', 'nome_completo', 'nivel_acesso', 'ativo']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS funcionarios (
+    matricula TEXT PRIMARY KEY,
+    nome TEXT,
+    tipo TEXT,
+    ativo INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS usuarios (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    salt TEXT NOT NULL,
+    nome_completo TEXT,
+    nivel_acesso TEXT NOT NULL,
+    ativo INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+# Limite de parâmetros por consulta (SQLITE_MAX_VARIABLE_NUMBER em versões antigas)
+MAX_PARAMS = 900
+
+
+def _connect(db_file):
+    conn = sqlite3.connect(db_file, timeout=30)
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+def init_database(db_file=DEFAULT_DB_FILE):
+    """Cria as tabelas (se necessário) e ativa o modo WAL no arquivo SQLite.
+
+    O modo WAL permite leituras simultâneas a uma escrita e fica gravado no
+    próprio arquivo, valendo para todas as conexões seguintes.
+    """
+    conn = _connect(db_file)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(db_file, write=False):
+    """Abre uma conexão e executa o bloco em uma transação.
+
+    Args:
+        db_file (str): Caminho do arquivo SQLite
+        write (bool): Se True, reserva a escrita já no início (BEGIN IMMEDIATE),
+                      evitando que duas sessões alterem os mesmos dados ao mesmo tempo
+    """
+    conn = _connect(db_file)
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+def _to_python(valor):
+    """Converte valores do pandas (NaN, numpy) para tipos aceitos pelo SQLite."""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+
+def _to_bool(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('true', '1', 'sim')
+    return bool(valor)
+
+
+class SQLiteEmployeeDatabase(EmployeeDatabase):
+    """Banco de dados de funcionários armazenado em SQLite.
+
+    Mantém a mesma interface de EmployeeDatabase. Na primeira execução os
+    funcionários do arquivo CSV existente são importados automaticamente.
+    """
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, csv_file='funcionarios.csv'):
+        """Inicializa o banco de dados de funcionários.
+
+        Args:
+            db_file (str): Caminho do arquivo SQLite
+            csv_file (str): CSV importado caso a tabela ainda esteja vazia
+        """
+        self.db_file = db_file
+        self.csv_file = csv_file
+        init_database(db_file)
+
+        with transaction(db_file) as conn:
+            vazio = conn.execute('SELECT COUNT(*) FROM funcionarios').fetchone()[0] == 0
+        if vazio and csv_file and os.path.exists(csv_file):
+            self.import_csv(csv_file)
+
+    def _query(self, sql, params=()):
+        with transaction(self.db_file) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=COLUNAS_FUNCIONARIOS)
+        df['ativo'] = df['ativo'].astype(bool)
+        return df
+
+    def import_csv(self, csv_file):
+        """Importa funcionários de um arquivo CSV (matrículas já existentes são ignoradas).
+
+        Returns:
+            int: Quantidade de funcionários importados
+        """
+        df = pd.read_csv(csv_file, encoding='utf-8', dtype={'matricula': str})
+        registros = [
+            (_to_python(row.matricula), _to_python(row.nome), _to_python(row.tipo), int(_to_bool(row.ativo)))
+            for row in df.itertuples(index=False)
+            if _to_python(row.matricula) is not None
+        ]
+        with transaction(self.db_file, write=True) as conn:
+            antes = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO funcionarios (matricula, nome, tipo, ativo) VALUES (?, ?, ?, ?)',
+                registros
+            )
+            importados = conn.total_changes - antes
+        print(f"{importados} funcionários importados de {csv_file}")
+        return importados
+
+    def export_csv(self, csv_file=None):
+        """Exporta os funcionários para CSV, no mesmo formato do arquivo original.
+
+        Args:
+            csv_file (str, optional): Caminho do arquivo. Se None, retorna o conteúdo
+
+        Returns:
+            str or None: Conteúdo CSV quando csv_file não é informado
+        """
+        return self.get_all_employees().to_csv(csv_file, index=False, encoding='utf-8')
+
+    def get_all_employees(self):
+        """Retorna todos os funcionários do banco de dados."""
+        try:
+            return self._query('SELECT matricula, nome, tipo, ativo FROM funcionarios ORDER BY rowid')
+        except sqlite3.Error as e:
+            print(f"Erro ao ler banco de dados: {e}")
+            return pd.DataFrame(columns=COLUNAS_FUNCIONARIOS)
+
+    def get_active_employees(self):
+        """Retorna apenas os funcionários ativos."""
+        return self._query('SELECT matricula, nome, tipo, ativo FROM funcionarios WHERE ativo = 1 ORDER BY rowid')
+
+    def add_employee(self, matricula, nome, tipo='interno', ativo=True):
+        """Adiciona um novo funcionário ao banco de dados."""
+        try:
+            with transaction(self.db_file, write=True) as conn:
+                conn.execute(
+                    'INSERT INTO funcionarios (matricula, nome, tipo, ativo) VALUES (?, ?, ?, ?)',
+                    (matricula, nome, tipo, int(bool(ativo)))
+                )
+        except sqlite3.IntegrityError:
+            return False, "Matrícula já cadastrada"
+        return True, "Funcionário cadastrado com sucesso"
+
+    def update_employee(self, matricula, nome=None, tipo=None, ativo=None):
+        """Atualiza os dados de um funcionário existente."""
+        campos = {'nome': nome, 'tipo': tipo, 'ativo': None if ativo is None else int(bool(ativo))}
+        campos = {campo: valor for campo, valor in campos.items() if valor is not None}
+
+        with transaction(self.db_file, write=True) as conn:
+            if not conn.execute('SELECT 1 FROM funcionarios WHERE matricula = ?', (matricula,)).fetchone():
+                return False, "Matrícula não encontrada"
+            if campos:
+                atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+                conn.execute(
+                    f'UPDATE funcionarios SET {atribuicoes} WHERE matricula = ?',
+                    (*campos.values(), matricula)
+                )
+        return True, "Dados atualizados com sucesso"
+
+    def delete_employee(self, matricula):
+        """Remove um funcionário do banco de dados."""
+        with transaction(self.db_file, write=True) as conn:
+            removidos = conn.execute('DELETE FROM funcionarios WHERE matricula = ?', (matricula,)).rowcount
+        if not removidos:
+            return False, "Matrícula não encontrada"
+        return True, "Funcionário removido com sucesso"
+
+    def get_employee_by_matricula(self, matricula):
+        """Busca um funcionário pela matrícula."""
+        df = self._query(
+            'SELECT matricula, nome, tipo, ativo FROM funcionarios WHERE matricula = ?',
+            (matricula,)
+        )
+        if df.empty:
+            return None
+        return df.iloc[0]
+
+    def get_many(self, matriculas):
+        """Busca vários funcionários de uma vez pela matrícula.
+
+        Returns:
+            pandas.DataFrame: Funcionários encontrados, na ordem das matrículas informadas
+        """
+        matriculas = list(matriculas)
+        unicas = list(dict.fromkeys(matriculas))
+        partes = []
+        for inicio in range(0, len(unicas), MAX_PARAMS):
+            lote = unicas[inicio:inicio + MAX_PARAMS]
+            marcadores = ', '.join('?' * len(lote))
+            partes.append(self._query(
+                f'SELECT matricula, nome, tipo, ativo FROM funcionarios WHERE matricula IN ({marcadores})',
+                lote
+            ))
+        if not partes:
+            return pd.DataFrame(columns=COLUNAS_FUNCIONARIOS)
+
+        encontrados = pd.concat(partes, ignore_index=True).set_index('matricula', drop=False)
+        ordem = [m for m in matriculas if m in encontrados.index]
+        return encontrados.loc[ordem].reset_index(drop=True)
+
+
+class SQLiteUserAuth(UserAuth):
+    """Sistema de autenticação de usuários armazenado em SQLite.
+
+    Mantém a mesma interface de UserAuth. Na primeira execução os usuários do
+    arquivo CSV existente são importados automaticamente.
+    """
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, csv_file='usuarios.csv'):
+        """Inicializa o sistema de autenticação.
+
+        Args:
+            db_file (str): Caminho do arquivo SQLite
+            csv_file (str): CSV importado caso a tabela ainda esteja vazia
+        """
+        self.db_file = db_file
+        self.users_file = csv_file
+        init_database(db_file)
+        self._init_cache()
+        self._check_users_file()
+
+    def _user_files(self):
+        """Arquivos cuja alteração invalida o cache (o banco e o log WAL)."""
+        return [self.db_file, f"{self.db_file}-wal"]
+
+    def _check_users_file(self):
+        """Importa os usuários do CSV ou cria o admin padrão se a tabela estiver vazia."""
+        with transaction(self.db_file) as conn:
+            vazio = conn.execute('SELECT COUNT(*) FROM usuarios').fetchone()[0] == 0
+        if not vazio:
+            return
+        if self.users_file and os.path.exists(self.users_file) and self.import_csv(self.users_file) > 0:
+            return
+        # Criar um usuário admin padrão na primeira execução
+        self.add_user(
+            username="admin",
+            password="admin123",
+            nome_completo="Administrador",
+            nivel_acesso="admin"
+        )
+
+    def _query(self, sql, params=()):
+        with transaction(self.db_file) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=COLUNAS_USUARIOS)
+        df['ativo'] = df['ativo'].astype(bool)
+        return df
+
+    def import_csv(self, csv_file):
+        """Importa usuários de um arquivo CSV (usuários já existentes são ignorados).
+
+        Returns:
+            int: Quantidade de usuários importados
+        """
+        df = pd.read_csv(csv_file, dtype=str)
+        registros = [
+            (row.username, row.password_hash, row.salt, _to_python(row.nome_completo),
+             row.nivel_acesso, int(_to_bool(row.ativo)))
+            for row in df.itertuples(index=False)
+            if _to_python(row.username) is not None
+        ]
+        with transaction(self.db_file, write=True) as conn:
+            antes = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO usuarios '
+                '(username, password_hash, salt, nome_completo, nivel_acesso, ativo) VALUES (?, ?, ?, ?, ?, ?)',
+                registros
+            )
+            importados = conn.total_changes - antes
+        self._invalidate_cache()
+        print(f"{importados} usuários importados de {csv_file}")
+        return importados
+
+    def export_csv(self, csv_file=None):
+        """Exporta os usuários para CSV, no mesmo formato do arquivo original.
+
+        Args:
+            csv_file (str, optional): Caminho do arquivo. Se None, retorna o conteúdo
+
+        Returns:
+            str or None: Conteúdo CSV quando csv_file não é informado
+        """
+        return self.get_all_users().to_csv(csv_file, index=False)
+
+    def _read_users(self):
+        """Lê a tabela de usuários do banco (sem cache)."""
+        try:
+            return self._query(f"SELECT {', '.join(COLUNAS_USUARIOS)} FROM usuarios ORDER BY rowid")
+        except sqlite3.Error as e:
+            print(f"Erro ao ler usuários: {str(e)}")
+            return pd.DataFrame(columns=COLUNAS_USUARIOS)
+
+    def add_user(self, username, password, nome_completo, nivel_acesso="operador", ativo=True):
+        """Adiciona um novo usuário ao sistema.
+
+        Returns:
+            tuple: (sucesso, mensagem)
+        """
+        if nivel_acesso not in ["admin", "supervisor", "operador"]:
+            return False, "Nível de acesso inválido. Use 'admin', 'supervisor' ou 'operador'."
+
+        password_hash, salt = self._hash_password(password)
+        try:
+            with transaction(self.db_file, write=True) as conn:
+                conn.execute(
+                    'INSERT INTO usuarios '
+                    '(username, password_hash, salt, nome_completo, nivel_acesso, ativo) VALUES (?, ?, ?, ?, ?, ?)',
+                    (username, password_hash, salt, nome_completo, nivel_acesso, int(bool(ativo)))
+                )
+        except sqlite3.IntegrityError:
+            return False, f"Usuário '{username}' já existe no sistema."
+
+        self._invalidate_cache()
+        return True, f"Usuário '{username}' adicionado com sucesso."
+
+    def update_user(self, username, nome_completo=None, nivel_acesso=None, ativo=None, password=None):
+        """Atualiza os dados de um usuário existente.
+
+        Returns:
+            tuple: (sucesso, mensagem)
+        """
+        if nivel_acesso is not None and nivel_acesso not in ["admin", "supervisor", "operador"]:
+            return False, "Nível de acesso inválido. Use 'admin', 'supervisor' ou 'operador'."
+
+        campos = {
+            'nome_completo': nome_completo,
+            'nivel_acesso': nivel_acesso,
+            'ativo': None if ativo is None else int(bool(ativo)),
+        }
+        if password is not None:
+            # Hash calculado antes de reservar a escrita, que ficaria bloqueada
+            # durante o cálculo; o salt existente é mantido, como no CSV
+            with transaction(self.db_file) as conn:
+                row = conn.execute('SELECT salt FROM usuarios WHERE username = ?', (username,)).fetchone()
+            if row is None:
+                return False, f"Usuário '{username}' não encontrado."
+            campos['password_hash'], _ = self._hash_password(password, row[0])
+        campos = {campo: valor for campo, valor in campos.items() if valor is not None}
+
+        with transaction(self.db_file, write=True) as conn:
+            row = conn.execute('SELECT salt FROM usuarios WHERE username = ?', (username,)).fetchone()
+            if row is None:
+                return False, f"Usuário '{username}' não encontrado."
+
+            if campos:
+                atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+                conn.execute(
+                    f'UPDATE usuarios SET {atribuicoes} WHERE username = ?',
+                    (*campos.values(), username)
+                )
+
+        self._invalidate_cache()
+        return True, f"Usuário '{username}' atualizado com sucesso."
+
+    def delete_user(self, username):
+        """Remove um usuário do sistema.
+
+        Returns:
+            tuple: (sucesso, mensagem)
+        """
+        with transaction(self.db_file, write=True) as conn:
+            row = conn.execute(
+                'SELECT nivel_acesso, ativo FROM usuarios WHERE username = ?', (username,)
+            ).fetchone()
+            if row is None:
+                return False, f"Usuário '{username}' não encontrado."
+
+            # Verificar se é o último admin ativo (o admin original não entra nesta regra)
+            if username != "admin" and row[0] == "admin" and row[1]:
+                active_admins = conn.execute(
+                    "SELECT COUNT(*) FROM usuarios WHERE nivel_acesso = 'admin' AND ativo = 1"
+                ).fetchone()[0]
+                if active_admins <= 1:
+                    return False, "Não é possível remover o último administrador ativo do sistema."
+
+            conn.execute('DELETE FROM usuarios WHERE username = ?', (username,))
+
+        self._invalidate_cache()
+        return True, f"Usuário '{username}' removido com sucesso."
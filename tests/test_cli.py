@@ -0,0 +1,72 @@
+"""Linha de comando (python -m producao analyze) sem interface gráfica."""
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from driver_analysis import TERCEIROS_CONFIG
+from producao import cli
+
+PLANILHA_EXEMPLO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'attached_assets', 'MovimentacaoVeiculos (19).xlsx'
+)
+
+
+@pytest.fixture
+def checkout_novo(tmp_path, monkeypatch):
+    """Pasta do aplicativo sem cadastro de funcionários, executada de outra pasta."""
+    if not os.path.exists(PLANILHA_EXEMPLO):
+        pytest.skip('planilha de exemplo não encontrada')
+    pasta_aplicativo = tmp_path / 'aplicativo'
+    pasta_aplicativo.mkdir()
+    monkeypatch.setattr(cli, 'PASTA_APLICATIVO', str(pasta_aplicativo))
+    monkeypatch.delenv('MANOBRISTAS_STORAGE', raising=False)
+
+    trabalho = tmp_path / 'trabalho'
+    trabalho.mkdir()
+    shutil.copy(PLANILHA_EXEMPLO, trabalho / 'a.xlsx')
+    shutil.copy(PLANILHA_EXEMPLO, trabalho / 'b.xlsx')
+    monkeypatch.chdir(trabalho)
+    return trabalho
+
+
+def test_default_run_without_roster(checkout_novo, capsys):
+    assert cli.main(['analyze', 'a.xlsx', 'b.xlsx', '--out', 'r.csv']) == 0
+
+    resultado = pd.read_csv(checkout_novo / 'r.csv', dtype={'MATRICULA': str})
+    assert not resultado.empty
+    nomes = resultado['MANOBRISTA'].str.upper()
+    assert not nomes.str.contains('TECLIGHT|TECHLIGHT|TECLIGHIT').any()
+    assert 'Terceiros identificados apenas pelo nome' in capsys.readouterr().err
+    assert not os.listdir(cli.PASTA_APLICATIVO)
+
+
+def test_only_registered_requires_roster(checkout_novo, capsys):
+    assert cli.main(['analyze', 'a.xlsx', '--out', 'r.csv', '--only-registered']) == 1
+    assert 'Cadastro de funcionários não encontrado' in capsys.readouterr().err
+    assert not (checkout_novo / 'r.csv').exists()
+    assert not os.listdir(cli.PASTA_APLICATIVO)
+
+
+def test_missing_db_argument_is_an_error(checkout_novo):
+    assert cli.main(['analyze', 'a.xlsx', '--out', 'r.csv', '--db', 'nao_existe.db']) == 1
+    assert not (checkout_novo / 'nao_existe.db').exists()
+
+
+def test_analyze_files_without_roster(checkout_novo):
+    result_df, resumo = cli.analyze_files(['a.xlsx'])
+    assert resumo['terceiros_filtrados'] > 0
+    with pytest.raises(FileNotFoundError):
+        cli.analyze_files(['a.xlsx'], apenas_cadastrados=True)
+
+
+def test_terceiros_rules_read_from_app_folder(checkout_novo):
+    # Um terceiros.toml na pasta de trabalho não substitui o do aplicativo
+    (checkout_novo / 'terceiros.toml').write_text('palavras_chave = ["OUTRO_FORNECEDOR"]\n', encoding='utf-8')
+
+    assert os.path.dirname(TERCEIROS_CONFIG) == os.path.dirname(os.path.dirname(PLANILHA_EXEMPLO))
+    matcher = cli.TerceirosMatcher.from_config()
+    assert matcher.pattern.search('TECLIGHT')
+    assert not matcher.pattern.search('OUTRO_FORNECEDOR')
@@ -0,0 +1,23 @@
+"""Núcleo da análise (producao.core)."""
+import subprocess
+import sys
+
+
+def test_import_does_not_load_pandas():
+    codigo = (
+        "import sys, producao.core\n"
+        "assert 'pandas' not in sys.modules, 'pandas importado'\n"
+        "from producao.core import STATUS_EM_SAIDA, vehicles_for\n"
+        "assert 'pandas' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', codigo], check=True)
+
+
+def test_reexported_names():
+    import driver_analysis
+    from producao import core
+
+    for nome in core.__all__:
+        assert getattr(core, nome) is not None
+    assert core.vehicles_for is driver_analysis.vehicles_for
+    assert 'vehicles_for' in dir(core)
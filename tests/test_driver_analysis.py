@@ -0,0 +1,144 @@
+"""Agregação por manobrista comparada com a versão original (iterrows) do app.py."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from driver_analysis import aggregate_driver_data
+from excel_reader import read_movement_sheet
+from producao.core import aggregate_counts, analysis_frame, count, prepare
+
+PLANILHA_EXEMPLO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'attached_assets', 'MovimentacaoVeiculos (19).xlsx'
+)
+
+
+def _extract_matricula_original(manobrista_name):
+    if isinstance(manobrista_name, str) and '-' in manobrista_name:
+        parts = manobrista_name.split('-', 1)
+        return parts[0].strip()
+    return ""
+
+
+def _aggregate_original(dataframes):
+    """aggregate_driver_data como era no app.py original (loop com iterrows)."""
+    combined_data = {}
+
+    for df in dataframes:
+        if df is None:
+            continue
+
+        status_col = 'Status' if 'Status' in df.columns else df.columns[0]
+        manobrista_col = 'Manobrista' if 'Manobrista' in df.columns else df.columns[1]
+
+        for _, row in df.iterrows():
+            manobrista = row[manobrista_col]
+            status = row[status_col]
+
+            if manobrista not in combined_data:
+                matricula = _extract_matricula_original(manobrista)
+                combined_data[manobrista] = {
+                    'MATRICULA': matricula,
+                    'MANOBRISTA': manobrista.split('-')[-1].strip() if '-' in manobrista else manobrista,
+                    'EM SAIDA': 0,
+                    'PARQUEADOS': 0,
+                    'TOTAL': 0
+                }
+
+            status_upper = status.upper()
+            is_saida = False
+            for keyword in ['SAIDA', 'SAÍDA', 'EXPEDICAO', 'EXPEDIÇÃO', 'EXPEDIC', 'EXPEDIÇ']:
+                if keyword in status_upper:
+                    is_saida = True
+                    break
+
+            if is_saida:
+                combined_data[manobrista]['EM SAIDA'] += 1
+            elif 'PARQUEADO' in status_upper:
+                combined_data[manobrista]['PARQUEADOS'] += 1
+
+            combined_data[manobrista]['TOTAL'] += 1
+
+    result_df = pd.DataFrame(combined_data.values())
+    if not result_df.empty:
+        result_df = result_df.sort_values('TOTAL', ascending=False)
+    return result_df
+
+
+def _original_frame(df):
+    """Limpeza feita pelo app.py original antes da agregação."""
+    df_analise = df[['Status', 'Manobrista']].dropna(subset=['Manobrista'])
+    df_analise['Manobrista'] = df_analise['Manobrista'].str.upper()
+    return df_analise
+
+
+def _excel_blanks(df):
+    """Células vazias como pandas.read_excel as lê: valores ausentes."""
+    return df.replace(r'^\s*$', np.nan, regex=True)
+
+
+def _assert_same_result(atual, esperado):
+    # Tipos de texto podem diferir entre as versões (object / str); os valores não
+    assert_frame_equal(atual.astype({'MATRICULA': object, 'MANOBRISTA': object}),
+                       esperado.astype({'MATRICULA': object, 'MANOBRISTA': object}),
+                       check_dtype=False)
+    assert atual[['EM SAIDA', 'PARQUEADOS', 'TOTAL']].dtypes.eq('int64').all()
+
+
+@pytest.fixture(scope='module')
+def planilha_exemplo():
+    if not os.path.exists(PLANILHA_EXEMPLO):
+        pytest.skip('planilha de exemplo não encontrada')
+    return pd.read_excel(PLANILHA_EXEMPLO, engine='openpyxl')
+
+
+@pytest.fixture
+def movimentacoes_sinteticas():
+    return pd.DataFrame({
+        'Status': ['Em Saída (expedição)', 'PARQUEADO', 'Em trânsito', 'Expedição', 'parqueado',
+                   'Parqueado', 'EM SAIDA', 'Outro', 'Parqueado', 'Em Saída'],
+        'Manobrista': ['123 - Ana Souza', 'ANA SOUZA', None, '123 - ANA SOUZA', '',
+                       '456 - Bruno-Lima', '   ', 'ana souza', np.nan, '456 - bruno-lima'],
+    })
+
+
+def test_sample_workbook_matches_original(planilha_exemplo):
+    esperado = _aggregate_original([_original_frame(planilha_exemplo)])
+
+    _assert_same_result(aggregate_driver_data([_original_frame(planilha_exemplo)]), esperado)
+
+    preparado = prepare(planilha_exemplo.copy())
+    _assert_same_result(aggregate_driver_data([analysis_frame(preparado)]), esperado)
+
+
+def test_streaming_reader_matches_read_excel(planilha_exemplo):
+    esperado = _aggregate_original([_original_frame(planilha_exemplo)])
+
+    df, _ = read_movement_sheet(PLANILHA_EXEMPLO)
+    resultado = aggregate_counts([count(analysis_frame(prepare(df)))])
+
+    _assert_same_result(resultado, esperado)
+    assert (resultado['MANOBRISTA'].str.strip() != '').all()
+
+
+def test_synthetic_blank_nan_and_duplicate_names(movimentacoes_sinteticas):
+    esperado = _aggregate_original([_original_frame(_excel_blanks(movimentacoes_sinteticas))])
+
+    preparado = prepare(movimentacoes_sinteticas.copy())
+    _assert_same_result(aggregate_driver_data([analysis_frame(preparado)]), esperado)
+
+
+def test_several_frames_match_original(movimentacoes_sinteticas, planilha_exemplo):
+    frames = [_excel_blanks(movimentacoes_sinteticas), planilha_exemplo, _excel_blanks(movimentacoes_sinteticas)]
+    esperado = _aggregate_original([_original_frame(df) for df in frames])
+
+    resultado = aggregate_driver_data([analysis_frame(prepare(df.copy())) for df in frames])
+    _assert_same_result(resultado, esperado)
+
+
+def test_empty_input():
+    assert aggregate_driver_data([]).empty
+    assert _aggregate_original([]).empty
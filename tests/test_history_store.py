@@ -0,0 +1,130 @@
+"""Resumo diário do histórico comparado com aggregate_driver_data sobre as movimentações."""
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from driver_analysis import aggregate_driver_data
+from excel_reader import COLUNA_DATA_HORA, read_movement_sheet
+from history_store import HistoryStore, parse_movement_times
+from producao.core import analysis_frame, prepare
+
+PLANILHA_EXEMPLO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'attached_assets', 'MovimentacaoVeiculos (19).xlsx'
+)
+
+DIA_1 = date(2025, 4, 24)
+DIA_2 = date(2025, 4, 25)
+DIA_3 = date(2025, 4, 26)
+
+
+def _movimentacoes(linhas):
+    return pd.DataFrame(linhas, columns=['Chassi', 'Status', 'Manobrista', COLUNA_DATA_HORA])
+
+
+def _esperado(df):
+    """Agregação direta das movimentações, sem passar pelo histórico."""
+    return aggregate_driver_data([analysis_frame(prepare(df.copy()))])
+
+
+def _assert_same_drivers(obtido, esperado):
+    # A ordem entre manobristas com o mesmo TOTAL não é significativa
+    chaves = ['MATRICULA', 'MANOBRISTA']
+    assert_frame_equal(
+        obtido.sort_values(chaves).reset_index(drop=True).astype({c: object for c in chaves}),
+        esperado.sort_values(chaves).reset_index(drop=True).astype({c: object for c in chaves}),
+        check_dtype=False,
+    )
+
+
+def _do_dia(df, dia):
+    return df[(parse_movement_times(df[COLUNA_DATA_HORA]).dt.date == dia).to_numpy()]
+
+
+@pytest.fixture
+def arquivos_sobrepostos():
+    """Duas exportações que repetem as movimentações do dia 25."""
+    comum = [
+        ('C2', 'Em Saída', '10 - Ana', '25/04/2025 - 08:00'),
+        ('C2', 'Em Saída', '10 - Ana', '25/04/2025 - 08:00'),  # repetição legítima
+        ('C3', 'Parqueado', '20 - Bruno', '25/04/2025 - 09:30'),
+        ('C4', 'Expedição', '', '25/04/2025 - 10:00'),
+    ]
+    primeiro = _movimentacoes([
+        ('C1', 'Parqueado', '10 - Ana', '24/04/2025 - 22:15'),
+        ('C5', 'Em trânsito', '20 - Bruno', '24/04/2025 - 23:00'),
+    ] + comum)
+    segundo = _movimentacoes(comum + [
+        ('C6', 'Parqueado', '10 - ana', '25/04/2025 - 11:00'),
+        ('C7', 'Em Saída', '30 - Carla', '26/04/2025 - 07:45'),
+    ])
+    unicas = _movimentacoes([
+        ('C1', 'Parqueado', '10 - Ana', '24/04/2025 - 22:15'),
+        ('C5', 'Em trânsito', '20 - Bruno', '24/04/2025 - 23:00'),
+    ] + comum + [
+        ('C6', 'Parqueado', '10 - ana', '25/04/2025 - 11:00'),
+        ('C7', 'Em Saída', '30 - Carla', '26/04/2025 - 07:45'),
+    ])
+    return primeiro, segundo, unicas
+
+
+def test_overlapping_files_match_aggregation(tmp_path, arquivos_sobrepostos):
+    primeiro, segundo, unicas = arquivos_sobrepostos
+    historico = HistoryStore(str(tmp_path))
+
+    historico.add(primeiro, file_key='primeiro')
+    resumo = historico.add(segundo, file_key='segundo')
+    assert resumo['duplicadas'] == 4
+    assert resumo['novas'] == 2
+
+    _assert_same_drivers(historico.aggregate(), _esperado(unicas))
+    _assert_same_drivers(historico.aggregate(DIA_2, DIA_2), _esperado(_do_dia(unicas, DIA_2)))
+    _assert_same_drivers(historico.aggregate(DIA_3, DIA_3), _esperado(_do_dia(unicas, DIA_3)))
+    assert historico.verify_rollup()[0]
+
+
+def test_readding_file_does_not_double_count(tmp_path, arquivos_sobrepostos):
+    primeiro, segundo, unicas = arquivos_sobrepostos
+    historico = HistoryStore(str(tmp_path))
+    historico.add(primeiro, file_key='primeiro')
+    historico.add(segundo, file_key='segundo')
+    antes = historico.aggregate()
+
+    # Mesmo arquivo: reconhecido pela chave
+    assert historico.add(primeiro, file_key='primeiro')['ja_incorporado']
+    # Mesmo conteúdo com outra chave (ex: exportação baixada de novo)
+    resumo = historico.add(segundo, file_key='segundo-copia')
+    assert resumo['novas'] == 0
+    assert resumo['duplicadas'] == len(segundo)
+
+    assert_frame_equal(historico.aggregate(), antes)
+    _assert_same_drivers(historico.aggregate(), _esperado(unicas))
+
+
+def test_rebuilt_rollup_matches(tmp_path, arquivos_sobrepostos):
+    primeiro, segundo, unicas = arquivos_sobrepostos
+    historico = HistoryStore(str(tmp_path))
+    historico.add(primeiro)
+    historico.add(segundo)
+
+    os.remove(historico.rollup.path)
+    _assert_same_drivers(historico.aggregate(), _esperado(unicas))
+
+
+def test_sample_workbook_with_reexported_day(tmp_path):
+    if not os.path.exists(PLANILHA_EXEMPLO):
+        pytest.skip('planilha de exemplo não encontrada')
+    df, _ = read_movement_sheet(PLANILHA_EXEMPLO)
+    dia_2 = _do_dia(df, DIA_2).reset_index(drop=True)
+
+    historico = HistoryStore(str(tmp_path))
+    historico.add(df, file_key='completo')
+    resumo = historico.add(dia_2, file_key='dia-25')
+    assert resumo['novas'] == 0
+
+    _assert_same_drivers(historico.aggregate(), _esperado(df))
+    _assert_same_drivers(historico.aggregate(DIA_2, DIA_2), _esperado(dia_2))
+    _assert_same_drivers(historico.aggregate(DIA_1, DIA_1), _esperado(_do_dia(df, DIA_1)))
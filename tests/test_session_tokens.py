@@ -0,0 +1,90 @@
+"""Tokens de sessão assinados (SessionTokens) e índice de sessões (SessionIndex)."""
+import time
+
+import pytest
+
+from dataset_registry import SessionIndex
+from session_tokens import SessionTokens, _b64decode, _b64encode
+
+
+@pytest.fixture
+def tokens(tmp_path, monkeypatch):
+    monkeypatch.delenv('MANOBRISTAS_SESSION_SECRET', raising=False)
+    return SessionTokens(secret_file=str(tmp_path / '.session_secret'), ttl=60)
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return SessionIndex(str(tmp_path / 'sessoes.json'))
+
+
+def test_issued_token_verifies(tokens):
+    dados = tokens.verify(tokens.issue('maria', 'sessao-1'))
+    assert dados['usuario'] == 'maria'
+    assert dados['sessao'] == 'sessao-1'
+    assert dados['expira_em'] > time.time()
+
+
+def test_secret_file_is_reused(tmp_path, tokens):
+    token = tokens.issue('maria', 'sessao-1')
+    outro = SessionTokens(secret_file=str(tmp_path / '.session_secret'))
+    assert outro.verify(token) is not None
+
+
+def test_tampered_token_is_rejected(tokens):
+    token = tokens.issue('maria', 'sessao-1')
+    conteudo, assinatura = token.split('.')
+
+    # Outro usuário com a assinatura original
+    alterado = _b64decode(conteudo).replace(b'maria', b'admin')
+    assert tokens.verify(f"{_b64encode(alterado)}.{assinatura}") is None
+
+    # Assinatura alterada ou ausente, token malformado
+    assert tokens.verify(f"{conteudo}.{assinatura[:-2]}AA") is None
+    assert tokens.verify(conteudo) is None
+    assert tokens.verify('') is None
+    assert tokens.verify(None) is None
+
+
+def test_token_signed_with_another_secret_is_rejected(tmp_path, tokens):
+    outro = SessionTokens(secret_file=str(tmp_path / 'outra_chave'))
+    assert tokens.verify(outro.issue('maria', 'sessao-1')) is None
+
+
+def test_expired_token_is_rejected(tokens, monkeypatch):
+    token = tokens.issue('maria', 'sessao-1')
+    agora = time.time()
+    monkeypatch.setattr('session_tokens.time.time', lambda: agora + 61)
+    assert tokens.verify(token) is None
+
+
+def test_revoked_session_is_rejected(tokens, indice):
+    indice.start('sessao-1', 'maria', time.time() + 60)
+    token = tokens.issue('maria', 'sessao-1')
+    assert tokens.verify(token, indice.is_revoked) is not None
+
+    indice.revoke('sessao-1', time.time() + 60)
+    assert tokens.verify(token, indice.is_revoked) is None
+    assert indice.get('sessao-1') is None
+    # A revogação é gravada em disco (vale após reiniciar o servidor)
+    assert SessionIndex(indice.index_file).is_revoked('sessao-1')
+
+
+def test_index_keeps_files_period_and_filters(indice):
+    indice.start('sessao-1', 'maria', time.time() + 60)
+    filtros = {'excluir_terceiros': False, 'apenas_cadastrados': True}
+    indice.update('sessao-1', [('chave', 'arquivo.xlsx')], ('2025-04-24', '2025-04-25'), filtros)
+
+    entrada = SessionIndex(indice.index_file).get('sessao-1')
+    assert entrada['arquivos'] == [['chave', 'arquivo.xlsx']]
+    assert entrada['historico'] == ['2025-04-24', '2025-04-25']
+    assert entrada['filtros'] == filtros
+
+
+def test_expired_sessions_are_dropped(indice):
+    indice.start('vencida', 'maria', time.time() - 1)
+    indice.revoke('revogada', time.time() - 1)
+    indice.start('ativa', 'maria', time.time() + 60)
+
+    assert indice.get('vencida') is None
+    assert list(SessionIndex(indice.index_file)._sessoes) == ['ativa']
@@ -0,0 +1,44 @@
+"""Medição de memória das execuções (trace_run) com tracemalloc compartilhado pelo processo."""
+import threading
+
+from producao.tracing import span, trace_run
+
+
+def _executar(nome, resultados, dentro=None):
+    with trace_run(nome, medir_memoria=True) as trace:
+        with span('leitura'):
+            dados = [0] * 100000
+            with span('contagem'):
+                if dentro is not None:
+                    dentro()
+        del dados
+    resultados[nome] = trace.records()
+
+
+def test_single_run_records_memory():
+    resultados = {}
+    _executar('sozinha', resultados)
+    leitura, contagem = resultados['sozinha']
+    assert leitura['pico_kb'] >= leitura['memoria_kb'] > 0
+    assert contagem['pico_kb'] is not None
+
+
+def test_concurrent_runs_do_not_record_memory():
+    resultados = {}
+    ambas_abertas = threading.Barrier(2)
+    threads = [
+        threading.Thread(target=_executar, args=(nome, resultados, ambas_abertas.wait))
+        for nome in ('primeira', 'segunda')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for nome in ('primeira', 'segunda'):
+        assert [r['pico_kb'] for r in resultados[nome]] == [None, None]
+        assert [r['memoria_kb'] for r in resultados[nome]] == [None, None]
+
+    # Depois das execuções simultâneas a medição volta a valer
+    _executar('depois', resultados)
+    assert all(r['pico_kb'] is not None for r in resultados['depois'])
@@ -0,0 +1,72 @@
+"""Limite de tentativas de login (LoginRateLimiter) e sua integração com UserAuth."""
+import threading
+import time
+
+import pytest
+
+import user_auth
+from user_auth import LoginRateLimiter, UserAuth
+
+
+@pytest.fixture
+def auth(tmp_path, monkeypatch):
+    # Hashes rápidos: o que está em teste é o limite, não o custo do PBKDF2
+    monkeypatch.setattr(user_auth, 'PBKDF2_ITERACOES', 1000)
+    auth = UserAuth(str(tmp_path / 'usuarios.csv'))
+    sucesso, mensagem = auth.add_user('maria', 'senha-correta', 'Maria')
+    assert sucesso, mensagem
+    auth.limiter = LoginRateLimiter(max_tentativas=3, janela=60)
+    return auth
+
+
+def test_parallel_burst_cannot_exceed_limit(auth, monkeypatch):
+    conferidas = []
+    verify_original = user_auth.verify_password
+
+    def verify_lento(*args):
+        conferidas.append(1)
+        time.sleep(0.05)
+        return verify_original(*args)
+
+    monkeypatch.setattr(user_auth, 'verify_password', verify_lento)
+
+    threads = [
+        threading.Thread(target=auth.authenticate, args=('maria', 'errada'), kwargs={'ip': '10.0.0.1'})
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(conferidas) == 3
+    assert auth.limiter.retry_after('maria') > 0
+    assert auth.authenticate('maria', 'senha-correta')[0] is False
+
+
+def test_successful_login_releases_its_attempt(auth):
+    for _ in range(2):
+        assert auth.authenticate('maria', 'errada', ip='10.0.0.1')[0] is False
+
+    assert auth.authenticate('maria', 'senha-correta', ip='10.0.0.1')[0] is True
+    assert ('usuario', 'maria') not in auth.limiter._falhas
+    # Os erros anteriores do IP continuam contando; o login correto não
+    assert len(auth.limiter._falhas[('ip', '10.0.0.1')]) == 2
+
+
+def test_blocked_ip_is_refused_for_other_users(auth):
+    for nome in ('a', 'b', 'c'):
+        auth.authenticate(nome, 'errada', ip='10.0.0.2')
+    assert auth.limiter.reserve('maria', '10.0.0.2') is None
+    assert auth.limiter.reserve('maria', '10.0.0.3') is not None
+
+
+def test_expired_entries_are_removed():
+    limiter = LoginRateLimiter(max_tentativas=3, janela=0.05)
+    for numero in range(50):
+        limiter.reserve(f'usuario{numero}', f'10.0.0.{numero}')
+    assert len(limiter._falhas) == 100
+
+    time.sleep(0.1)
+    limiter.reserve('outro')
+    assert list(limiter._falhas) == [('usuario', 'outro')]
@@ -1,8 +1,249 @@
 import pandas as pd
 import os
+import functools
 import hashlib
+import hmac
 import secrets
 import string
+import threading
+import time
+from collections import deque
+
+# Algoritmo usado nas novas senhas e parâmetros de cada algoritmo. Os
+# parâmetros são gravados junto com o hash ('algoritmo$parametros$hash'), de
+# modo que podem ser aumentados sem invalidar as senhas já cadastradas: hashes
+# com parâmetros antigos (ou SHA-256 simples) são refeitos no próximo login
+KDF_PADRAO = 'pbkdf2_sha256'
+PBKDF2_ITERACOES = 600000
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Número máximo de hashes calculados ao mesmo tempo. O cálculo é feito na
+# própria thread da página, que aguarda o resultado; o hashlib libera o GIL
+# durante o PBKDF2/scrypt, de modo que as demais sessões continuam sendo
+# atendidas. O limite apenas evita que muitos logins simultâneos (ex: troca de
+# turno) ocupem todos os núcleos do servidor
+KDF_SIMULTANEOS = max(2, min(4, os.cpu_count() or 1))
+_kdf_slots = threading.BoundedSemaphore(KDF_SIMULTANEOS)
+
+
+def _derive(password, salt, algoritmo, parametros):
+    """Calcula o hash da senha, respeitando o limite de cálculos simultâneos."""
+    with _kdf_slots:
+        return _derive_hash(password, salt, algoritmo, parametros)
+
+
+def _derive_hash(password, salt, algoritmo, parametros):
+    if algoritmo == 'pbkdf2_sha256':
+        (iteracoes,) = parametros
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iteracoes).hex()
+    if algoritmo == 'scrypt':
+        n, r, p = parametros
+        return hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            maxmem=2 * 128 * r * n, dklen=32
+        ).hex()
+    raise ValueError(f"Algoritmo de hash desconhecido: '{algoritmo}'")
+
+
+def _parametros(algoritmo):
+    """Parâmetros atuais do algoritmo de hash."""
+    if algoritmo == 'pbkdf2_sha256':
+        return (PBKDF2_ITERACOES,)
+    if algoritmo == 'scrypt':
+        return (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    raise ValueError(f"Algoritmo de hash desconhecido: '{algoritmo}'")
+
+
+def hash_password(password, salt, algoritmo=KDF_PADRAO):
+    """Gera o hash da senha com os parâmetros atuais do algoritmo.
+
+    Args:
+        password (str): Senha do usuário
+        salt (str): Salt do usuário
+        algoritmo (str): 'pbkdf2_sha256' ou 'scrypt'
+
+    Returns:
+        str: Hash no formato 'algoritmo$parametros$hash'
+    """
+    parametros = _parametros(algoritmo)
+    digest = _derive(password, salt, algoritmo, parametros)
+    return '$'.join([algoritmo, *map(str, parametros), digest])
+
+
+def verify_password(password, salt, password_hash):
+    """Confere a senha com o hash gravado (novo formato ou SHA-256 antigo).
+
+    Args:
+        password (str): Senha informada
+        salt (str): Salt do usuário
+        password_hash (str): Hash gravado
+
+    Returns:
+        bool: True se a senha estiver correta
+    """
+    partes = str(password_hash).split('$')
+    if len(partes) == 1:
+        # Formato antigo: SHA-256 de senha + salt
+        calculado = hashlib.sha256((password + salt).encode()).hexdigest()
+    else:
+        try:
+            parametros = tuple(int(valor) for valor in partes[1:-1])
+            calculado = _derive(password, salt, partes[0], parametros)
+        except (ValueError, TypeError) as e:
+            print(f"Hash de senha inválido: {str(e)}")
+            return False
+    return hmac.compare_digest(calculado, partes[-1])
+
+
+def needs_rehash(password_hash, algoritmo=KDF_PADRAO):
+    """Indica se o hash foi gerado com outro algoritmo ou outros parâmetros.
+
+    Args:
+        password_hash (str): Hash gravado
+        algoritmo (str): Algoritmo esperado
+
+    Returns:
+        bool: True se o hash deve ser refeito (ex: SHA-256 antigo)
+    """
+    partes = str(password_hash).split('$')
+    return partes[0] != algoritmo or tuple(partes[1:-1]) != tuple(map(str, _parametros(algoritmo)))
+
+
+class LoginRateLimiter:
+    """Limite de tentativas de login erradas por usuário e por endereço IP.
+
+    Cada tentativa é reservada (contada como erro) antes de a senha ser
+    conferida e só é descontada se a senha estiver correta, de modo que
+    tentativas simultâneas não passam do limite enquanto os hashes são
+    calculados. Depois de max_tentativas erros dentro da janela, novas
+    tentativas do mesmo usuário (ou do mesmo IP) são recusadas até que o erro
+    mais antigo saia da janela. Os contadores ficam em memória e são
+    compartilhados entre sessões.
+    """
+
+    def __init__(self, max_tentativas=5, janela=300):
+        """Inicializa o limitador.
+
+        Args:
+            max_tentativas (int): Erros permitidos por usuário ou IP dentro da janela
+            janela (float): Tamanho da janela, em segundos
+        """
+        self.max_tentativas = max_tentativas
+        self.janela = janela
+        self._falhas = {}
+        self._lock = threading.Lock()
+        self._ultima_limpeza = time.monotonic()
+
+    def _chaves(self, username, ip):
+        chaves = [('usuario', str(username).strip().lower())]
+        if ip:
+            chaves.append(('ip', ip))
+        return chaves
+
+    def _recentes(self, chave, agora):
+        falhas = self._falhas.get(chave)
+        if falhas is None:
+            return None
+        while falhas and falhas[0] <= agora - self.janela:
+            falhas.popleft()
+        if not falhas:
+            del self._falhas[chave]
+            return None
+        return falhas
+
+    def _limpar(self, agora):
+        """Remove os usuários e IPs sem erros dentro da janela (uma vez por janela)."""
+        if agora - self._ultima_limpeza < self.janela:
+            return
+        self._ultima_limpeza = agora
+        for chave in list(self._falhas):
+            self._recentes(chave, agora)
+
+    def _espera(self, chaves, agora):
+        espera = 0.0
+        for chave in chaves:
+            falhas = self._recentes(chave, agora)
+            if falhas is not None and len(falhas) >= self.max_tentativas:
+                espera = max(espera, falhas[0] + self.janela - agora)
+        return espera
+
+    def retry_after(self, username, ip=None):
+        """Segundos até a próxima tentativa ser aceita (0 se não houver bloqueio)."""
+        with self._lock:
+            return self._espera(self._chaves(username, ip), time.monotonic())
+
+    def reserve(self, username, ip=None):
+        """Reserva uma tentativa de login do usuário e do IP.
+
+        A verificação do limite e o registro da tentativa são feitos juntos,
+        sob o mesmo lock. A tentativa conta como erro até ser liberada por
+        release.
+
+        Args:
+            username (str): Nome de usuário informado
+            ip (str, optional): Endereço IP de origem
+
+        Returns:
+            float or None: Identificador da reserva (usado em release) ou None
+                           se o usuário ou o IP estiver bloqueado
+        """
+        agora = time.monotonic()
+        chaves = self._chaves(username, ip)
+        with self._lock:
+            self._limpar(agora)
+            if self._espera(chaves, agora) > 0:
+                return None
+            for chave in chaves:
+                falhas = self._falhas.setdefault(chave, deque())
+                falhas.append(agora)
+                # Apenas os erros que podem manter o bloqueio precisam ser guardados
+                while len(falhas) > self.max_tentativas:
+                    falhas.popleft()
+        return agora
+
+    def release(self, username, ip=None, reserva=None):
+        """Desconta uma tentativa reservada após um login bem-sucedido.
+
+        Os demais erros do usuário também são removidos. Os erros anteriores
+        do IP são mantidos, para não permitir que um login válido libere
+        tentativas em outros usuários.
+
+        Args:
+            username (str): Nome de usuário informado
+            ip (str, optional): Endereço IP de origem
+            reserva (float, optional): Valor retornado por reserve
+        """
+        with self._lock:
+            self._falhas.pop(('usuario', str(username).strip().lower()), None)
+            falhas = self._falhas.get(('ip', ip)) if ip else None
+            if falhas is not None and reserva is not None:
+                try:
+                    falhas.remove(reserva)
+                except ValueError:
+                    pass
+                if not falhas:
+                    del self._falhas[('ip', ip)]
+
+
+@functools.lru_cache(maxsize=1)
+def _hash_ficticio():
+    """Hash usado para conferir senhas de usuários inexistentes."""
+    return hash_password(secrets.token_hex(16), '')
+
+
+def _file_signature(arquivos):
+    """Data de modificação e tamanho dos arquivos (None se não existirem)."""
+    assinatura = []
+    for arquivo in arquivos:
+        try:
+            info = os.stat(arquivo)
+            assinatura.append((info.st_mtime_ns, info.st_size))
+        except OSError:
+            assinatura.append(None)
+    return tuple(assinatura)
+
 
 class UserAuth:
     """Sistema de autenticação de usuários com armazenamento em CSV."""
@@ -14,8 +255,53 @@ class UserAuth:
             users_file (str): Caminho para o arquivo CSV de usuários
         """
         self.users_file = users_file
+        self._init_cache()
         self._check_users_file()
     
+    def _init_cache(self):
+        """Prepara o cache da tabela de usuários e o limite de tentativas de login."""
+        self._cache_usuarios = None
+        self._cache_lock = threading.Lock()
+        self.limiter = LoginRateLimiter()
+    
+    def _user_files(self):
+        """Arquivos cuja alteração invalida o cache da tabela de usuários."""
+        return [self.users_file]
+    
+    def _read_users(self):
+        """Lê a tabela de usuários do armazenamento (sem cache)."""
+        try:
+            return pd.read_csv(self.users_file)
+        except Exception as e:
+            print(f"Erro ao ler arquivo de usuários: {str(e)}")
+            return pd.DataFrame(columns=['username', 'password_hash', 'salt', 'nome_completo', 'nivel_acesso', 'ativo'])
+    
+    def _users_table(self):
+        """Tabela de usuários em cache e índice username -> dados.
+        
+        A tabela só é lida novamente quando o arquivo é alterado (data de
+        modificação ou tamanho) ou após uma alteração feita por esta instância.
+        """
+        assinatura = _file_signature(self._user_files())
+        with self._cache_lock:
+            if self._cache_usuarios is None or self._cache_usuarios[0] != assinatura:
+                users_df = self._read_users()
+                registros = {}
+                for registro in users_df.to_dict('records'):
+                    registros.setdefault(registro['username'], registro)
+                self._cache_usuarios = (assinatura, users_df, registros)
+            return self._cache_usuarios[1], self._cache_usuarios[2]
+    
+    def _invalidate_cache(self):
+        """Descarta a tabela de usuários em cache (chamado após cada alteração)."""
+        with self._cache_lock:
+            self._cache_usuarios = None
+    
+    def _save_users(self, users_df):
+        """Grava a tabela de usuários no CSV."""
+        users_df.to_csv(self.users_file, index=False)
+        self._invalidate_cache()
+    
     def _check_users_file(self):
         """Verifica se o arquivo de usuários existe e o cria se necessário."""
         if not os.path.exists(self.users_file):
@@ -35,7 +321,7 @@ class UserAuth:
         print("Arquivo de usuários criado com sucesso!")
     
     def _hash_password(self, password, salt=None):
-        """Gera um hash seguro da senha com salt.
+        """Gera um hash seguro da senha com salt (ver hash_password).
         
         Args:
             password (str): Senha do usuário
@@ -48,24 +334,16 @@ class UserAuth:
             # Gerar um salt aleatório
             salt = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
         
-        # Concatenar senha e salt antes de gerar o hash
-        password_with_salt = password + salt
-        # Gerar hash SHA-256
-        password_hash = hashlib.sha256(password_with_salt.encode()).hexdigest()
-        
-        return password_hash, salt
+        # Hash com o algoritmo e os parâmetros atuais (ver KDF_PADRAO)
+        return hash_password(password, salt), salt
     
     def get_all_users(self):
         """Retorna todos os usuários cadastrados.
         
         Returns:
-            pandas.DataFrame: DataFrame com todos os usuários
+            pandas.DataFrame: DataFrame com todos os usuários (cópia da tabela em cache)
         """
-        try:
-            return pd.read_csv(self.users_file)
-        except Exception as e:
-            print(f"Erro ao ler arquivo de usuários: {str(e)}")
-            return pd.DataFrame(columns=['username', 'password_hash', 'salt', 'nome_completo', 'nivel_acesso', 'ativo'])
+        return self._users_table()[0].copy()
     
     def get_active_users(self):
         """Retorna apenas os usuários ativos.
@@ -114,7 +392,7 @@ class UserAuth:
         # Adicionar ao DataFrame e salvar
         new_row = pd.DataFrame([new_user])
         users_df = pd.concat([users_df, new_row], ignore_index=True)
-        users_df.to_csv(self.users_file, index=False)
+        self._save_users(users_df)
         
         return True, f"Usuário '{username}' adicionado com sucesso."
     
@@ -159,7 +437,7 @@ class UserAuth:
             users_df.at[user_idx, 'password_hash'] = password_hash
         
         # Salvar as alterações
-        users_df.to_csv(self.users_file, index=False)
+        self._save_users(users_df)
         
         return True, f"Usuário '{username}' atualizado com sucesso."
     
@@ -190,45 +468,49 @@ class UserAuth:
         
         # Remover o usuário
         users_df = users_df[users_df['username'] != username]
-        users_df.to_csv(self.users_file, index=False)
+        self._save_users(users_df)
         
         return True, f"Usuário '{username}' removido com sucesso."
     
-    def authenticate(self, username, password):
+    def authenticate(self, username, password, ip=None):
         """Autentica um usuário com username e senha.
         
+        Tentativas de um usuário ou IP bloqueado pelo limite de erros (ver
+        LoginRateLimiter) são recusadas sem conferir a senha. Senhas gravadas
+        com SHA-256 antigo ou com parâmetros desatualizados são refeitas com o
+        algoritmo atual após um login correto.
+        
         Args:
             username (str): Nome de usuário
             password (str): Senha
+            ip (str, optional): Endereço IP de origem, para o limite de tentativas
             
         Returns:
             tuple: (autenticado, dados_usuario)
         """
-        # Verificar se o usuário existe
-        users_df = self.get_all_users()
-        if username not in users_df['username'].values:
+        reserva = self.limiter.reserve(username, ip)
+        if reserva is None:
             return False, None
         
-        # Obter os dados do usuário
-        user_data = users_df[users_df['username'] == username].iloc[0].to_dict()
-        
-        # Verificar se o usuário está ativo
-        if not user_data['ativo']:
+        # Verificar se o usuário existe e obter os seus dados
+        user_data = self.get_user_by_username(username)
+        if user_data is None or not user_data['ativo']:
+            # Calcular um hash mesmo assim, para que o tempo de resposta não
+            # revele quais usuários existem
+            verify_password(password, '', _hash_ficticio())
             return False, None
         
-        # Verificar a senha
-        password_hash = user_data['password_hash']
-        salt = user_data['salt']
-        
-        # Gerar hash da senha fornecida
-        input_hash, _ = self._hash_password(password, salt)
-        
-        if input_hash == password_hash:
-            # Autenticação bem-sucedida
-            return True, user_data
-        else:
-            # Senha incorreta
+        # Verificar a senha (a tentativa reservada fica contada como erro)
+        if not verify_password(password, str(user_data['salt']), user_data['password_hash']):
             return False, None
+        
+        # Autenticação bem-sucedida
+        self.limiter.release(username, ip, reserva)
+        if needs_rehash(user_data['password_hash']):
+            sucesso, mensagem = self.update_user(username, password=password)
+            if not sucesso:
+                print(f"Erro ao atualizar o hash da senha de '{username}': {mensagem}")
+        return True, user_data
     
     def get_user_by_username(self, username):
         """Busca um usuário pelo nome de usuário.
@@ -239,7 +521,5 @@ class UserAuth:
         Returns:
             dict or None: Dados do usuário ou None se não encontrado
         """
-        users_df = self.get_all_users()
-        if username in users_df['username'].values:
-            return users_df[users_df['username'] == username].iloc[0].to_dict()
-        return None
\ No newline at end of file
+        registro = self._users_table()[1].get(username)
+        return dict(registro) if registro is not None else None